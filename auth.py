@@ -0,0 +1,57 @@
+"""
+Đăng nhập: LoginManager, cache danh tính người dùng và decorator admin_required.
+"""
+
+from functools import wraps
+import os
+
+from flask import flash, redirect, url_for
+from flask_login import LoginManager, current_user
+from sqlalchemy.orm import make_transient_to_detached
+
+import caching
+from models import db, User, DELETED_PASSWORD_HASH
+
+login_manager = LoginManager()
+login_manager.login_view = 'main.login'
+login_manager.login_message = 'Vui lòng đăng nhập để tiếp tục.'
+
+# Cache danh tính người dùng cho Flask-Login: phần lớn request đã đăng nhập không
+# cần SELECT bảng user. Các thao tác sửa user gọi invalidate_user(); worker / node
+# khác thấy thay đổi sau tối đa CACHE_SYNC_SECONDS giây (USER_CACHE_TTL=0 tắt cache).
+user_cache = caching.SharedCache('user', ttl=float(os.environ.get('USER_CACHE_TTL', 30)),
+                                 maxsize=int(os.environ.get('USER_CACHE_SIZE', 10000)))
+
+# Chỉ cache các trường danh tính mà request cần; password_hash không bao giờ được
+# pickle vào tầng cache dùng chung (đọc lại từ DB khi cần, xem login / change_password)
+CACHED_USER_FIELDS = ('id', 'username', 'email', 'avatar_url', 'is_admin')
+
+def _detached_user_copy(user):
+    copy = User(**{key: getattr(user, key) for key in CACHED_USER_FIELDS})
+    make_transient_to_detached(copy)
+    return copy
+
+def invalidate_user(user_id):
+    user_cache.invalidate(int(user_id))
+
+@login_manager.user_loader
+def load_user(user_id):
+    user_id = int(user_id)
+    cached = user_cache.get(user_id)
+    if cached is not None:
+        # Gắn bản sao vào session hiện tại mà không truy vấn (lazy load quan hệ vẫn dùng được)
+        return db.session.merge(cached, load=False)
+    user = db.session.get(User, user_id)
+    if user is None or user.password_hash == DELETED_PASSWORD_HASH:
+        return None
+    user_cache.set(user_id, _detached_user_copy(user))
+    return user
+
+def admin_required(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not current_user.is_authenticated or not current_user.is_admin:
+            flash('Bạn không có quyền truy cập trang này.', 'error')
+            return redirect(url_for('main.index'))
+        return f(*args, **kwargs)
+    return decorated_function
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Độ nhất quán và chống dồn tải của caching.SharedCache giữa nhiều process.
+
+Chạy --processes process (fork, như worker gunicorn), mỗi process --threads
+thread, với từng tầng dùng chung: memory:// (chỉ trong process), sqlite (file
+trên máy) và redis (server thay thế benchmarks/cache_standin.py). In ra:
+
+    loads        - số lần loader chạy khi mọi thread của mọi process cùng trượt
+                   một khóa nóng (loader mất --load-ms): lý tưởng là 1
+    coherent ms  - thời gian từ lúc một process invalidate tới khi mọi process
+                   đọc được giá trị mới (p50 của --rounds lần; "-" nếu không
+                   process nào thấy trong 3 giây, tức phải chờ hết TTL)
+    local µs / shared µs
+                 - thời gian một get() trúng tầng 1 / trúng tầng dùng chung
+
+Sử dụng:
+    python benchmarks/cache_coherence.py --processes 4 --threads 8
+"""
+
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask  # noqa: E402
+
+import cache_standin  # noqa: E402
+import caching  # noqa: E402
+
+COHERENCE_TIMEOUT = 3.0
+
+cache = caching.SharedCache('bench', ttl=300)
+
+
+def _configure(url, directory):
+    os.environ['CACHE_URL'] = url
+    app = Flask('bench', instance_path=directory)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///bench.db'
+    caching.init_app(app)
+
+
+def _stampede(url, directory, threads, load_seconds, barrier, loads):
+    _configure(url, directory)
+
+    def loader():
+        with loads.get_lock():
+            loads.value += 1
+        time.sleep(load_seconds)
+        return 'hot'
+
+    barrier.wait()
+    workers = [threading.Thread(target=cache.get_or_load, args=('hot', loader)) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def _reader(url, directory, version, seen, stop, ready):
+    # Đọc liên tục như các request; giá trị mới chỉ có sau khi mục bị invalidate
+    _configure(url, directory)
+    while not stop.is_set():
+        value = cache.get_or_load('value', lambda: version.value)
+        seen.value = value
+        ready.set()
+        time.sleep(0.001)
+
+
+def run_backend(url, directory, args):
+    context = multiprocessing.get_context('fork')
+    loads = context.Value('i', 0)
+    barrier = context.Barrier(args.processes)
+    processes = [context.Process(target=_stampede, args=(url, directory, args.threads, args.load_ms / 1000,
+                                                         barrier, loads))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    version = context.Value('i', 1)
+    stop = context.Event()
+    readers = []
+    for _ in range(args.processes - 1):
+        seen, ready = context.Value('i', 0), context.Event()
+        process = context.Process(target=_reader, args=(url, directory, version, seen, stop, ready))
+        process.start()
+        ready.wait(10)
+        readers.append(seen)
+
+    _configure(url, directory)
+    samples = []
+    for _ in range(args.rounds):
+        with version.get_lock():
+            version.value += 1
+        started = time.perf_counter()
+        cache.invalidate('value')
+        while any(seen.value != version.value for seen in readers):
+            if time.perf_counter() - started > COHERENCE_TIMEOUT:
+                break
+            time.sleep(0.0005)
+        else:
+            samples.append(time.perf_counter() - started)
+            continue
+        break  # Process khác chỉ thấy giá trị mới khi hết TTL
+    stop.set()
+    for process in context.active_children():
+        process.join()
+
+    cache.set('timed', 'x' * 200)
+    started = time.perf_counter()
+    for _ in range(args.gets):
+        cache.get('timed')
+    local = (time.perf_counter() - started) / args.gets
+    started = time.perf_counter()
+    for _ in range(args.gets):
+        cache.clear()
+        cache.get('timed')
+    shared = (time.perf_counter() - started) / args.gets
+    return {
+        'loads': loads.value,
+        'coherent_ms': statistics.median(samples) * 1000 if len(samples) == args.rounds else None,
+        'local_us': local * 1e6,
+        'shared_us': shared * 1e6 if caching._backend is not None else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--load-ms', type=float, default=50)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--gets', type=int, default=2000)
+    args = parser.parse_args()
+
+    server = cache_standin.start()
+    print(f'{args.processes} process x {args.threads} thread, loader {args.load_ms:.0f} ms, '
+          f'CACHE_SYNC_SECONDS={caching.SYNC_SECONDS:g}')
+    print(f'{"backend":<8} {"loads":>6} {"coherent ms":>12} {"local µs":>9} {"shared µs":>10}')
+    for name, url in (('memory', 'memory://'), ('sqlite', 'sqlite:///cache.db'), ('redis', server.url)):
+        with tempfile.TemporaryDirectory() as directory:
+            result = run_backend(url, directory, args)
+        coherent = f'{result["coherent_ms"]:.0f}' if result['coherent_ms'] is not None else '-'
+        shared = f'{result["shared_us"]:.0f}' if result['shared_us'] is not None else '-'
+        print(f'{name:<8} {result["loads"]:>6} {coherent:>12} {result["local_us"]:>9.1f} {shared:>10}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
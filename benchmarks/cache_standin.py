@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Server thay thế Redis để thử tầng cache qua mạng (caching.RedisBackend) trên máy.
+
+Chỉ cài các lệnh caching.py dùng (GET, SET PX/NX, DEL, SADD, SMEMBERS, PEXPIRE,
+INCRBY, ZADD, ZRANGEBYSCORE, ZREMRANGEBYSCORE, cùng PING, AUTH, SELECT,
+FLUSHDB), dữ liệu chỉ nằm trong bộ nhớ. Không dùng cho production.
+
+Sử dụng:
+    python benchmarks/cache_standin.py --port 6390 &
+    CACHE_URL=redis://127.0.0.1:6390/0 gunicorn app:app
+
+Hoặc trong code: server = start('127.0.0.1', 0); server.url -> redis://...
+"""
+
+import argparse
+import socketserver
+import threading
+import time
+
+
+class Store:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.Lock()
+
+    def _alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def _score(self, value):
+        # "(5" là cận mở, "-inf" / "+inf" là vô cực
+        value = value.decode()
+        exclusive = value.startswith('(')
+        value = value[1:] if exclusive else value
+        return float(value.replace('inf', 'Infinity')), exclusive
+
+    def execute(self, command, args):
+        with self.lock:
+            return getattr(self, f'cmd_{command}')(*args)
+
+    def cmd_ping(self, *args):
+        return 'PONG'
+
+    def cmd_auth(self, *args):
+        return 'OK'
+
+    def cmd_select(self, db):
+        return 'OK'
+
+    def cmd_flushdb(self, *args):
+        self.data.clear()
+        self.expires.clear()
+        return 'OK'
+
+    def cmd_get(self, key):
+        return self.data[key] if self._alive(key) else None
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        if b'NX' in options and self._alive(key):
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if b'PX' in options:
+            self.expires[key] = time.monotonic() + int(options[options.index(b'PX') + 1]) / 1000
+        return 'OK'
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._alive(key):
+                removed += 1
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return removed
+
+    def cmd_pexpire(self, key, ms):
+        if not self._alive(key):
+            return 0
+        self.expires[key] = time.monotonic() + int(ms) / 1000
+        return 1
+
+    def cmd_incrby(self, key, amount):
+        value = int(self.data[key]) + int(amount) if self._alive(key) else int(amount)
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_sadd(self, key, *members):
+        if not self._alive(key):
+            self.data[key] = set()
+        members_set = self.data[key]
+        before = len(members_set)
+        members_set.update(members)
+        return len(members_set) - before
+
+    def cmd_smembers(self, key):
+        return sorted(self.data[key]) if self._alive(key) else []
+
+    def cmd_zadd(self, key, *pairs):
+        if not self._alive(key):
+            self.data[key] = {}
+        zset = self.data[key]
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in zset
+            zset[member] = float(score)
+        return added
+
+    def _zrange(self, key, low, high):
+        if not self._alive(key):
+            return []
+        (low, low_open), (high, high_open) = self._score(low), self._score(high)
+        return [member for member, score in sorted(self.data[key].items(), key=lambda item: item[1])
+                if (score > low if low_open else score >= low) and (score < high if high_open else score <= high)]
+
+    def cmd_zrangebyscore(self, key, low, high):
+        return self._zrange(key, low, high)
+
+    def cmd_zremrangebyscore(self, key, low, high):
+        members = self._zrange(key, low, high)
+        for member in members:
+            del self.data[key][member]
+        return len(members)
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # Lệnh dạng inline (VD: gõ bằng telnet)
+        args = []
+        for _ in range(int(line[1:])):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def _encode(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, Exception):
+            return b'-ERR %s\r\n' % str(value).encode()
+        if isinstance(value, str):
+            return b'+%s\r\n' % value.encode()
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, bytes):
+            return b'$%d\r\n%s\r\n' % (len(value), value)
+        return b'*%d\r\n' % len(value) + b''.join(self._encode(item) for item in value)
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            if not command:
+                continue
+            try:
+                reply = self.server.store.execute(command[0].decode().lower(), command[1:])
+            except (AttributeError, TypeError):
+                reply = ValueError(f'unknown command or wrong arguments {command[0].decode()!r}')
+            except Exception as e:
+                reply = e
+            self.wfile.write(self._encode(reply))
+
+
+class Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128  # Mỗi thread của mỗi worker mở một kết nối
+
+    def __init__(self, address):
+        super().__init__(address, Handler)
+        self.store = Store()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'redis://{host}:{port}/0'
+
+
+def start(host='127.0.0.1', port=0):
+    """Chạy server trong thread nền; trả về server (server.url, server.shutdown())."""
+    server = Server((host, port))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args()
+    server = Server((args.host, args.port))
+    print(f'Listening on {server.url}', flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
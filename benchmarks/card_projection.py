@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Bộ nhớ và thời gian của một trang danh sách lớn: entity Movie vs MovieCard.
+
+Seed N phim (mặc định 5000, có description dài), rồi với mỗi cách nạp dữ liệu
+chạy truy vấn + render index.html trong một request context:
+
+    orm     - Movie.query...all() (entity đầy đủ, identity map, theo dõi thay đổi)
+    cards   - cards.load(cards.select(Movie)...) (chỉ các cột của thẻ, namedtuple)
+
+In ra thời gian truy vấn, thời gian render (p50) và bộ nhớ cấp phát đỉnh
+(tracemalloc) của một request.
+
+Sử dụng:
+    python benchmarks/card_projection.py --movies 5000 --repeat 10
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed as seeding  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--movies', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    os.environ['SQL_PROFILER'] = '0'
+
+    from flask import render_template
+
+    import app as m
+    import cards
+    m.app.logger.setLevel('ERROR')
+    seeding.seed_database(m, movies=args.movies, users=10, comments=0, likes=0, history=0)
+
+    loaders = {
+        'orm': lambda: m.Movie.query.order_by(*m.MOVIE_LIST_ORDER).all(),
+        'cards': lambda: cards.load(m.db.session, cards.select(m.Movie).order_by(*m.MOVIE_LIST_ORDER)),
+    }
+
+    def run(loader, trace=False):
+        with m.app.test_request_context('/'):
+            if trace:
+                tracemalloc.start()
+            start = time.perf_counter()
+            movies = loader()
+            loaded = time.perf_counter()
+            html = render_template('index.html', movies=movies, categories=[], filter_type='all', resume_items=[])
+            rendered = time.perf_counter()
+            peak = tracemalloc.get_traced_memory()[1] if trace else 0
+            if trace:
+                tracemalloc.stop()
+            m.db.session.remove()
+        return loaded - start, rendered - loaded, peak, len(html)
+
+    print(f'{args.movies} thẻ phim, {args.repeat} lần mỗi cách (p50)')
+    print(f'{"loader":<7} {"query ms":>9} {"render ms":>10} {"total ms":>9} {"peak MB":>9} {"html KB":>8}')
+    for name, loader in loaders.items():
+        run(loader)  # làm nóng cache template / câu lệnh
+        samples = [run(loader) for _ in range(args.repeat)]
+        query = statistics.median(s[0] for s in samples)
+        render = statistics.median(s[1] for s in samples)
+        _, _, peak, size = run(loader, trace=True)
+        print(f'{name:<7} {query * 1000:>9.1f} {render * 1000:>10.1f} {(query + render) * 1000:>9.1f} '
+              f'{peak / 1024 / 1024:>9.1f} {size / 1024:>8.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Benchmark đọc/ghi đồng thời trên SQLite, mô phỏng nhiều worker gunicorn.
+
+So sánh cấu hình mặc định của SQLAlchemy với cấu hình trong db_config.py
+(WAL, synchronous=NORMAL, busy_timeout, mmap, cache_size).
+
+Sử dụng:
+    python benchmarks/db_concurrency.py --workers 4 --seconds 10 --write-ratio 0.3
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+
+import db_config  # noqa: E402
+
+SCHEMA = [
+    'CREATE TABLE movie (id INTEGER PRIMARY KEY, title VARCHAR(200), views INTEGER DEFAULT 0)',
+    'CREATE TABLE watch_history (id INTEGER PRIMARY KEY, user_id INTEGER, movie_id INTEGER, '
+    'watched_at TIMESTAMP, last_position INTEGER DEFAULT 0)',
+    'CREATE INDEX ix_wh_user_movie ON watch_history (user_id, movie_id)',
+]
+
+
+def seed(path, movies, users):
+    engine = create_engine(f'sqlite:///{path}')
+    with engine.begin() as conn:
+        for stmt in SCHEMA:
+            conn.execute(text(stmt))
+        conn.execute(text('INSERT INTO movie (id, title, views) VALUES (:id, :title, 0)'),
+                     [{'id': i, 'title': f'Movie {i}'} for i in range(1, movies + 1)])
+        conn.execute(text('INSERT INTO watch_history (user_id, movie_id, watched_at) '
+                          'VALUES (:u, :m, CURRENT_TIMESTAMP)'),
+                     [{'u': random.randint(1, users), 'm': random.randint(1, movies)}
+                      for _ in range(users * 5)])
+    engine.dispose()
+
+
+def make_engine(path, tuned):
+    uri = f'sqlite:///{path}'
+    if tuned:
+        engine = create_engine(uri, **db_config.engine_options(uri))
+        db_config.install_sqlite_pragmas(engine)
+    else:
+        engine = create_engine(uri)
+    return engine
+
+
+def worker(path, tuned, seconds, write_ratio, movies, users, seed_value, out):
+    random.seed(seed_value)
+    engine = make_engine(path, tuned)
+    reads = writes = errors = 0
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        movie_id = random.randint(1, movies)
+        start = time.perf_counter()
+        try:
+            if random.random() < write_ratio:
+                with engine.begin() as conn:
+                    # Giống movie(): tăng lượt xem + cập nhật lịch sử xem
+                    conn.execute(text('UPDATE movie SET views = views + 1 WHERE id = :id'), {'id': movie_id})
+                    conn.execute(text('UPDATE watch_history SET watched_at = CURRENT_TIMESTAMP, '
+                                      'last_position = :p WHERE user_id = :u AND movie_id = :m'),
+                                 {'p': random.randint(0, 7200), 'u': random.randint(1, users), 'm': movie_id})
+                writes += 1
+            else:
+                with engine.connect() as conn:
+                    conn.execute(text('SELECT id, title, views FROM movie ORDER BY views DESC LIMIT 40')).fetchall()
+                    conn.execute(text('SELECT movie_id FROM watch_history WHERE user_id = :u '
+                                      'ORDER BY watched_at DESC LIMIT 20'),
+                                 {'u': random.randint(1, users)}).fetchall()
+                reads += 1
+            latencies.append(time.perf_counter() - start)
+        except Exception:
+            errors += 1
+    engine.dispose()
+    out.put((reads, writes, errors, latencies))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def run(tuned, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        seed(path, args.movies, args.users)
+        out = mp.Queue()
+        procs = [mp.Process(target=worker, args=(path, tuned, args.seconds, args.write_ratio,
+                                                 args.movies, args.users, i, out))
+                 for i in range(args.workers)]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    reads = sum(r[0] for r in results)
+    writes = sum(r[1] for r in results)
+    errors = sum(r[2] for r in results)
+    latencies = [lat for r in results for lat in r[3]]
+    label = 'tuned (WAL)' if tuned else 'default'
+    print(f'{label:<12} ops/s={(reads + writes) / args.seconds:9.1f}  reads={reads:<7} writes={writes:<7} '
+          f'errors={errors:<5} p50={percentile(latencies, 50) * 1000:6.2f}ms '
+          f'p95={percentile(latencies, 95) * 1000:6.2f}ms p99={percentile(latencies, 99) * 1000:6.2f}ms')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--write-ratio', type=float, default=0.3)
+    parser.add_argument('--movies', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    print(f'{args.workers} worker, {args.seconds}s, write ratio {args.write_ratio}')
+    run(False, args)
+    run(True, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Load test các hành trình chính của người dùng trên app Flask thật.
+
+Tạo DB giả lập (benchmarks/seed.py) trong thư mục tạm, rồi cho nhiều người
+dùng ảo (thread, mỗi người một test client đã đăng nhập) chạy lặp lại các bước:
+
+    home -> mở phim -> heartbeat lịch sử xem -> search-as-you-type
+         -> tải bình luận -> like bình luận
+
+Với --batch, heartbeat và like được gom lại như Interactions trong
+static/js/main.js: chỉ vị trí xem cuối cùng và lượt like được gửi trong một
+request /api/batch (bước "batch") ở cuối mỗi hành trình.
+
+In ra throughput và p50/p95/p99 cho từng bước, lưu kết quả JSON và so sánh
+với baseline để thấy regression giữa các commit.
+
+Sử dụng:
+    python benchmarks/loadtest.py --movies 2000 --duration 30 --save-baseline
+    python benchmarks/loadtest.py --duration 30          # so với baseline
+    python benchmarks/loadtest.py --duration 30 --batch  # số request khi gom heartbeat / like
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed as seeding  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+STEPS = ('home', 'movie', 'heartbeat', 'search', 'comments', 'like', 'batch')
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+class Journey:
+    """Một người dùng ảo với test client riêng."""
+
+    def __init__(self, app, user_id, dataset, rng, heartbeats, batch=False):
+        self.client = app.test_client()
+        self.dataset = dataset
+        self.rng = rng
+        self.heartbeats = heartbeats
+        self.batch = batch
+        resp = self.client.post('/login', data={'username': f'user{user_id}', 'password': seeding.BENCH_PASSWORD})
+        if resp.status_code != 302:
+            raise RuntimeError(f'Đăng nhập user{user_id} thất bại ({resp.status_code})')
+
+    def run_once(self, record):
+        rng = self.rng
+        d = self.dataset
+        # Phim "hot" có nhiều bình luận hơn, giống seed.py
+        movie_id = rng.randint(1, d['hot_movies']) if rng.random() < 0.5 else rng.randint(1, d['movies'])
+
+        record('home', lambda: self.client.get('/'))
+        record('movie', lambda: self.client.get(f'/movie/{seeding.url_key(movie_id)}'))
+        ops = []
+        for _ in range(self.heartbeats):
+            position = rng.randint(0, 7200)
+            if self.batch:
+                # Heartbeat sau ghi đè heartbeat trước cùng phim trong hàng đợi
+                ops = [{'op': 'watch', 'movie_id': movie_id, 'position': position}]
+            else:
+                record('heartbeat', lambda: self.client.post(
+                    f'/api/watch-history/{movie_id}', json={'position': position}))
+        word = rng.choice(seeding.WORDS)
+        for n in range(2, len(word) + 1):
+            record('search', lambda: self.client.get('/api/search', query_string={'q': word[:n]}))
+        resp = record('comments', lambda: self.client.get('/comments', query_string={'movie_id': movie_id}))
+        comments = resp.get_json().get('comments', []) if resp is not None else []
+        if comments:
+            comment_id = rng.choice(comments)['id']
+            if self.batch:
+                ops.append({'op': 'like', 'comment_id': comment_id})
+            else:
+                record('like', lambda: self.client.post(f'/comments/{comment_id}/like'))
+        if ops:
+            record('batch', lambda: self.client.post('/api/batch', json={'ops': ops}))
+
+
+def run_load(app, dataset, users, duration, heartbeats, seed, batch=False):
+    samples = {step: [] for step in STEPS}
+    errors = {step: 0 for step in STEPS}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        rng = random.Random(seed + index)
+        journey = Journey(app, index + 1, dataset, rng, heartbeats, batch)
+
+        def record(step, fn):
+            start = time.perf_counter()
+            resp = fn()
+            elapsed = time.perf_counter() - start
+            with lock:
+                samples[step].append(elapsed)
+                if resp.status_code >= 400:
+                    errors[step] += 1
+            return resp
+
+        while time.perf_counter() < deadline:
+            journey.run_once(record)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(users)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - start
+
+    steps = {}
+    for step in STEPS:
+        values = samples[step]
+        steps[step] = {
+            'requests': len(values),
+            'errors': errors[step],
+            'rps': len(values) / wall,
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+        }
+    total = sum(len(v) for v in samples.values())
+    all_values = [v for values in samples.values() for v in values]
+    return {
+        'wall_seconds': wall,
+        'total_requests': total,
+        'rps': total / wall,
+        'p50_ms': percentile(all_values, 50) * 1000,
+        'p95_ms': percentile(all_values, 95) * 1000,
+        'p99_ms': percentile(all_values, 99) * 1000,
+        'steps': steps,
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+
+def print_report(result, baseline=None, threshold=0.2):
+    print(f'{"step":<10} {"reqs":>7} {"err":>5} {"rps":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    regressions = []
+    for step, s in list(result['steps'].items()) + [('TOTAL', result)]:
+        line = (f'{step:<10} {s.get("requests", s.get("total_requests")):>7} {s.get("errors", ""):>5} '
+                f'{s["rps"]:>8.1f} {s["p50_ms"]:>8.2f} {s["p95_ms"]:>8.2f} {s["p99_ms"]:>8.2f}')
+        base = None
+        if baseline:
+            base = baseline['result'] if step == 'TOTAL' else baseline['result']['steps'].get(step)
+        if base and base['p95_ms'] > 0:
+            change = s['p95_ms'] / base['p95_ms'] - 1
+            line += f'   p95 {change:+.0%} vs {baseline.get("revision") or "baseline"}'
+            if change > threshold:
+                line += '  <-- REGRESSION'
+                regressions.append(step)
+        print(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    seeding.add_arguments(parser)
+    parser.add_argument('--virtual-users', type=int, default=4, help='Số người dùng ảo chạy song song')
+    parser.add_argument('--duration', type=float, default=20, help='Thời gian chạy (giây)')
+    parser.add_argument('--heartbeats', type=int, default=3, help='Số heartbeat mỗi lần mở phim')
+    parser.add_argument('--batch', action='store_true', help='Gom heartbeat / like vào một request /api/batch')
+    parser.add_argument('--output', help='Ghi kết quả JSON ra file này')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='File baseline để so sánh/ghi')
+    parser.add_argument('--save-baseline', action='store_true', help='Ghi kết quả làm baseline mới')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Ngưỡng tăng p95 bị coi là regression')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+        os.environ.setdefault('SQL_PROFILER', '0')
+        import app as app_module
+        app_module.app.logger.setLevel('ERROR')
+
+        print('Seeding...', flush=True)
+        dataset = seeding.seed_from_args(app_module, args)
+        dataset['hot_movies'] = max(1, args.movies // 20)
+        users = min(args.virtual_users, args.users)
+        print(f'Running {users} virtual users for {args.duration}s...', flush=True)
+        result = run_load(app_module.app, dataset, users, args.duration, args.heartbeats, args.seed, args.batch)
+
+    report = {
+        'revision': git_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'dataset': dataset,
+        'config': {'virtual_users': users, 'duration': args.duration, 'heartbeats': args.heartbeats,
+                   'batch': args.batch},
+        'result': result,
+    }
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('dataset') != dataset:
+            print('Cảnh báo: dataset khác baseline, so sánh có thể không chính xác.')
+
+    regressions = print_report(result, baseline, args.threshold)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'Baseline saved to {args.baseline}')
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
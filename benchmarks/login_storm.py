@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Độ trễ trang trong lúc có "bão đăng nhập".
+
+Một nhóm thread đọc trang (trang chủ, trang phim) liên tục; sau một khoảng đo
+nền, thêm nhiều thread đăng nhập dồn dập. So sánh p50/p95 của việc đọc trang
+trước và trong bão, với hai chế độ:
+
+    inline  - băm mật khẩu ngay trong process web (PASSWORD_HASH_WORKERS=0)
+    limited - băm với số slot giới hạn trên toàn máy (passwords.py)
+
+Mỗi chế độ chạy trong một process Python riêng vì cấu hình được đọc lúc import.
+
+Sử dụng:
+    python benchmarks/login_storm.py --readers 4 --logins 16 --duration 10
+    python benchmarks/login_storm.py --modes limited --slots 1
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed as seeding  # noqa: E402
+from loadtest import percentile  # noqa: E402
+
+
+def _readers(app, count, stop, samples, movies):
+    def worker(index):
+        client = app.test_client()
+        i = index
+        while not stop.is_set():
+            path = '/' if i % 2 else f'/movie/{seeding.url_key((i % movies) + 1)}'
+            start = time.perf_counter()
+            client.get(path)
+            samples.append(time.perf_counter() - start)
+            i += 1
+    return [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+
+
+def _stormers(app, count, stop, results, users):
+    def worker(index):
+        client = app.test_client()
+        i = index
+        while not stop.is_set():
+            resp = client.post('/login', data={'username': f'user{(i % users) + 1}',
+                                               'password': seeding.BENCH_PASSWORD})
+            results.append(resp.status_code)
+            client.get('/logout')
+            i += 1
+    return [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+
+
+def _phase(threads, stop, seconds):
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+
+
+def run_mode(args):
+    """Chạy trong process con: seed DB, đo nền rồi đo trong bão đăng nhập."""
+    import app as app_module
+    app_module.app.logger.setLevel('ERROR')
+    seeding.seed_database(app_module, movies=200, users=args.users, comments=500, likes=500, history=500)
+    app = app_module.app
+
+    baseline = []
+    stop = threading.Event()
+    _phase(_readers(app, args.readers, stop, baseline, 200), stop, args.duration)
+
+    storm = []
+    logins = []
+    stop = threading.Event()
+    threads = _readers(app, args.readers, stop, storm, 200) + _stormers(app, args.logins, stop, logins, args.users)
+    _phase(threads, stop, args.duration)
+
+    def summary(values):
+        return {'requests': len(values), 'p50_ms': percentile(values, 50) * 1000,
+                'p95_ms': percentile(values, 95) * 1000}
+
+    return {
+        'baseline': summary(baseline),
+        'storm': summary(storm),
+        'logins_ok': sum(1 for code in logins if code == 302),
+        'logins_rejected': sum(1 for code in logins if code == 503),
+        'logins_per_s': sum(1 for code in logins if code == 302) / args.duration,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--modes', default='inline,limited')
+    parser.add_argument('--readers', type=int, default=4, help='Số thread đọc trang')
+    parser.add_argument('--logins', type=int, default=16, help='Số thread đăng nhập đồng thời trong bão')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=8, help='Thời gian mỗi pha (giây)')
+    parser.add_argument('--slots', type=int, default=2, help='PASSWORD_HASH_WORKERS cho chế độ limited')
+    parser.add_argument('--method', default='scrypt', help='PASSWORD_HASH_METHOD')
+    parser.add_argument('--run-mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_mode:
+        print(json.dumps(run_mode(args)))
+        return
+
+    print(f'{"mode":<8} {"phase":<9} {"reqs":>6} {"p50 ms":>8} {"p95 ms":>8}   logins ok/s  rejected')
+    for mode in args.modes.split(','):
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ,
+                       DATABASE_URL=f'sqlite:///{os.path.join(tmp, "bench.db")}',
+                       SQL_PROFILER='0',
+                       PASSWORD_HASH_METHOD=args.method,
+                       PASSWORD_HASH_WORKERS='0' if mode == 'inline' else str(args.slots),
+                       PASSWORD_HASH_SLOT_DIR=os.path.join(tmp, 'password-slots'))
+            cmd = [sys.executable, os.path.abspath(__file__), '--run-mode', mode,
+                   '--readers', str(args.readers), '--logins', str(args.logins), '--users', str(args.users),
+                   '--duration', str(args.duration)]
+            output = subprocess.check_output(cmd, env=env, cwd=ROOT, stderr=subprocess.DEVNULL)
+            result = json.loads(output.decode().strip().splitlines()[-1])
+        for phase in ('baseline', 'storm'):
+            s = result[phase]
+            line = f'{mode:<8} {phase:<9} {s["requests"]:>6} {s["p50_ms"]:>8.2f} {s["p95_ms"]:>8.2f}'
+            if phase == 'storm':
+                line += f'   {result["logins_per_s"]:>11.1f}  {result["logins_rejected"]:>8}'
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
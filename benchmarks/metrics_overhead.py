@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Đo chi phí của hook metrics (metrics.py) trên mỗi request.
+
+Chạy trực tiếp start_request / finish_request / end_request trong một request
+context giả, nên chỉ đo phần metrics chứ không đo routing hay view. Mục tiêu:
+dưới 50 µs mỗi request, kể cả ở chế độ multiprocess.
+
+Sử dụng:
+    python benchmarks/metrics_overhead.py
+    PROMETHEUS_MULTIPROC_DIR=/tmp/prom python benchmarks/metrics_overhead.py
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+from flask import Flask, Response  # noqa: E402
+
+import metrics  # noqa: E402
+
+ITERATIONS = 20000
+
+
+def main():
+    app = Flask(__name__)
+
+    @app.route('/movie/<url_key>')
+    def movie(url_key):
+        return 'ok'
+
+    response = Response('ok')
+    with app.test_request_context('/movie/abc'):
+        # request.endpoint chỉ có sau khi match URL
+        from flask import request
+        request.url_rule, request.view_args = app.url_map.bind('localhost').match('/movie/abc', return_rule=True)
+
+        for _ in range(1000):
+            metrics.start_request()
+            metrics.finish_request(response)
+            metrics.end_request()
+
+        start = time.perf_counter()
+        for _ in range(ITERATIONS):
+            metrics.start_request()
+            metrics.finish_request(response)
+            metrics.end_request()
+        elapsed = time.perf_counter() - start
+
+    mode = 'multiprocess' if metrics.MULTIPROC_DIR else 'single process'
+    print(f'{mode}: {elapsed / ITERATIONS * 1e6:.2f} µs / request ({ITERATIONS} iterations)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-byte và dung lượng truyền của trang chủ lớn.
+
+Seed N phim (mặc định 2000 thẻ trên trang chủ), chạy app trên một HTTP server
+thật (werkzeug, thread riêng) rồi đo phía client:
+
+    ttfb        - thời điểm nhận byte body đầu tiên
+    first card  - thời điểm thẻ phim đầu tiên (class="movie-card") tới client
+    total       - thời điểm nhận xong response
+    wire        - số byte body nhận được (sau nén nếu có)
+
+Các chế độ: buffered (render_template), buffered+gzip, stream, stream+gzip,
+stream+br (nếu đã cài brotli).
+
+Sử dụng:
+    python benchmarks/page_delivery.py --movies 2000 --requests 20
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import tempfile
+import threading
+import time
+import zlib
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import seed as seeding  # noqa: E402
+from loadtest import percentile  # noqa: E402
+
+MARKER = b'class="movie-card"'
+
+
+def _decoder(encoding):
+    if encoding == 'gzip':
+        return zlib.decompressobj(31).decompress
+    if encoding == 'br':
+        import brotli
+        return brotli.Decompressor().process
+    return lambda data: data
+
+
+def fetch(port, path, encoding):
+    """Một request; trả về (ttfb, first_card, total, body bytes)."""
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port)
+    conn.request('GET', path, headers=headers)
+    response = conn.getresponse()
+    ttfb = first_card = None
+    received = 0
+    decode = _decoder(response.getheader('Content-Encoding'))
+    seen = b''
+    while True:
+        # read1: trả về ngay phần đã tới (kể cả từng chunk của response stream)
+        data = response.read1(65536)
+        if not data:
+            break
+        now = time.perf_counter()
+        if ttfb is None:
+            ttfb = now - start
+        received += len(data)
+        if first_card is None:
+            seen = seen[-len(MARKER):] + decode(data)
+            if MARKER in seen:
+                first_card = now - start
+    conn.close()
+    total = time.perf_counter() - start
+    return ttfb, first_card if first_card is not None else total, total, received
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--movies', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=20, help='Số request đo cho mỗi chế độ')
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f'sqlite:///{os.path.join(tmp, "bench.db")}'
+    os.environ['SQL_PROFILER'] = '0'
+
+    from werkzeug.serving import make_server
+
+    import app as app_module
+    import compression
+    import streaming
+    app_module.app.logger.setLevel('ERROR')
+    seeding.seed_database(app_module, movies=args.movies, users=10, comments=0, likes=0, history=0)
+
+    server = make_server('127.0.0.1', 0, app_module.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    modes = [('buffered', False, None), ('buffered+gzip', False, 'gzip'),
+             ('stream', True, None), ('stream+gzip', True, 'gzip')]
+    if compression.brotli is not None:
+        modes.append(('stream+br', True, 'br'))
+
+    print(f'{args.movies} phim trên trang chủ, {args.requests} request mỗi chế độ (p50)')
+    print(f'{"mode":<14} {"ttfb ms":>9} {"first card ms":>14} {"total ms":>9} {"wire KB":>9}')
+    for name, stream, encoding in modes:
+        streaming.ENABLED = stream
+        fetch(server.port, '/', encoding)  # làm nóng cache template / kết nối
+        samples = [fetch(server.port, '/', encoding) for _ in range(args.requests)]
+        ttfb, first_card, total, wire = (percentile([s[i] for s in samples], 50) for i in range(4))
+        print(f'{name:<14} {ttfb * 1000:>9.1f} {first_card * 1000:>14.1f} {total * 1000:>9.1f} {wire / 1024:>9.1f}')
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Tạo cơ sở dữ liệu giả lập cho benchmark.
+
+Số lượng phim, người dùng, bình luận, like và lịch sử xem đều cấu hình được;
+cùng --seed thì dữ liệu giống hệt nhau giữa các lần chạy. Mọi người dùng tạo
+ra đều có mật khẩu BENCH_PASSWORD.
+
+Sử dụng:
+    DATABASE_URL=sqlite:////tmp/bench.db python benchmarks/seed.py --movies 5000 --users 1000
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_PASSWORD = 'benchmark'
+
+WORDS = ('dem', 'trang', 'song', 'gio', 'lua', 'bien', 'rung', 'nui', 'thanh', 'pho', 'mat', 'troi',
+         'love', 'night', 'city', 'storm', 'dragon', 'shadow', 'legend', 'return', 'last', 'king')
+
+
+def _title(rng):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 4))).title()
+
+
+def url_key(movie_id):
+    """url_key cố định của phim thứ `movie_id`, cùng dạng với Movie.generate_url_key()."""
+    return f'{movie_id:010x}'
+
+
+def _insert(db, model, rows, batch=5000):
+    for i in range(0, len(rows), batch):
+        db.session.execute(db.insert(model), rows[i:i + batch])
+    db.session.commit()
+
+
+def seed_database(app_module, movies=2000, users=500, comments=20000, likes=40000, history=50000,
+                  categories=12, series_ratio=0.05, seed=42):
+    """Xóa dữ liệu cũ rồi nạp dữ liệu giả lập vào DB của `app_module`."""
+    from werkzeug.security import generate_password_hash
+
+    rng = random.Random(seed)
+    db = app_module.db
+    now = datetime.utcnow()
+    m = app_module
+
+    with m.app.app_context():
+        for model in (m.CommentLike, m.Comment, m.Favorite, m.WatchHistory, m.Movie, m.Franchise, m.Category, m.User):
+            db.session.execute(db.delete(model))
+        db.session.commit()
+
+        _insert(db, m.Category, [{'id': i, 'name': f'The loai {i}'} for i in range(1, categories + 1)])
+
+        password_hash = generate_password_hash(BENCH_PASSWORD)
+        _insert(db, m.User, [{
+            'id': i,
+            'username': f'user{i}',
+            'email': f'user{i}@bench.local',
+            'password_hash': password_hash,
+            'is_admin': i == 1,
+            'created_at': now - timedelta(days=rng.randint(0, 365)),
+        } for i in range(1, users + 1)])
+
+        movie_rows = []
+        series_ids = []
+        for i in range(1, movies + 1):
+            row = {
+                'id': i,
+                'title': _title(rng),
+                'subtitle': _title(rng) if rng.random() < 0.6 else None,
+                'slug': f'movie-{i}',
+                'url_key': url_key(i),
+                'description': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(20, 200))),
+                'video_url': f'/static/uploads/movies/{i}.mp4',
+                'poster_url': f'/static/uploads/posters/{i}.jpg',
+                'category_id': rng.randint(1, categories),
+                'views': int(rng.paretovariate(1.2) * 10),
+                'created_at': now - timedelta(minutes=rng.randint(0, 525600)),
+                'display_order': i,
+                'is_series': False,
+                'series_id': None,
+                'episode_number': None,
+            }
+            if series_ids and rng.random() < 0.3:
+                # Tập phim của một series đã có
+                row['series_id'] = rng.choice(series_ids)
+                row['episode_number'] = i
+            elif rng.random() < series_ratio:
+                row['is_series'] = True
+                series_ids.append(i)
+            movie_rows.append(row)
+        _insert(db, m.Movie, movie_rows)
+
+        # Mỗi (user, phim) chỉ có một dòng lịch sử (uq_watch_history_user_movie)
+        watched = set()
+        while len(watched) < min(history, users * movies):
+            watched.add((rng.randint(1, users), rng.randint(1, movies)))
+        _insert(db, m.WatchHistory, [{
+            'user_id': u,
+            'movie_id': movie_id,
+            'watched_at': now - timedelta(minutes=rng.randint(0, 43200)),
+            'last_position': rng.randint(0, 7200),
+        } for u, movie_id in sorted(watched)])
+
+        _insert(db, m.Favorite, [{
+            'user_id': rng.randint(1, users),
+            'movie_id': rng.randint(1, movies),
+            'created_at': now - timedelta(minutes=rng.randint(0, 43200)),
+        } for _ in range(history // 10)])
+
+        # Bình luận dồn vào một phần nhỏ phim "hot" để trang bình luận đủ nặng
+        hot_movies = max(1, movies // 20)
+        comment_rows = []
+        for i in range(1, comments + 1):
+            parent = rng.randint(1, i - 1) if i > 1 and rng.random() < 0.3 else None
+            comment_rows.append({
+                'id': i,
+                'user_id': rng.randint(1, users),
+                'movie_id': comment_rows[parent - 1]['movie_id'] if parent else rng.randint(1, hot_movies),
+                'parent_id': parent,
+                'content': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 40))),
+                'created_at': now - timedelta(minutes=rng.randint(0, 43200)),
+            })
+        _insert(db, m.Comment, comment_rows)
+
+        pairs = set()
+        while len(pairs) < min(likes, users * comments):
+            pairs.add((rng.randint(1, users), rng.randint(1, comments)))
+        _insert(db, m.CommentLike, [{'user_id': u, 'comment_id': c, 'created_at': now} for u, c in pairs])
+
+        # Nạp hàng loạt bỏ qua mapper event nên phải đối soát lại số tổng thống kê
+        m.stats.recompute(db.session, m.stat_sources())
+
+    return {
+        'movies': movies,
+        'users': users,
+        'comments': comments,
+        'likes': len(pairs),
+        'history': history,
+        'categories': categories,
+        'series': len(series_ids),
+        'seed': seed,
+    }
+
+
+def add_arguments(parser):
+    parser.add_argument('--movies', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--comments', type=int, default=20000)
+    parser.add_argument('--likes', type=int, default=40000)
+    parser.add_argument('--history', type=int, default=50000)
+    parser.add_argument('--categories', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def seed_from_args(app_module, args):
+    return seed_database(app_module, movies=args.movies, users=args.users, comments=args.comments,
+                         likes=args.likes, history=args.history, categories=args.categories, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    args = parser.parse_args()
+    if not os.environ.get('DATABASE_URL'):
+        parser.error('Hãy đặt DATABASE_URL tới một DB riêng cho benchmark (dữ liệu cũ sẽ bị xóa).')
+
+    import app as app_module
+    print(seed_from_args(app_module, args))
+
+
+if __name__ == '__main__':
+    main()
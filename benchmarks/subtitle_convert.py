@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Tốc độ chuyển phụ đề SRT -> WebVTT chuẩn hóa (subtitles.save) trên file lớn.
+
+Sinh một file SRT cho mỗi ngôn ngữ (tiếng Việt, Anh, Nhật, Ả Rập; mặc định
+50.000 cue mỗi file, có thẻ <font>, {\\an8}, dòng trống giữa cue và vài cue sai
+thời gian), rồi chuyển đổi + nén sẵn từng file (như khi upload, trừ bước chuyển vào kho blob). In ra:
+
+    MB/s, cue/s       - của cả quá trình (đọc, kiểm tra, ghi .vtt, .gz, .br)
+    convert / compress - thời gian chuyển đổi và nén sẵn (p50)
+    peak MB           - bộ nhớ cấp phát đỉnh (tracemalloc): đọc theo khối nên
+                        không tăng theo kích thước file
+    gz / br           - tỉ lệ kích thước bản nén sẵn so với .vtt
+
+Sử dụng:
+    python benchmarks/subtitle_convert.py --cues 50000 --repeat 3
+"""
+
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import subtitles  # noqa: E402
+
+SAMPLES = {
+    'vi': ['Anh có chắc không?', 'Chúng ta phải đi ngay bây giờ.', 'Đừng quay lại!', 'Tôi sẽ đợi ở đây.'],
+    'en': ['Are you sure?', 'We have to leave right now.', "Don't look back!", "I'll wait here."],
+    'ja': ['本当ですか？', '今すぐ出発しなければならない。', '振り返るな！', 'ここで待っています。'],
+    'ar': ['هل أنت متأكد؟', 'يجب أن نغادر الآن.', 'لا تنظر إلى الوراء!', 'سأنتظر هنا.'],
+}
+
+
+def _srt_timestamp(ms):
+    return subtitles.format_timestamp(ms).replace('.', ',')
+
+
+def make_srt(language, cues, seed=1):
+    rnd = random.Random(seed)
+    lines = SAMPLES[language]
+    out = io.StringIO()
+    at = 0
+    for index in range(1, cues + 1):
+        at += rnd.randint(500, 4000)
+        end = at + rnd.randint(800, 3500)
+        if index % 500 == 0:
+            end = at  # cue sai thời gian: bị bỏ
+        text = rnd.choice(lines)
+        if index % 7 == 0:
+            text = f'<font color="#ffff00">{text}</font>'
+        if index % 11 == 0:
+            text = '{\\an8}' + text
+        second = rnd.choice(lines)
+        separator = '\r\n\r\n' if index % 97 == 0 else '\r\n'  # dòng trống lọt vào giữa text
+        out.write(f'{index}\r\n{_srt_timestamp(at)} --> {_srt_timestamp(end)}\r\n{text}{separator}{second}\r\n\r\n')
+    return out.getvalue().encode('utf-8')
+
+
+def run(data, directory):
+    path = os.path.join(directory, 'bench.vtt')
+    started = time.perf_counter()
+    result = subtitles.save(io.BytesIO(data), path)
+    converted = time.perf_counter()
+    subtitles._precompress(path)
+    finished = time.perf_counter()
+    return result, {'total': finished - started, 'convert': converted - started, 'compress': finished - converted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cues', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    print(f'{args.cues} cue mỗi file, {args.repeat} lần mỗi file (p50); brotli: {"có" if subtitles.brotli else "không"}')
+    print(f'{"lang":<5} {"MB":>6} {"MB/s":>7} {"cue/s":>9} {"convert ms":>11} {"compress ms":>12} '
+          f'{"peak MB":>8} {"gz":>6} {"br":>6}')
+    for language in SAMPLES:
+        data = make_srt(language, args.cues)
+        samples = []
+        for _ in range(args.repeat):
+            result, timings = run(data, directory)
+            samples.append(timings)
+        tracemalloc.start()
+        result, _ = run(data, directory)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        path = os.path.join(directory, 'bench.vtt')
+        size = os.path.getsize(path)
+        ratios = [f'{os.path.getsize(path + suffix) / size:.0%}' if os.path.exists(path + suffix) else '-'
+                  for suffix in ('.gz', '.br')]
+        total = statistics.median(t['total'] for t in samples)
+        print(f'{language:<5} {len(data) / 1e6:>6.1f} {len(data) / 1e6 / total:>7.1f} {result.cues / total:>9.0f} '
+              f'{statistics.median(t["convert"] for t in samples) * 1000:>11.0f} '
+              f'{statistics.median(t["compress"] for t in samples) * 1000:>12.0f} '
+              f'{peak / 1024 / 1024:>8.1f} {ratios[0]:>6} {ratios[1]:>6}')
+
+
+if __name__ == '__main__':
+    main()
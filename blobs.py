@@ -0,0 +1,306 @@
+"""
+Lưu file upload theo nội dung (content-addressed): mỗi nội dung chỉ lưu một lần.
+
+File được băm SHA-256 ngay trong lúc ghi và lưu ở
+`uploads/blobs/<2 ký tự đầu>/<sha256>.<đuôi>`. Cùng một ảnh đại diện / poster /
+phụ đề upload nhiều lần chỉ tốn một file và một mục cache trình duyệt. URL
+/blobs/<sha256>.<đuôi> không bao giờ đổi nội dung nên được trả với
+Cache-Control immutable (kèm bản nén sẵn .gz / .br nếu có, xem compression.py).
+
+Đếm tham chiếu: bảng `blob` giữ số cột đang trỏ tới từng blob. track(model,
+*columns) gắn mapper event cập nhật `refs` trong chính transaction ghi model
+(xóa set-based bằng cascade.py phải gọi release_row() trong before_delete).
+Blob về 0 tham chiếu được job nền `blobs.gc` xóa sau BLOB_GC_GRACE_SECONDS
+giây, sau khi kiểm tra lại trực tiếp các cột đã đăng ký.
+"""
+
+import hashlib
+import os
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from flask import abort, current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes, object_session
+
+import compression
+import jobs
+
+GC_GRACE_SECONDS = int(os.environ.get('BLOB_GC_GRACE_SECONDS', 3600))
+CACHE_MAX_AGE = 365 * 24 * 3600
+CHUNK_SIZE = 64 * 1024
+URL_PREFIX = '/blobs/'
+NAME_PATTERN = re.compile(r'[0-9a-f]{64}\.[a-z0-9]{1,10}')
+
+blob = None
+
+_db = None
+_tracked = []  # (model, tên cột) đang lưu URL blob
+
+
+def folder():
+    return os.path.join(current_app.static_folder, 'uploads', 'blobs')
+
+
+def path(name):
+    return os.path.join(folder(), name[:2], name)
+
+
+def url(name):
+    return URL_PREFIX + name
+
+
+def name_from_url(value):
+    """Tên blob mà URL trỏ tới, hoặc None nếu không phải URL blob."""
+    if not value or not value.startswith(URL_PREFIX):
+        return None
+    name = value[len(URL_PREFIX):]
+    return name if NAME_PATTERN.fullmatch(name) else None
+
+
+def _extension(ext):
+    ext = (ext or '').lower().lstrip('.')
+    return ext if re.fullmatch(r'[a-z0-9]{1,10}', ext) else 'bin'
+
+
+# --- Ghi ---
+
+def _touch(name, size):
+    # Giao dịch riêng: blob mới (hoặc đang chờ gc) có thêm GC_GRACE_SECONDS để request kịp tham chiếu tới
+    now = datetime.utcnow()
+    with _db.engine.begin() as connection:
+        touched = connection.execute(
+            blob.update().where(blob.c.name == name)
+            .values(released_at=sa.case((blob.c.refs <= 0, now), else_=blob.c.released_at))).rowcount
+    if not touched:
+        try:
+            with _db.engine.begin() as connection:
+                connection.execute(blob.insert().values(name=name, size=size, refs=0, created_at=now, released_at=now))
+        except sa.exc.IntegrityError:
+            pass  # Request khác vừa lưu cùng nội dung
+    # Nếu request không commit tham chiếu nào, blob được dọn sau thời gian chờ
+    schedule_gc()
+
+
+def _commit(tmp, digest, ext, variants=()):
+    name = f'{digest}.{ext}'
+    # Sau _touch gc không xóa được blob này nữa (released_at mới), nên kiểm tra file ở dưới là an toàn
+    _touch(name, os.path.getsize(tmp))
+    target = path(name)
+    created = not os.path.exists(target)
+    if created:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        for suffix in variants:
+            if os.path.exists(tmp + suffix):
+                os.replace(tmp + suffix, target + suffix)
+        os.replace(tmp, target)
+    return name, created
+
+
+def temp_path(ext):
+    """Đường dẫn file tạm cùng ổ đĩa với kho blob (để os.replace không phải chép)."""
+    directory = os.path.join(folder(), 'tmp')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f'{uuid.uuid4().hex}.{_extension(ext)}')
+
+
+def store(stream, ext):
+    """Lưu nội dung của stream nhị phân (băm trong lúc ghi); trả về tên blob."""
+    ext = _extension(ext)
+    tmp = temp_path(ext)
+    digest = hashlib.sha256()
+    try:
+        with open(tmp, 'wb') as out:
+            while chunk := stream.read(CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+        return _commit(tmp, digest.hexdigest(), ext)[0]
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def store_file(source, ext, variants=()):
+    """Chuyển file đã ghi sẵn (VD: phụ đề đã chuẩn hóa) vào kho; trả về (tên blob, blob mới hay không).
+
+    `variants`: các đuôi file đi kèm (VD: '.gz') được chuyển theo nếu blob là mới.
+    """
+    digest = hashlib.sha256()
+    with open(source, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    try:
+        return _commit(source, digest.hexdigest(), _extension(ext), variants)
+    finally:
+        for leftover in (source, *(source + suffix for suffix in variants)):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+# --- Đếm tham chiếu ---
+
+def _adjust(connection, session, name, delta):
+    values = {'refs': blob.c.refs + delta}
+    if delta < 0:
+        values['released_at'] = sa.case((blob.c.refs + delta <= 0, datetime.utcnow()), else_=blob.c.released_at)
+        if session is not None:
+            session.info['_blobs_released'] = True
+    connection.execute(blob.update().where(blob.c.name == name).values(**values))
+
+
+def track(model, *columns):
+    """Đếm tham chiếu tới blob từ các cột URL `columns` của `model` (insert / update / delete qua ORM)."""
+    _tracked.extend((model, column) for column in columns)
+
+    @event.listens_for(model, 'after_insert')
+    def _inserted(mapper, connection, target):
+        for column in columns:
+            name = name_from_url(getattr(target, column))
+            if name:
+                _adjust(connection, object_session(target), name, 1)
+
+    @event.listens_for(model, 'after_update')
+    def _updated(mapper, connection, target):
+        for column in columns:
+            history = attributes.get_history(target, column)
+            if not history.has_changes():
+                continue
+            old = name_from_url(history.deleted[0] if history.deleted else None)
+            new = name_from_url(history.added[0] if history.added else None)
+            if old == new:
+                continue
+            if new:
+                _adjust(connection, object_session(target), new, 1)
+            if old:
+                _adjust(connection, object_session(target), old, -1)
+
+    @event.listens_for(model, 'after_delete')
+    def _deleted(mapper, connection, target):
+        for column in columns:
+            name = name_from_url(getattr(target, column))
+            if name:
+                _adjust(connection, object_session(target), name, -1)
+
+
+def release_row(session, model, row_id):
+    """Bỏ tham chiếu của một dòng sắp bị xóa bằng SQL (không qua ORM)."""
+    columns = [column for tracked_model, column in _tracked if tracked_model is model]
+    row = session.execute(sa.select(*[getattr(model, column) for column in columns])
+                          .where(model.id == row_id)).first()
+    for value in row or ():
+        name = name_from_url(value)
+        if name:
+            _adjust(session.connection(), session, name, -1)
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    if session.info.pop('_blobs_released', False):
+        try:
+            schedule_gc()
+        except Exception as e:
+            current_app.logger.warning(f'Could not schedule blob gc: {e}')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('_blobs_released', None)
+
+
+# --- Dọn blob không còn tham chiếu ---
+
+def schedule_gc(delay=GC_GRACE_SECONDS + 60):
+    """Đưa job `blobs.gc` vào hàng đợi nếu chưa có job nào đang chờ.
+
+    Job đang chờ có thể chạy sớm hơn hạn của blob mới nhả, nhưng collect() tự
+    hẹn lần chạy tiếp theo cho các blob còn trong thời gian chờ.
+    """
+    with _db.engine.connect() as connection:
+        pending = connection.execute(sa.select(jobs.job.c.id).where(
+            jobs.job.c.name == 'blobs.gc', jobs.job.c.status == 'queued').limit(1)).first()
+    if pending is None:
+        jobs.enqueue('blobs.gc', delay=delay)
+
+
+def references(session, name):
+    """Số cột đang trỏ tới blob, đếm trực tiếp trên các bảng."""
+    value = url(name)
+    return sum(session.execute(sa.select(sa.func.count()).select_from(model)
+                               .where(getattr(model, column) == value)).scalar() or 0
+               for model, column in _tracked)
+
+
+def collect(session, limit=500):
+    """Xóa các blob hết tham chiếu quá GC_GRACE_SECONDS giây; trả về số blob đã xóa."""
+    cutoff = datetime.utcnow() - timedelta(seconds=GC_GRACE_SECONDS)
+    candidates = session.execute(
+        sa.select(blob.c.name).where(blob.c.refs <= 0, blob.c.released_at < cutoff).limit(limit)).scalars().all()
+    deleted = []
+    for name in candidates:
+        actual = references(session, name)
+        if actual:
+            # Số đếm bị lệch (ghi bằng SQL thuần): sửa lại, không xóa
+            session.execute(blob.update().where(blob.c.name == name).values(refs=actual))
+            continue
+        # Điều kiện lặp lại: blob vừa được upload lại (released_at mới) thì giữ
+        if session.execute(blob.delete().where(blob.c.name == name, blob.c.refs <= 0,
+                                               blob.c.released_at < cutoff)).rowcount:
+            # Xóa file khi transaction còn giữ khóa dòng vừa xóa: upload cùng nội dung
+            # (_touch) phải chờ tới commit, nên khi nó kiểm tra file đã không còn và ghi lại
+            for suffix in ('', *compression.PRECOMPRESSED_SUFFIXES.values()):
+                try:
+                    os.remove(path(name) + suffix)
+                except FileNotFoundError:
+                    pass
+            deleted.append(name)
+    # Blob còn trong thời gian chờ: hẹn lần dọn tiếp theo
+    upcoming = session.execute(sa.select(sa.func.min(blob.c.released_at)).where(blob.c.refs <= 0)).scalar()
+    session.commit()
+    if upcoming is not None:
+        schedule_gc(max((upcoming - cutoff).total_seconds(), 0) + 60)
+    # File tạm của upload bị gián đoạn (process chết giữa chừng)
+    tmp = os.path.join(folder(), 'tmp')
+    for entry in os.listdir(tmp) if os.path.isdir(tmp) else ():
+        try:
+            if os.path.getmtime(os.path.join(tmp, entry)) < time.time() - GC_GRACE_SECONDS:
+                os.remove(os.path.join(tmp, entry))
+        except OSError:
+            pass
+    return len(deleted)
+
+
+# --- Phục vụ ---
+
+def serve(name):
+    if not NAME_PATTERN.fullmatch(name) or not os.path.isfile(path(name)):
+        abort(404)
+    # Tên là hash của nội dung: nội dung của một URL không bao giờ đổi
+    response = compression.send_precompressed(path(name), max_age=CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def _define_tables(metadata):
+    global blob
+    if 'blob' in metadata.tables:
+        return  # create_app() gọi lại trong cùng process: bảng đã được khai báo trên metadata dùng chung
+    blob = sa.Table(
+        'blob', metadata,
+        sa.Column('name', sa.String(80), primary_key=True),  # <sha256>.<đuôi>
+        sa.Column('size', sa.BigInteger, nullable=False, default=0),
+        sa.Column('refs', sa.Integer, nullable=False, default=0),
+        sa.Column('created_at', sa.DateTime, default=datetime.utcnow),
+        sa.Column('released_at', sa.DateTime, nullable=True),  # Lần cuối về 0 tham chiếu
+        sa.Index('ix_blob_released', 'refs', 'released_at'),
+    )
+
+
+def init_app(app, db):
+    global _db
+    _db = db
+    _define_tables(db.metadata)
+    app.add_url_rule(f'{URL_PREFIX}<name>', 'blob', serve)
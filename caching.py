@@ -0,0 +1,595 @@
+"""
+Cache cho dữ liệu đọc nhiều, ghi ít.
+
+TTLCache: LRU + TTL trong process. Mỗi worker gunicorn có bản riêng; dùng cho
+dữ liệu chỉ có ý nghĩa trong process (VD: file tĩnh đã nén).
+
+SharedCache: một TTLCache (tầng 1, trong process) đứng trước tầng dùng chung
+chọn bằng CACHE_URL khi init_app():
+
+    sqlite:///cache.db       (mặc định, tương đối với instance/) file SQLite
+                             trên máy: chung cho mọi worker của một host
+    redis://[:mật khẩu@]host:6379/0
+                             Redis hoặc server nói giao thức RESP: chung cho
+                             mọi node sau load balancer
+    memory://                không có tầng dùng chung (như TTLCache)
+
+Giá trị được pickle khi ghi xuống tầng dùng chung: chỉ trỏ CACHE_URL tới
+server tin cậy. Khóa được đặt trong namespace CACHE_NAMESPACE (mặc định: hash
+của DATABASE_URL) để các app dùng DB khác nhau không đọc nhầm dữ liệu của nhau.
+
+Invalidation: invalidate() / invalidate_tags() xóa mục ở tầng dùng chung và
+ghi một sự kiện vào nhật ký invalidation ở đó; mỗi process đọc nhật ký tối đa
+mỗi CACHE_SYNC_SECONDS giây và bỏ các mục tương ứng khỏi tầng 1. Worker / node
+khác thấy dữ liệu mới sau tối đa CACHE_SYNC_SECONDS thay vì `ttl` của cache.
+
+get_or_load() chống dồn tải (stampede) khi mục trượt cache: trong process chỉ
+một thread gọi loader, giữa các process chỉ process giữ khóa của khóa cache ở
+tầng dùng chung (tối đa CACHE_LOCK_SECONDS) nạp, các process khác chờ kết quả.
+
+Tầng dùng chung lỗi / mất kết nối thì cache chạy như TTLCache (cảnh báo trong
+log, request không bị lỗi). Hit/miss theo tầng, số lần nạp và lỗi được xuất
+trên /metrics (metrics.py).
+"""
+
+import hashlib
+import os
+import pickle
+import random
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from urllib.parse import unquote, urlsplit
+
+import metrics
+
+SYNC_SECONDS = float(os.environ.get('CACHE_SYNC_SECONDS', 1))
+LOCK_SECONDS = float(os.environ.get('CACHE_LOCK_SECONDS', 10))
+SOCKET_TIMEOUT = float(os.environ.get('CACHE_SOCKET_TIMEOUT', 0.5))
+EVENT_RETENTION_SECONDS = 3600
+EVENT_LIMIT = 10000
+TAG_SECONDS = 24 * 3600
+WARN_INTERVAL = 60
+RETRY_SECONDS = 5  # Tầng dùng chung lỗi: bỏ qua nó trong chừng này giây (không chờ timeout mỗi lần tra)
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, name, ttl=30, maxsize=10000):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """Giá trị còn hạn của `key` hoặc _MISSING; không ghi metrics."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING and entry[0] > now:
+                self._data.move_to_end(key)
+                return entry[1]
+            if entry is not _MISSING:
+                del self._data[key]
+        return _MISSING
+
+    def get(self, key, default=None):
+        if self.ttl <= 0:
+            return default
+        value = self.lookup(key)
+        metrics.record_cache(self.name, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None, tags=()):
+        if self.ttl <= 0:
+            return
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value, frozenset(tags))
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            return self._data.pop(key, None) is not None
+
+    def invalidate_tags(self, tags):
+        """Xóa các mục gắn một trong các tag `tags`; trả về số mục đã xóa."""
+        tags = set(tags)
+        with self._lock:
+            keys = [key for key, entry in self._data.items() if entry[2] & tags]
+            for key in keys:
+                del self._data[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# --- Tầng dùng chung ---
+
+class BackendError(RuntimeError):
+    """Lỗi do tầng dùng chung trả về."""
+
+
+class SQLiteBackend:
+    """Tầng dùng chung của một host: file SQLite (WAL), mỗi thread một kết nối."""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript('''
+            CREATE TABLE IF NOT EXISTS entry (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS entry_tag (tag TEXT, key TEXT, PRIMARY KEY (tag, key)) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS ix_entry_tag_key ON entry_tag (key);
+            CREATE TABLE IF NOT EXISTS event (id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL,
+                                              name TEXT NOT NULL, at REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS lock (key TEXT PRIMARY KEY, expires REAL NOT NULL);
+        ''')
+
+    def _connection(self):
+        # Kết nối không được dùng lại qua fork (gunicorn --preload)
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            # Mất vài mục cache khi mất điện không sao: không cần fsync mỗi lần ghi
+            connection.execute('PRAGMA synchronous=OFF')
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return self._local.connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def get(self, key):
+        row = self._connection().execute('SELECT value, expires FROM entry WHERE key = ?', (key,)).fetchone()
+        return row[0] if row and row[1] > time.time() else None
+
+    def set(self, key, data, ttl, tags=()):
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO entry (key, value, expires) VALUES (?, ?, ?)',
+                               (key, data, now + ttl))
+            connection.execute('DELETE FROM entry_tag WHERE key = ?', (key,))
+            connection.executemany('INSERT OR IGNORE INTO entry_tag (tag, key) VALUES (?, ?)',
+                                   [(tag, key) for tag in tags])
+            if random.random() < 0.01:
+                self._prune(connection, now)
+
+    def _prune(self, connection, now):
+        connection.execute('DELETE FROM entry_tag WHERE key IN (SELECT key FROM entry WHERE expires < ?)', (now,))
+        connection.execute('DELETE FROM entry WHERE expires < ?', (now,))
+        connection.execute('DELETE FROM lock WHERE expires < ?', (now,))
+        connection.execute('DELETE FROM event WHERE at < ?', (now - EVENT_RETENTION_SECONDS,))
+
+    def invalidate(self, kind, names):
+        """Xóa các mục theo khóa (kind='key') hoặc tag ('tag') và ghi sự kiện vào nhật ký."""
+        now = time.time()
+        placeholders = ','.join('?' * len(names))
+        with self._transaction() as connection:
+            if kind == 'tag':
+                keys = f'SELECT key FROM entry_tag WHERE tag IN ({placeholders})'
+                connection.execute(f'DELETE FROM entry WHERE key IN ({keys})', names)
+                connection.execute(f'DELETE FROM entry_tag WHERE key IN ({keys})', names)
+            else:
+                connection.execute(f'DELETE FROM entry WHERE key IN ({placeholders})', names)
+                connection.execute(f'DELETE FROM entry_tag WHERE key IN ({placeholders})', names)
+            connection.executemany('INSERT INTO event (kind, name, at) VALUES (?, ?, ?)',
+                                   [(kind, name, now) for name in names])
+
+    def events(self, after):
+        """(id cuối, [(kind, name)]) của các sự kiện sau `after`; danh sách là None nếu nhật ký đã mất một phần."""
+        connection = self._connection()
+        connection.execute('BEGIN')
+        try:
+            row = connection.execute("SELECT seq FROM sqlite_sequence WHERE name = 'event'").fetchone()
+            last = row[0] if row else 0
+            if after is None:
+                return last, []
+            rows = connection.execute('SELECT id, kind, name FROM event WHERE id > ? ORDER BY id', (after,)).fetchall()
+        finally:
+            connection.execute('COMMIT')
+        if last < after or (last > after and (not rows or rows[0][0] != after + 1)):
+            return last, None  # File cache bị tạo lại hoặc sự kiện cũ đã bị dọn
+        return last, [(kind, name) for _, kind, name in rows]
+
+    def acquire(self, key, ttl):
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM lock WHERE key = ? AND expires < ?', (key, now))
+            return connection.execute('INSERT OR IGNORE INTO lock (key, expires) VALUES (?, ?)',
+                                      (key, now + ttl)).rowcount == 1
+
+    def release(self, key):
+        self._connection().execute('DELETE FROM lock WHERE key = ?', (key,))
+
+
+class RedisBackend:
+    """Tầng dùng chung qua mạng: Redis hoặc server bất kỳ nói giao thức RESP.
+
+    Chỉ dùng các lệnh cơ bản (GET, SET PX/NX, DEL, SADD, SMEMBERS, PEXPIRE,
+    INCRBY, ZADD, ZRANGEBYSCORE, ZREMRANGEBYSCORE) nên chạy được với Redis,
+    Valkey, KeyDB hoặc server thay thế khi thử (benchmarks/cache_standin.py).
+    """
+
+    PREFIX = 'caching:'
+
+    def __init__(self, host='localhost', port=6379, db=0, password=None, timeout=SOCKET_TIMEOUT):
+        self.address = (host, port)
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        if getattr(self._local, 'pid', None) != os.getpid() or self._local.sock is None:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._local.sock, self._local.reader, self._local.pid = sock, sock.makefile('rb'), os.getpid()
+            setup = ([('AUTH', self.password)] if self.password else []) + ([('SELECT', self.db)] if self.db else [])
+            if setup:
+                self._execute(*setup)
+        return self._local.sock, self._local.reader
+
+    def _close(self):
+        sock = getattr(self._local, 'sock', None)
+        self._local.sock = None
+        if sock is not None and self._local.pid == os.getpid():
+            sock.close()
+
+    @staticmethod
+    def _encode(command):
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def _read(self, reader):
+        line = reader.readline()
+        if not line.endswith(b'\r\n'):
+            raise ConnectionError('Connection closed')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise BackendError(rest.decode())
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            size = int(rest)
+            if size < 0:
+                return None
+            data = reader.read(size + 2)
+            if len(data) != size + 2:
+                raise ConnectionError('Connection closed')
+            return data[:-2]
+        if kind == b'*':
+            size = int(rest)
+            return None if size < 0 else [self._read(reader) for _ in range(size)]
+        raise ConnectionError(f'Unexpected reply {line[:20]!r}')
+
+    def _execute(self, *commands):
+        """Gửi các lệnh trong một lượt (pipeline); trả về list kết quả theo thứ tự."""
+        sock, reader = self._connection()
+        try:
+            sock.sendall(b''.join(self._encode(command) for command in commands))
+            replies, error = [], None
+            for _ in commands:
+                try:
+                    replies.append(self._read(reader))
+                except BackendError as e:
+                    replies.append(None)
+                    error = error or e
+        except (OSError, ValueError):
+            self._close()
+            raise
+        if error:
+            raise error
+        return replies
+
+    def _entry(self, key):
+        return f'{self.PREFIX}e:{key}'
+
+    def _tag(self, tag):
+        return f'{self.PREFIX}t:{tag}'
+
+    def get(self, key):
+        return self._execute(('GET', self._entry(key)))[0]
+
+    def set(self, key, data, ttl, tags=()):
+        commands = [('SET', self._entry(key), data, 'PX', max(1, int(ttl * 1000)))]
+        for tag in tags:
+            commands += [('SADD', self._tag(tag), key), ('PEXPIRE', self._tag(tag), TAG_SECONDS * 1000)]
+        self._execute(*commands)
+
+    def invalidate(self, kind, names):
+        if kind == 'tag':
+            members = self._execute(*[('SMEMBERS', self._tag(tag)) for tag in names])
+            keys = [self._entry(key.decode()) for keys in members for key in keys or ()]
+            self._execute(('DEL', *keys, *[self._tag(tag) for tag in names]))
+        else:
+            self._execute(('DEL', *[self._entry(key) for key in names]))
+        last = self._execute(('INCRBY', f'{self.PREFIX}seq', len(names)))[0]
+        first = last - len(names) + 1
+        commands = [('ZADD', f'{self.PREFIX}events', first + i, f'{first + i}|{kind}|{name}')
+                    for i, name in enumerate(names)]
+        commands.append(('ZREMRANGEBYSCORE', f'{self.PREFIX}events', '-inf', f'({last - EVENT_LIMIT}'))
+        self._execute(*commands)
+
+    def events(self, after):
+        if after is None:
+            return int(self._execute(('GET', f'{self.PREFIX}seq'))[0] or 0), []
+        last, members = self._execute(('GET', f'{self.PREFIX}seq'),
+                                      ('ZRANGEBYSCORE', f'{self.PREFIX}events', f'({after}', '+inf'))
+        last = int(last or 0)
+        events = [member.decode().split('|', 2) for member in members]
+        if last < after or (last > after and (not events or int(events[0][0]) != after + 1)):
+            # Server bị xóa dữ liệu / sự kiện cũ đã bị dọn (hoặc đang được ghi dở)
+            return last, None
+        return (int(events[-1][0]) if events else after), [(kind, name) for _, kind, name in events]
+
+    def acquire(self, key, ttl):
+        return self._execute(('SET', f'{self.PREFIX}l:{key}', os.getpid(), 'NX', 'PX', int(ttl * 1000)))[0] == 'OK'
+
+    def release(self, key):
+        self._execute(('DEL', f'{self.PREFIX}l:{key}'))
+
+
+def backend_from_url(url, instance_path='.'):
+    """Tầng dùng chung theo CACHE_URL; None với memory://."""
+    parts = urlsplit(url)
+    if parts.scheme == 'memory':
+        return None
+    if parts.scheme == 'sqlite':
+        path = (parts.netloc + parts.path)[1:] if parts.path.startswith('/') else parts.path
+        return SQLiteBackend(path if os.path.isabs(path) else os.path.join(instance_path, path))
+    if parts.scheme == 'redis':
+        return RedisBackend(parts.hostname or 'localhost', parts.port or 6379,
+                            db=int(parts.path.strip('/') or 0),
+                            password=unquote(parts.password) if parts.password else None)
+    raise ValueError(f'Unsupported CACHE_URL scheme: {parts.scheme!r}')
+
+
+# --- Cache dùng chung ---
+
+_backend = None
+_namespace = ''
+_logger = None
+_caches = []
+_sync_lock = threading.Lock()
+_synced_at = 0.0
+_last_event = None
+_warned_at = 0.0
+_down_until = 0.0
+
+
+def _call(operation, fn, *args, default=None):
+    global _warned_at, _down_until
+    if _down_until and time.monotonic() < _down_until:
+        return default
+    try:
+        return fn(*args)
+    except Exception as e:
+        _down_until = time.monotonic() + RETRY_SECONDS
+        metrics.record_cache_error(operation)
+        if _logger is not None and time.monotonic() - _warned_at > WARN_INTERVAL:
+            _warned_at = time.monotonic()
+            _logger.warning(f'Shared cache {operation} failed, using the local tier only: {e}')
+        return default
+
+
+def _sync():
+    """Áp các invalidation của process / node khác vào tầng 1 (tối đa mỗi SYNC_SECONDS)."""
+    global _synced_at, _last_event
+    backend = _backend
+    if backend is None or time.monotonic() - _synced_at < SYNC_SECONDS:
+        return
+    if not _sync_lock.acquire(blocking=False):
+        return  # Thread khác đang đọc nhật ký
+    try:
+        _synced_at = time.monotonic()
+        result = _call('sync', backend.events, _last_event)
+        if result is None:
+            return
+        last, events = result
+        if events is None:
+            for cache in _caches:
+                cache.clear()
+            metrics.record_cache_invalidation('all', 'remote')
+        elif events:
+            keys = [name for kind, name in events if kind == 'key']
+            tags = [name for kind, name in events if kind == 'tag']
+            for cache in _caches:
+                for key in keys:
+                    cache.local.invalidate(key)
+                if tags:
+                    cache.local.invalidate_tags(tags)
+            for kind, _ in events:
+                metrics.record_cache_invalidation(kind, 'remote')
+        _last_event = last
+    finally:
+        _sync_lock.release()
+
+
+def invalidate_tags(*tags):
+    """Xóa mọi mục (của mọi SharedCache) gắn một trong các tag, ở mọi worker / node."""
+    names = [f'{_namespace}:{tag}' for tag in tags]
+    for cache in _caches:
+        cache.local.invalidate_tags(names)
+    if _backend is not None and names:
+        _call('invalidate', _backend.invalidate, 'tag', names)
+    for _ in names:
+        metrics.record_cache_invalidation('tag', 'local')
+
+
+class _Flight:
+    __slots__ = ('done', 'value', 'ok')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.ok = False
+
+
+class SharedCache:
+    """Cache hai tầng (trong process + dùng chung); cùng API get / set / invalidate với TTLCache."""
+
+    def __init__(self, name, ttl=30, maxsize=10000):
+        self.name = name
+        self.ttl = ttl
+        self.local = TTLCache(name, ttl, maxsize)
+        self._flights = {}
+        self._lock = threading.Lock()
+        _caches.append(self)
+
+    def _key(self, key):
+        return f'{_namespace}:{self.name}:{key!r}'
+
+    def _fetch(self, full_key):
+        # Tầng 1 rồi tới tầng dùng chung; mục lấy từ tầng dùng chung được chép lên tầng 1
+        value = self.local.lookup(full_key)
+        metrics.record_cache_tier(self.name, 'local', value is not _MISSING)
+        backend = _backend
+        if value is not _MISSING or backend is None:
+            return value
+        data = _call('get', backend.get, full_key)
+        if data is not None:
+            try:
+                value, tags, expires = pickle.loads(data)
+            except Exception:
+                value = _MISSING  # Lớp của giá trị đã đổi sau khi deploy: coi như trượt
+            else:
+                self.local.set(full_key, value, ttl=min(self.ttl, expires - time.time()), tags=tags)
+        metrics.record_cache_tier(self.name, 'shared', value is not _MISSING)
+        return value
+
+    def get(self, key, default=None):
+        if self.ttl <= 0:
+            return default
+        _sync()
+        value = self._fetch(self._key(key))
+        metrics.record_cache(self.name, value is not _MISSING)
+        return default if value is _MISSING else value
+
+    def set(self, key, value, ttl=None, tags=()):
+        if self.ttl <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        full_key = self._key(key)
+        tags = tuple(f'{_namespace}:{tag}' for tag in tags)
+        self.local.set(full_key, value, ttl, tags)
+        if _backend is not None:
+            data = pickle.dumps((value, tags, time.time() + ttl), pickle.HIGHEST_PROTOCOL)
+            _call('set', _backend.set, full_key, data, ttl, tags)
+
+    def get_or_load(self, key, loader, ttl=None, tags=()):
+        """Giá trị của `key`; khi trượt cache chỉ một thread / process gọi `loader()` (kết quả None không được cache)."""
+        value = self.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.ttl <= 0:
+            return loader()
+        full_key = self._key(key)
+        with self._lock:
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = _Flight()
+        if not leader:
+            if flight.done.wait(LOCK_SECONDS) and flight.ok:
+                metrics.record_cache_load(self.name, 'waited')
+                return flight.value
+            metrics.record_cache_load(self.name, 'timeout')
+            return loader()
+        try:
+            flight.value = self._load(key, full_key, loader, ttl, tags)
+            flight.ok = True
+            return flight.value
+        finally:
+            with self._lock:
+                del self._flights[full_key]
+            flight.done.set()
+
+    def _load(self, key, full_key, loader, ttl, tags):
+        backend = _backend
+        # Lỗi tầng dùng chung: coi như đã có khóa và tự nạp
+        if backend is not None and not _call('lock', backend.acquire, full_key, LOCK_SECONDS, default=True):
+            # Process khác đang nạp: chờ kết quả xuất hiện ở tầng dùng chung
+            deadline = time.monotonic() + LOCK_SECONDS
+            delay = 0.005
+            while time.monotonic() < deadline:
+                time.sleep(delay)
+                delay = min(delay * 2, 0.1)
+                value = self._fetch(full_key)
+                if value is not _MISSING:
+                    metrics.record_cache_load(self.name, 'waited')
+                    return value
+            metrics.record_cache_load(self.name, 'timeout')
+            backend = None
+        try:
+            # Process giữ khóa trước có thể vừa ghi xong
+            value = self._fetch(full_key) if backend is not None else _MISSING
+            if value is not _MISSING:
+                return value
+            metrics.record_cache_load(self.name, 'loaded')
+            value = loader()
+            if value is not None:
+                self.set(key, value, ttl, tags)
+            return value
+        finally:
+            if backend is not None:
+                _call('unlock', backend.release, full_key)
+
+    def invalidate(self, *keys):
+        """Xóa các khóa ở tầng 1 của process này ngay, ở các process / node khác sau tối đa SYNC_SECONDS."""
+        full_keys = [self._key(key) for key in keys]
+        for full_key in full_keys:
+            self.local.invalidate(full_key)
+            metrics.record_cache_invalidation('key', 'local')
+        if _backend is not None and full_keys:
+            _call('invalidate', _backend.invalidate, 'key', full_keys)
+
+    def clear(self):
+        """Xóa tầng 1 của process này."""
+        self.local.clear()
+
+    def __len__(self):
+        return len(self.local)
+
+
+def init_app(app):
+    """Chọn tầng dùng chung theo CACHE_URL (mặc định: instance/cache.db)."""
+    global _backend, _namespace, _logger, _last_event, _synced_at, _down_until
+    _logger = app.logger
+    database_url = app.config['SQLALCHEMY_DATABASE_URI']
+    _namespace = os.environ.get('CACHE_NAMESPACE') or hashlib.sha1(database_url.encode()).hexdigest()[:8]
+    url = os.environ.get('CACHE_URL', 'sqlite:///cache.db')
+    try:
+        _backend = backend_from_url(url, app.instance_path)
+    except Exception as e:
+        _backend = None
+        app.logger.warning(f'Shared cache {url!r} unavailable, caching per process only: {e}')
+    # Dữ liệu trong tầng 1 có thể thuộc app / DB trước đó (nhiều create_app() trong một process)
+    _last_event, _synced_at, _down_until = None, 0.0, 0.0
+    for cache in _caches:
+        cache.clear()
@@ -0,0 +1,28 @@
+"""
+Bản ghi nhẹ cho thẻ phim ở các trang danh sách.
+
+Trang chủ, thể loại, tìm kiếm, yêu thích và các danh sách gợi ý chỉ hiển thị
+poster, tiêu đề, tiêu đề phụ và lượt xem. Nạp cả entity Movie (kèm description
+dạng Text, video_url...) rồi đưa vào identity map / theo dõi thay đổi của ORM
+là lãng phí. Ở đây chỉ SELECT đúng các cột cần và trả về namedtuple (bất biến,
+không có __dict__), không gắn với session.
+
+Template dùng được như Movie: card.title, card.url_key...
+"""
+
+from collections import namedtuple
+
+import sqlalchemy as sa
+
+MovieCard = namedtuple('MovieCard', ('id', 'url_key', 'slug', 'title', 'subtitle', 'poster_url', 'views'))
+
+
+def select(model):
+    """SELECT các cột của thẻ phim từ `model`; thêm where / join / order_by như query thường."""
+    return sa.select(*(getattr(model, name) for name in MovieCard._fields))
+
+
+def load(session, statement):
+    """Chạy `statement` (từ select()) và trả về danh sách MovieCard."""
+    make = MovieCard._make
+    return [make(row) for row in session.execute(statement)]
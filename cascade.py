@@ -0,0 +1,126 @@
+"""
+Xóa dây chuyền (cascade) bằng câu lệnh set-based.
+
+Mỗi loại đối tượng (movie, user, ...) đăng ký một danh sách bước: DELETE các
+dòng con hoặc UPDATE ... SET NULL khóa ngoại (tương đương ON DELETE CASCADE /
+SET NULL), chạy trước khi xóa dòng cha. Không load entity nào lên ORM.
+
+Nếu số dòng con vượt PURGE_INLINE_LIMIT, request chỉ "vô hiệu hóa" đối tượng
+(hook `before_purge`) và đưa job 'cascade.purge' vào hàng đợi (jobs.py); job
+xóa dần theo lô PURGE_BATCH_SIZE dòng, mỗi lô một transaction ngắn, rồi mới
+xóa dòng cha. Job bị ngắt giữa chừng sẽ được chạy lại và xóa tiếp phần còn lại.
+"""
+
+import os
+
+import sqlalchemy as sa
+
+import jobs
+
+PURGE_INLINE_LIMIT = int(os.environ.get('PURGE_INLINE_LIMIT', 10000))
+PURGE_BATCH_SIZE = int(os.environ.get('PURGE_BATCH_SIZE', 5000))
+PURGE_JOB = 'cascade.purge'
+
+_plans = {}
+
+
+class Step:
+    """Một bước cascade trên bảng con.
+
+    `model` là model ORM hoặc Table. `where(target_id)` trả về điều kiện chọn
+    các dòng con; `values` khác None thì UPDATE (SET NULL) thay vì DELETE. Giá
+    trị callable được gọi mỗi lần tạo câu lệnh (VD: datetime.utcnow cho updated_at).
+    """
+
+    def __init__(self, model, where, values=None):
+        self.table = getattr(model, '__table__', model)
+        self.where = where
+        self.values = values
+
+    def statement(self, target_id, limit=None):
+        condition = self.where(target_id)
+        if limit:
+            # Lô có giới hạn: chọn khóa chính trước (LIMIT trong subquery) rồi xóa/sửa theo khóa
+            # (bảng thống kê như movie_view_hourly có khóa chính gồm nhiều cột)
+            key = list(self.table.primary_key.columns)
+            batch = sa.select(*key).where(condition).limit(limit)
+            condition = (key[0].in_(batch.scalar_subquery()) if len(key) == 1
+                         else sa.tuple_(*key).in_(batch))
+        if self.values is None:
+            return sa.delete(self.table).where(condition)
+        values = {key: value() if callable(value) else value for key, value in self.values.items()}
+        return sa.update(self.table).where(condition).values(**values)
+
+    def count(self, session, target_id):
+        return session.execute(
+            sa.select(sa.func.count()).select_from(self.table).where(self.where(target_id))).scalar() or 0
+
+
+class Plan:
+    def __init__(self, model, steps, before_delete=None, before_purge=None):
+        self.table = model.__table__
+        self.steps = steps
+        self.before_delete = before_delete
+        self.before_purge = before_purge
+
+
+def register(kind, model, steps, before_delete=None, before_purge=None):
+    """Đăng ký cascade cho `kind`.
+
+    `before_delete(session, target_id)` chạy trong transaction xóa dòng cha
+    (VD: cập nhật thống kê); `before_purge(session, target_id)` chạy ngay trong
+    request khi việc xóa được chuyển sang job nền (VD: khóa tài khoản).
+    """
+    _plans[kind] = Plan(model, steps, before_delete, before_purge)
+
+
+def fanout(session, kind, target_id):
+    """Tổng số dòng con mà việc xóa sẽ động tới."""
+    return sum(step.count(session, target_id) for step in _plans[kind].steps)
+
+
+def _delete_parent(session, plan, target_id):
+    if plan.before_delete:
+        plan.before_delete(session, target_id)
+    return session.execute(sa.delete(plan.table).where(plan.table.c.id == target_id)).rowcount
+
+
+def delete(session, kind, target_id, inline_limit=None):
+    """Xóa đối tượng và các dòng phụ thuộc.
+
+    Trả về 'deleted' nếu đã xóa xong trong transaction hiện tại (caller commit),
+    hoặc 'scheduled' nếu đã chuyển sang job nền (đã commit).
+    """
+    plan = _plans[kind]
+    limit = PURGE_INLINE_LIMIT if inline_limit is None else inline_limit
+    if limit and fanout(session, kind, target_id) > limit:
+        if plan.before_purge:
+            plan.before_purge(session, target_id)
+        jobs.enqueue(PURGE_JOB, {'kind': kind, 'target_id': target_id}, session=session)
+        session.commit()
+        return 'scheduled'
+
+    for step in plan.steps:
+        session.execute(step.statement(target_id))
+    _delete_parent(session, plan, target_id)
+    return 'deleted'
+
+
+# --- Purge nền (job 'cascade.purge', xem models.py) ---
+
+def purge(session, kind, target_id, batch_size=PURGE_BATCH_SIZE):
+    """Xóa theo lô: mỗi lô tối đa `batch_size` dòng, commit ngay để giữ lock ngắn.
+
+    Chạy lại sau khi đã xóa xong dòng cha thì không làm gì (job có thể được thử lại).
+    """
+    plan = _plans[kind]
+    if session.execute(sa.select(plan.table.c.id).where(plan.table.c.id == target_id)).first() is None:
+        return
+    for step in plan.steps:
+        while True:
+            affected = session.execute(step.statement(target_id, limit=batch_size)).rowcount
+            session.commit()
+            if affected < batch_size:
+                break
+    _delete_parent(session, plan, target_id)
+    session.commit()
@@ -0,0 +1,151 @@
+"""
+Nén response (gzip / brotli) theo Accept-Encoding của client.
+
+Chỉ nén các kiểu văn bản (HTML, JSON, CSS, JS, SVG...); ảnh, video, file nén
+đã được nén sẵn nên bỏ qua. Response nhỏ hơn COMPRESS_MIN_SIZE byte cũng bỏ
+qua (header gzip + CPU không đáng). Response stream (xem streaming.py) được nén
+từng khối và flush ngay để trình duyệt nhận được phần đầu trang sớm.
+
+Brotli chỉ dùng khi cài gói `brotli` (tùy chọn); không có thì dùng gzip.
+File tĩnh (CSS/JS) đã nén được giữ trong cache theo ETag của file.
+"""
+
+import mimetypes
+import os
+import zlib
+
+from flask import request, send_file
+
+import caching
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli là tùy chọn
+    brotli = None
+
+ENABLED = os.environ.get('COMPRESS_RESPONSES', '1') != '0'
+MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+# Quality 4-5 cho nén động: gần bằng gzip -9 về kích thước nhưng nhanh hơn nhiều
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+COMPRESSIBLE_TYPES = {
+    'application/json', 'application/javascript', 'application/xml', 'application/manifest+json',
+    'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon',
+}
+
+_static_cache = caching.TTLCache('compressed_static', ttl=3600, maxsize=256)
+
+
+def encodings():
+    """Các encoding server hỗ trợ, theo thứ tự ưu tiên khi client chấp nhận ngang nhau."""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def is_compressible(mimetype):
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def compress(data, encoding):
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: định dạng gzip
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    """Nén một iterable theo từng khối, flush sau mỗi khối để không giữ dữ liệu lại."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        process, sync, finish = compressor.process, compressor.flush, compressor.finish
+    else:
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+        process, finish = compressor.compress, compressor.flush
+        sync = lambda: compressor.flush(zlib.Z_SYNC_FLUSH)  # noqa: E731
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = process(chunk) + sync()
+            if data:
+                yield data
+        yield finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def _compress_static(response, encoding):
+    # File tĩnh (send_file): nén một lần cho mỗi phiên bản file, lần sau lấy từ cache
+    etag = response.get_etag()[0]
+    key = (request.path, etag, encoding)
+    data = _static_cache.get(key) if etag else None
+    if data is not None:
+        response.response.close()
+        return data
+    response.direct_passthrough = False
+    data = compress(response.get_data(), encoding)
+    if etag:
+        _static_cache.set(key, data)
+    return data
+
+
+def compress_response(response):
+    if response.status_code != 200 or 'Content-Encoding' in response.headers:
+        return response
+    if not is_compressible(response.mimetype):
+        return response
+    # Kết quả khác nhau theo Accept-Encoding: cache trung gian phải tách theo header này
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(encodings())
+    if not encoding:
+        return response
+
+    if response.is_streamed and not response.direct_passthrough:
+        response.response = compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        length = response.content_length
+        if length is not None and length < MIN_SIZE:
+            return response
+        if response.direct_passthrough:
+            data = _compress_static(response, encoding)
+        else:
+            data = compress(response.get_data(), encoding)
+        if length is not None and len(data) >= length:
+            return response
+        response.set_data(data)
+
+    response.headers['Content-Encoding'] = encoding
+    # Cùng nội dung nhưng khác byte: ETag chuyển thành weak (If-None-Match so sánh weak)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+PRECOMPRESSED_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+
+def send_precompressed(path, **kwargs):
+    """send_file() cho file có bản nén sẵn (`path`.br / `path`.gz) cạnh nó.
+
+    Chọn bản nén theo Accept-Encoding; không nén lại lúc trả response.
+    """
+    available = [encoding for encoding, suffix in PRECOMPRESSED_SUFFIXES.items() if os.path.isfile(path + suffix)]
+    encoding = request.accept_encodings.best_match(available) if available else None
+    # mimetype theo file gốc, không theo đuôi .gz / .br
+    kwargs.setdefault('mimetype', mimetypes.guess_type(path)[0] or 'application/octet-stream')
+    response = send_file(path + PRECOMPRESSED_SUFFIXES.get(encoding, ''), **kwargs)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def init_app(app):
+    if not ENABLED:
+        return
+
+    app.after_request(compress_response)
@@ -0,0 +1,109 @@
+"""
+ETag / conditional GET.
+
+Mỗi view khai báo một "validator": vài giá trị rẻ (version, MAX(updated_at),
+COUNT(*) trên index...) thay đổi bất cứ khi nào nội dung thay đổi. ETag được
+tính từ validator, phiên bản build (template / static) và danh tính người dùng
+(trang có navbar, nút like... khác nhau theo người xem). Nếu client gửi
+If-None-Match khớp thì trả 304 ngay, không chạy các truy vấn nặng của view.
+
+Lượt xem (Movie.views) cố ý không làm đổi updated_at (xem touch_on_update), nên
+số lượt xem trong trang có thể cũ hơn một chút khi trả 304.
+"""
+
+import hashlib
+import os
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.orm import attributes
+
+_build_version = None
+
+
+def build_version():
+    """Dấu vân tay của template + static: deploy mới thì mọi ETag đều đổi."""
+    global _build_version
+    if _build_version is None:
+        latest = 0
+        for folder in (current_app.template_folder and os.path.join(current_app.root_path, current_app.template_folder),
+                       current_app.static_folder):
+            if not folder:
+                continue
+            for root, dirs, files in os.walk(folder):
+                # Bỏ qua file người dùng upload
+                dirs[:] = [d for d in dirs if d != 'uploads']
+                for name in files:
+                    try:
+                        latest = max(latest, os.path.getmtime(os.path.join(root, name)))
+                    except OSError:
+                        pass
+        _build_version = str(int(latest))
+    return _build_version
+
+
+def _identity():
+    if current_user.is_authenticated:
+        return (current_user.id, current_user.username, current_user.avatar_url, bool(current_user.is_admin))
+    return ('anon',)
+
+
+def make_etag(parts, personal=True):
+    """ETag cho `parts`, hoặc None nếu response không nên được cache (có flash đang chờ)."""
+    if session.get('_flashes'):
+        return None
+    payload = [build_version(), *(_identity() if personal else ()), *parts]
+    return hashlib.sha1(repr(payload).encode()).hexdigest()[:24]
+
+
+def not_modified(etag, personal=True):
+    """Response 304 nếu If-None-Match khớp `etag`, ngược lại None.
+
+    So sánh weak (RFC 7232): response đã nén mang ETag dạng W/"..." (compression.py).
+    """
+    if etag and request.if_none_match.contains_weak(etag):
+        response = current_app.response_class(status=304)
+        return tag_response(response, etag, personal)
+    return None
+
+
+def tag_response(response, etag, personal=True):
+    if etag and response.status_code in (200, 304):
+        response.set_etag(etag)
+        # Luôn hỏi lại server (rẻ nhờ 304); trang cá nhân hóa không cho proxy cache chung
+        response.headers['Cache-Control'] = ('private, ' if personal else '') + 'no-cache'
+    return response
+
+
+def etag_view(validator, personal=True):
+    """Decorator: `validator(*args, **kwargs)` trả về tuple giá trị rẻ, hoặc None để bỏ qua ETag."""
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            parts = validator(*args, **kwargs)
+            etag = make_etag(parts, personal) if parts is not None else None
+            early = not_modified(etag, personal)
+            if early is not None:
+                return early
+            return tag_response(make_response(f(*args, **kwargs)), etag, personal)
+        return wrapper
+    return decorator
+
+
+def touch_on_update(model, column='updated_at', ignore=()):
+    """Cập nhật `column` khi có cột nào khác ngoài `ignore` thay đổi qua ORM.
+
+    Câu UPDATE set-based (Core) không đi qua event này, nên phải tự set `column`.
+    """
+    ignored = set(ignore) | {column}
+    columns = [c.key for c in model.__mapper__.column_attrs if c.key not in ignored]
+
+    @event.listens_for(model, 'before_update')
+    def _touch(mapper, connection, target):
+        if any(attributes.get_history(target, key).has_changes() for key in columns):
+            setattr(target, column, datetime.utcnow())
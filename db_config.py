@@ -0,0 +1,106 @@
+"""
+Cấu hình engine cơ sở dữ liệu theo từng backend.
+
+SQLite (mặc định) chạy dưới nhiều worker gunicorn nên cần WAL + busy timeout
+để reader không bị writer chặn và các commit nhỏ (lượt xem, lịch sử xem,
+like) không văng lỗi `database is locked`. Postgres/MySQL (qua DATABASE_URL)
+chỉ cần pool được giới hạn theo số worker.
+"""
+
+import os
+
+from sqlalchemy import event
+
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+# PRAGMA áp dụng cho mỗi kết nối SQLite mới (thứ tự có ý nghĩa: journal_mode trước)
+SQLITE_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('busy_timeout', _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    ('mmap_size', _env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    # Giá trị âm = KiB (mặc định 64 MB page cache mỗi kết nối)
+    ('cache_size', -_env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+    ('temp_store', 'MEMORY'),
+)
+
+
+def is_sqlite(uri):
+    return (uri or '').startswith('sqlite')
+
+
+def is_sqlite_memory(uri):
+    return is_sqlite(uri) and (uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri)
+
+
+def engine_options(uri):
+    """Trả về SQLALCHEMY_ENGINE_OPTIONS phù hợp với backend của `uri`."""
+    if is_sqlite(uri):
+        if is_sqlite_memory(uri):
+            # In-memory DB dùng SingletonThreadPool/StaticPool, không có pool_size
+            return {'connect_args': {'check_same_thread': False}}
+        busy_timeout = _env_int('SQLITE_BUSY_TIMEOUT_MS', 5000)
+        return {
+            # timeout của sqlite3 (giây) khớp với PRAGMA busy_timeout
+            'connect_args': {'timeout': busy_timeout / 1000, 'check_same_thread': False},
+            # SQLite chỉ có một writer: pool nhỏ mỗi worker là đủ, kết nối thừa chỉ tranh lock
+            'pool_size': _env_int('DB_POOL_SIZE', 5),
+            'max_overflow': _env_int('DB_MAX_OVERFLOW', 5),
+            'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+        }
+
+    # Postgres / MySQL: tổng kết nối = workers * (pool_size + max_overflow)
+    return {
+        'pool_size': _env_int('DB_POOL_SIZE', 5),
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': _env_int('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': True,
+    }
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas=SQLITE_PRAGMAS):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def install_sqlite_pragmas(engine, pragmas=SQLITE_PRAGMAS):
+    """Gắn listener `connect` để mọi kết nối SQLite mới đều có PRAGMA."""
+    if engine.dialect.name != 'sqlite':
+        return False
+    if getattr(engine, '_pragmas_installed', False):
+        return True
+
+    @event.listens_for(engine, 'connect')
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    engine._pragmas_installed = True
+    return True
+
+
+def configure_engines(db):
+    """Áp dụng PRAGMA cho tất cả engine của Flask-SQLAlchemy (cần app context)."""
+    for engine in db.engines.values():
+        install_sqlite_pragmas(engine)
+
+
+def dispose_engines(db, close=True):
+    """Bỏ pool kết nối của mọi engine (cần app context).
+
+    Gọi với close=True trong process cha trước khi fork (gunicorn --preload),
+    và close=False trong process con ngay sau fork: con không dùng chung socket
+    với cha, cũng không đóng hộ kết nối của cha.
+    """
+    for engine in db.engines.values():
+        engine.dispose(close=close)
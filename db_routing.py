@@ -0,0 +1,106 @@
+"""
+Định tuyến đọc/ghi: view chỉ đọc (SELECT) đi tới replica, mọi ghi đi tới primary.
+
+Replica được khai báo qua biến môi trường DATABASE_REPLICA_URLS (nhiều URL
+cách nhau bằng dấu phẩy) và được đăng ký như các bind `replica_0`,
+`replica_1`... trong SQLALCHEMY_BINDS. Không cấu hình replica thì mọi truy vấn
+vẫn đi primary như cũ.
+
+Read-your-writes: sau khi người dùng tự ghi (bình luận, đổi hồ sơ...), các
+request tiếp theo của chính họ đọc từ primary trong DB_REPLICA_STICKY_SECONDS
+giây để không thấy dữ liệu cũ do replica trễ.
+"""
+
+import os
+import random
+import time
+from functools import wraps
+
+import sqlalchemy as sa
+from flask import g, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+
+import db_config
+
+REPLICA_BIND_PREFIX = 'replica_'
+STICKY_SESSION_KEY = '_db_primary_until'
+
+
+def replica_urls():
+    raw = os.environ.get('DATABASE_REPLICA_URLS', '')
+    return [url.strip() for url in raw.split(',') if url.strip()]
+
+
+def replica_binds(urls):
+    """Tạo cấu hình SQLALCHEMY_BINDS cho danh sách URL replica."""
+    return {
+        f'{REPLICA_BIND_PREFIX}{i}': {'url': url, **db_config.engine_options(url)}
+        for i, url in enumerate(urls)
+    }
+
+
+def sticky_seconds():
+    try:
+        return float(os.environ.get('DB_REPLICA_STICKY_SECONDS', 5))
+    except ValueError:
+        return 5.0
+
+
+def _replica_requested():
+    if not has_request_context() or not g.get('db_use_replica'):
+        return False
+    return not g.get('db_wrote')
+
+
+class RoutingSession(Session):
+    """Session chọn engine replica cho SELECT trong các view được đánh dấu `use_replica`."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing
+                and not isinstance(clause, sa.sql.expression.UpdateBase)
+                and _replica_requested()):
+            keys = [key for key in self._db.engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+            if keys:
+                return self._db.engines[random.choice(keys)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _mark_write():
+    # Đã ghi trong request này: các truy vấn sau đó phải đọc primary
+    if has_request_context():
+        g.db_wrote = True
+
+
+@sa.event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush_write(db_session, flush_context):
+    _mark_write()
+
+
+@sa.event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_statement_write(orm_execute_state):
+    # UPDATE / DELETE / INSERT chạy thẳng qua session.execute() không đi qua flush
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        _mark_write()
+
+
+def use_replica(f):
+    """Đánh dấu view chỉ đọc: GET/HEAD được phép đọc từ replica."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if request.method in ('GET', 'HEAD'):
+            g.db_use_replica = session.get(STICKY_SESSION_KEY, 0) < time.time()
+        return f(*args, **kwargs)
+    return decorated_function
+
+
+def has_replicas(app):
+    return any(key.startswith(REPLICA_BIND_PREFIX) for key in app.config.get('SQLALCHEMY_BINDS') or {})
+
+
+def init_app(app):
+    @app.after_request
+    def _remember_primary(response):
+        # Read-your-writes: ghim người dùng vào primary một thời gian sau khi họ ghi
+        if g.get('db_wrote') and has_replicas(app):
+            session[STICKY_SESSION_KEY] = time.time() + sticky_seconds()
+        return response
@@ -0,0 +1,54 @@
+"""
+Cấu hình Gunicorn (tự được nạp khi chạy `gunicorn app:app` trong thư mục này).
+
+Các tham số trên dòng lệnh (--workers, --bind, --timeout) vẫn được ưu tiên.
+
+Mặc định app được tạo một lần trong master (preload, GUNICORN_PRELOAD=0 để
+tắt) rồi các worker fork ra dùng lại: worker không phải import / chạy
+migration lại, và pool kết nối DB được bỏ ngay sau fork (post_fork).
+"""
+
+import os
+import shutil
+import time
+
+# Thư mục dùng chung cho metrics Prometheus của các worker (xem metrics.py).
+# Phải được đặt trước khi worker import app.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'prometheus'))
+# Với preload, master import app (và prometheus_client) trước on_starting
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+
+def on_starting(server):
+    # Xóa số liệu của lần chạy trước
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def when_ready(server):
+    # Master không phục vụ request: bỏ các gauge nó đã ghi khi preload (pool DB, thời gian khởi động)
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(os.getpid())
+
+
+def post_fork(server, worker):
+    worker.forked_at = time.perf_counter()
+    application = worker.app.callable  # Đã tạo trong master khi preload, None nếu không
+    if application is not None:
+        from app import after_fork
+        after_fork(application)
+
+
+def post_worker_init(worker):
+    # Thời gian từ fork tới khi worker sẵn sàng: gồm cả import + create_app nếu không preload
+    from app import report_boot
+    report_boot(worker.wsgi, time.perf_counter() - worker.forked_at)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,349 @@
+"""
+Hàng đợi job nền bền vững, lưu trong chính database của app (bảng `job`).
+
+Khai báo và đưa job vào hàng đợi:
+
+    @jobs.task('stats.recompute', priority=-1, timeout=600)
+    def recompute_stats_job():
+        ...
+
+    jobs.enqueue('stats.recompute')                        # transaction riêng
+    jobs.enqueue('movie.process', {'movie_id': 1}, session=db.session)  # cùng transaction với request
+
+Xử lý job:
+  - `python worker.py --processes N`: N process con, mỗi process lấy job từ
+    DB và chạy trong app context (khuyên dùng khi deploy).
+  - JOBS_EMBEDDED_WORKER=1 (mặc định): mỗi process web còn có một thread xử
+    lý job, để app chạy được ngay cả khi không bật worker riêng. Đặt 0 khi đã
+    chạy worker.py. Thread này bỏ qua các task khai báo `embedded=False` (job
+    chạy lâu như ffmpeg không được chiếm process web): chúng chỉ chạy trong worker.py.
+
+Mỗi job được "nhận" bằng một câu UPDATE có điều kiện và giữ lease tới
+`locked_until` (visibility timeout). Worker chết giữa chừng thì job hiện lại
+sau khi hết lease; lỗi thì thử lại với backoff lũy thừa tới `max_attempts` lần
+rồi chuyển sang 'failed'. Vì có thể chạy lại, job phải idempotent.
+Job có priority lớn hơn được lấy trước.
+"""
+
+import json
+import multiprocessing
+import os
+import random
+import signal
+import threading
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+import metrics
+
+EMBEDDED_WORKER = os.environ.get('JOBS_EMBEDDED_WORKER', '1') != '0'
+POLL_SECONDS = float(os.environ.get('JOBS_POLL_SECONDS', 2))
+DEFAULT_TIMEOUT = 300
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+RETENTION_DAYS = 7
+
+job = None
+
+_app = None
+_db = None
+_tasks = {}
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_embedded_pid = None
+
+
+class Task:
+    def __init__(self, name, fn, priority, max_attempts, timeout, embedded):
+        self.name = name
+        self.fn = fn
+        self.priority = priority
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.embedded = embedded
+
+
+def task(name, priority=0, max_attempts=DEFAULT_MAX_ATTEMPTS, timeout=DEFAULT_TIMEOUT, embedded=True):
+    """Decorator đăng ký hàm xử lý job `name`; hàm nhận payload dưới dạng keyword argument.
+
+    `embedded=False`: không chạy trong thread worker nhúng của process web, chỉ trong worker.py.
+    """
+    def decorator(fn):
+        _tasks[name] = Task(name, fn, priority, max_attempts, timeout, embedded)
+        return fn
+    return decorator
+
+
+def enqueue(name, payload=None, priority=None, delay=0, session=None, wake=True):
+    """Đưa job vào hàng đợi; trả về id job.
+
+    Có `session` thì job nằm trong transaction của session đó (chỉ tồn tại nếu
+    caller commit); không có thì ghi và commit ngay trong transaction riêng.
+    `wake=False` không khởi động worker nhúng (VD: migration chạy trong master
+    gunicorn; worker sẽ thấy job qua resume_pending).
+    """
+    spec = _tasks[name]
+    now = datetime.utcnow()
+    values = dict(
+        name=name,
+        payload=json.dumps(payload or {}),
+        priority=spec.priority if priority is None else priority,
+        status='queued',
+        attempts=0,
+        max_attempts=spec.max_attempts,
+        run_at=now + timedelta(seconds=delay),
+        created_at=now,
+    )
+    if session is not None:
+        job_id = session.execute(job.insert().values(**values)).inserted_primary_key[0]
+    else:
+        with _db.engine.begin() as connection:
+            job_id = connection.execute(job.insert().values(**values)).inserted_primary_key[0]
+    if EMBEDDED_WORKER and wake:
+        _ensure_embedded()
+        _wakeup.set()
+    return job_id
+
+
+# --- Nhận và chạy job ---
+
+def _ready(now):
+    return sa.or_(
+        sa.and_(job.c.status == 'queued', job.c.run_at <= now),
+        # Hết visibility timeout: worker đang giữ job coi như đã chết
+        sa.and_(job.c.status == 'running', job.c.locked_until < now),
+    )
+
+
+def claim(session, names=None):
+    """Nhận một job sẵn sàng; trả về dòng job (đã tăng attempts) hoặc None."""
+    now = datetime.utcnow()
+    stmt = (sa.select(job.c.id, job.c.name, job.c.attempts, job.c.max_attempts)
+            .where(_ready(now))
+            .order_by(job.c.priority.desc(), job.c.run_at, job.c.id).limit(10))
+    if names:
+        stmt = stmt.where(job.c.name.in_(names))
+    for candidate in session.execute(stmt).all():
+        if candidate.attempts >= candidate.max_attempts:
+            # Hết lease ở lần thử cuối: không chạy lại nữa
+            session.execute(job.update().where(job.c.id == candidate.id, _ready(now))
+                            .values(status='failed', locked_until=None, last_error='Visibility timeout exceeded'))
+            session.commit()
+            continue
+        spec = _tasks.get(candidate.name)
+        timeout = spec.timeout if spec else DEFAULT_TIMEOUT
+        claimed = session.execute(
+            job.update().where(job.c.id == candidate.id, _ready(now))
+            .values(status='running', attempts=job.c.attempts + 1, started_at=now,
+                    locked_until=now + timedelta(seconds=timeout))
+        ).rowcount
+        session.commit()
+        if claimed:
+            return session.execute(sa.select(job).where(job.c.id == candidate.id)).one()
+    session.commit()
+    return None
+
+
+def _backoff(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish(session, row, **values):
+    # Chỉ cập nhật nếu job chưa bị worker khác nhận lại sau khi hết lease
+    session.execute(job.update().where(job.c.id == row.id, job.c.attempts == row.attempts)
+                    .values(locked_until=None, **values))
+    session.commit()
+
+
+def execute(session, row):
+    """Chạy job đã nhận; trả về True nếu thành công."""
+    spec = _tasks.get(row.name)
+    started = time.perf_counter()
+    metrics.observe_job(row.name, 'wait', (datetime.utcnow() - row.run_at).total_seconds())
+    try:
+        if spec is None:
+            raise LookupError(f'Unknown job {row.name}')
+        spec.fn(**json.loads(row.payload or '{}'))
+        session.commit()
+    except Exception as e:
+        session.rollback()
+        failed = row.attempts >= row.max_attempts
+        _finish(session, row, status='failed' if failed else 'queued', last_error=f'{type(e).__name__}: {e}'[:1000],
+                run_at=datetime.utcnow() + timedelta(seconds=0 if failed else _backoff(row.attempts)))
+        metrics.observe_job(row.name, 'run', time.perf_counter() - started, 'failed' if failed else 'retry')
+        _app.logger.warning(f'Job {row.id} ({row.name}) attempt {row.attempts}/{row.max_attempts} failed: {e}')
+        return False
+    _finish(session, row, status='done', finished_at=datetime.utcnow())
+    metrics.observe_job(row.name, 'run', time.perf_counter() - started, 'done')
+    return True
+
+
+def run_one(names=None):
+    """Nhận và chạy một job (trong app context); trả về False nếu hàng đợi trống."""
+    with _app.app_context():
+        try:
+            row = claim(_db.session, names)
+            if row is None:
+                return False
+            execute(_db.session, row)
+            return True
+        finally:
+            _db.session.remove()
+
+
+def work(stop, names=None):
+    """Vòng lặp xử lý job tới khi `stop` (threading.Event) được set."""
+    while not stop.is_set():
+        try:
+            if run_one(names):
+                continue
+        except Exception as e:
+            _app.logger.error(f'Job worker error: {e}')
+        stop.wait(POLL_SECONDS)
+
+
+# --- Theo dõi / dọn dẹp ---
+
+def depth(session):
+    """Số job theo trạng thái, VD {'queued': 3, 'running': 1, 'failed': 2}."""
+    return dict(session.execute(sa.select(job.c.status, sa.func.count()).group_by(job.c.status)).all())
+
+
+def prune(session, days=RETENTION_DAYS):
+    """Xóa job đã xong quá `days` ngày (job 'failed' được giữ để xem lỗi)."""
+    deleted = session.execute(job.delete().where(
+        job.c.status == 'done', job.c.finished_at < datetime.utcnow() - timedelta(days=days))).rowcount
+    session.commit()
+    return deleted
+
+
+def _update_depth_metrics():
+    try:
+        metrics.set_job_depth(depth(_db.session))
+    except Exception:
+        _db.session.rollback()
+
+
+# --- Worker nhúng trong process web ---
+
+class _EmbeddedStop:
+    # Thread nhúng chỉ dừng khi process thoát; chờ bằng _wakeup để enqueue đánh thức ngay
+    def is_set(self):
+        return False
+
+    def wait(self, timeout):
+        _wakeup.wait(timeout)
+        _wakeup.clear()
+
+
+def _ensure_embedded():
+    global _embedded_pid
+    if _embedded_pid == os.getpid():
+        return
+    with _lock:
+        if _embedded_pid == os.getpid():
+            return
+        _embedded_pid = os.getpid()
+    names = [spec.name for spec in _tasks.values() if spec.embedded]
+    threading.Thread(target=work, args=(_EmbeddedStop(), names), name='job-worker', daemon=True).start()
+
+
+def resume_pending(session):
+    """Khởi động worker nhúng nếu còn job chờ từ lần chạy trước."""
+    pending = session.execute(
+        sa.select(sa.func.count()).select_from(job).where(
+            job.c.status.in_(('queued', 'running')),
+            job.c.name.in_([spec.name for spec in _tasks.values() if spec.embedded]))).scalar()
+    if pending and EMBEDDED_WORKER:
+        _ensure_embedded()
+        _wakeup.set()
+    return pending
+
+
+# --- Worker riêng (worker.py) ---
+
+def _child_main(factory, index, names):
+    factory()
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # Ctrl+C do process cha xử lý
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    _app.logger.info(f'Job worker {index} started (pid {os.getpid()})')
+    work(stop, names)
+
+
+def run_workers(factory, processes=2, names=None):
+    """Chạy `processes` process xử lý job, tự khởi động lại process chết, dừng khi nhận SIGTERM/SIGINT.
+
+    `factory`: hàm cấp module (pickle được) tạo app trong mỗi process con.
+    Khi dừng, mỗi process con nhận SIGTERM, chạy nốt job đang dở rồi thoát.
+    """
+    context = multiprocessing.get_context('spawn')
+    stop = threading.Event()
+    children = {}
+
+    def spawn(index):
+        child = context.Process(target=_child_main, args=(factory, index, names), name=f'job-worker-{index}')
+        child.start()
+        children[index] = child
+
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    for index in range(processes):
+        spawn(index)
+
+    last_prune = 0
+    while not stop.is_set():
+        for index, child in list(children.items()):
+            if not child.is_alive():
+                _app.logger.warning(f'Job worker {index} exited ({child.exitcode}), restarting')
+                spawn(index)
+        with _app.app_context():
+            _update_depth_metrics()
+            if time.time() - last_prune > 3600:
+                last_prune = time.time()
+                prune(_db.session)
+            _db.session.remove()
+        stop.wait(5)
+
+    for child in children.values():
+        child.terminate()
+    for child in children.values():
+        child.join(timeout=DEFAULT_TIMEOUT)
+        if child.is_alive():
+            child.kill()
+
+
+def _define_tables(metadata):
+    global job
+    if 'job' in metadata.tables:
+        return  # create_app() gọi lại trong cùng process: bảng đã được khai báo trên metadata dùng chung
+    job = sa.Table(
+        'job', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('name', sa.String(100), nullable=False),
+        sa.Column('payload', sa.Text, nullable=False, default='{}'),
+        sa.Column('priority', sa.Integer, nullable=False, default=0),
+        sa.Column('status', sa.String(20), nullable=False, default='queued'),  # queued/running/done/failed
+        sa.Column('attempts', sa.Integer, nullable=False, default=0),
+        sa.Column('max_attempts', sa.Integer, nullable=False, default=DEFAULT_MAX_ATTEMPTS),
+        sa.Column('run_at', sa.DateTime, nullable=False, default=datetime.utcnow),
+        sa.Column('locked_until', sa.DateTime, nullable=True),
+        sa.Column('created_at', sa.DateTime, default=datetime.utcnow),
+        sa.Column('started_at', sa.DateTime, nullable=True),
+        sa.Column('finished_at', sa.DateTime, nullable=True),
+        sa.Column('last_error', sa.String(1000), nullable=True),
+        sa.Index('ix_job_ready', 'status', 'priority', 'run_at'),
+    )
+
+
+def init_app(app, db):
+    global _app, _db
+    _app = app
+    _db = db
+    _define_tables(db.metadata)
+    # Độ sâu hàng đợi đọc từ DB mỗi lần /metrics được scrape
+    metrics.on_collect(_update_depth_metrics)
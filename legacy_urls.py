@@ -0,0 +1,160 @@
+"""
+Bảng tra link cũ của trang phim, giữ trong process: slug / id số -> url_key.
+
+Link cũ (slug cho SEO, /movie/<id>) vẫn bị crawler gọi liên tục; trước đây mỗi
+lần như vậy movie() chạy tới ba truy vấn nối tiếp (url_key, slug, id) rồi mới
+redirect 301. Với bảng tra này, redirect và 404 cho chuỗi không ứng với phim
+nào được trả lời mà không cần truy vấn DB:
+
+  - nạp toàn bộ một lần khi tạo app (gunicorn --preload: một lần trong master,
+    các worker dùng chung bản sao qua fork);
+  - thêm / sửa phim qua ORM được áp dụng ngay sau commit trong process đã ghi;
+    process khác cập nhật tăng dần theo updated_at (có index) sau tối đa
+    LEGACY_URLS_REFRESH_SECONDS giây;
+  - chuỗi có dạng url_key nhưng chưa có trong bảng (phim vừa được tạo ở worker
+    khác) vẫn được tra DB, một truy vấn như đường đi bình thường.
+
+Bảng chỉ gồm id, slug và url_key (chuỗi url_key dùng chung giữa các dict),
+khoảng 30 MB cho 100.000 phim.
+"""
+
+import os
+import re
+import threading
+import time
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+import metrics
+
+REFRESH_SECONDS = float(os.environ.get('LEGACY_URLS_REFRESH_SECONDS', 60))
+# Dạng của url_key sinh bởi Movie.generate_url_key(): 4 ký tự hex + 6 ký tự [a-z0-9]
+URL_KEY_PATTERN = re.compile(r'[0-9a-f]{4}[0-9a-z]{6}')
+
+_model = None
+_lock = threading.Lock()
+_keys = set()   # url_key hiện hành
+_slugs = {}     # slug -> url_key
+_ids = {}       # id -> url_key
+_refreshed_at = None
+_seen_until = None
+
+
+def register(model):
+    """Theo dõi `model` (cột id, slug, url_key, updated_at) qua insert / update bằng ORM."""
+    global _model
+    _model = model
+
+    @event.listens_for(model, 'after_insert')
+    @event.listens_for(model, 'after_update')
+    def _changed(mapper, connection, target):
+        session = object_session(target)
+        if session is not None and target.url_key:
+            session.info.setdefault('_legacy_urls', {})[target.id] = (target.slug, target.url_key)
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changed = session.info.pop('_legacy_urls', None)
+    if changed:
+        with _lock:
+            for movie_id, (slug, url_key) in changed.items():
+                _remember(movie_id, slug, url_key)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('_legacy_urls', None)
+
+
+def _remember(movie_id, slug, url_key):
+    _keys.add(url_key)
+    _ids[movie_id] = url_key
+    if slug:
+        # Slug cũ (trước khi đổi tiêu đề) vẫn redirect về đúng phim
+        _slugs[slug] = url_key
+
+
+def _columns():
+    return sa.select(_model.id, _model.slug, _model.url_key, _model.updated_at).where(_model.url_key != None)
+
+
+def load(session):
+    """Nạp lại toàn bộ bảng tra từ DB."""
+    global _keys, _slugs, _ids, _refreshed_at, _seen_until
+    keys, slugs, ids = set(), {}, {}
+    seen_until = None
+    for movie_id, slug, url_key, updated_at in session.execute(_columns()):
+        keys.add(url_key)
+        ids[movie_id] = url_key
+        if slug:
+            slugs[slug] = url_key
+        if updated_at and (seen_until is None or updated_at > seen_until):
+            seen_until = updated_at
+    with _lock:
+        _keys, _slugs, _ids = keys, slugs, ids
+        _seen_until = seen_until
+        _refreshed_at = time.monotonic()
+
+
+def refresh(session):
+    """Áp dụng các phim được thêm / sửa ở process khác kể từ lần nạp trước."""
+    global _refreshed_at, _seen_until
+    stmt = _columns()
+    if _seen_until is not None:
+        # >= : phim cập nhật cùng thời điểm với lần nạp trước có thể chưa được thấy
+        stmt = stmt.where(_model.updated_at >= _seen_until)
+    rows = session.execute(stmt).all()
+    with _lock:
+        for movie_id, slug, url_key, updated_at in rows:
+            _remember(movie_id, slug, url_key)
+            if updated_at and (_seen_until is None or updated_at > _seen_until):
+                _seen_until = updated_at
+        _refreshed_at = time.monotonic()
+
+
+def forget(movie_id):
+    """Bỏ phim đã xóa khỏi bảng tra của process hiện tại.
+
+    Process khác vẫn giữ mục cũ tới khi nạp lại; redirect tới url_key không còn
+    tồn tại chỉ dẫn tới một 404 bình thường.
+    """
+    with _lock:
+        url_key = _ids.pop(movie_id, None)
+        _keys.discard(url_key)
+
+
+def resolve(session, key):
+    """url_key hiện hành của phim ứng với `key` (url_key, slug hoặc id số).
+
+    Trả về (url_key, redirect): redirect=True nếu `key` là link cũ cần chuyển
+    hướng 301; (None, False) nếu không có phim nào.
+    """
+    if _refreshed_at is None:
+        load(session)
+    elif REFRESH_SECONDS > 0 and time.monotonic() - _refreshed_at > REFRESH_SECONDS:
+        refresh(session)
+
+    if key in _keys:
+        metrics.record_cache('legacy_urls', True)
+        return key, False
+    url_key = _slugs.get(key)
+    if url_key is None and key.isdigit():
+        url_key = _ids.get(int(key))
+    if url_key is not None:
+        metrics.record_cache('legacy_urls', True)
+        return url_key, True
+    if not URL_KEY_PATTERN.fullmatch(key):
+        metrics.record_cache('legacy_urls', True)
+        return None, False
+
+    # Có thể là phim vừa được tạo ở process khác
+    metrics.record_cache('legacy_urls', False)
+    row = session.execute(sa.select(_model.id, _model.slug).where(_model.url_key == key)).first()
+    if row is None:
+        return None, False
+    with _lock:
+        _remember(row.id, row.slug, key)
+    return key, False
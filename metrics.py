@@ -0,0 +1,206 @@
+"""
+Metrics kiểu Prometheus cho /metrics: độ trễ theo route (histogram), số request
+và lỗi, request đang xử lý, độ bão hòa pool DB, tỉ lệ hit cache và độ sâu các
+hàng đợi ghi.
+
+/metrics trả 404 cho tới khi đặt METRICS_TOKEN; Prometheus gửi token đó qua
+header Authorization: Bearer <token>.
+
+Chạy nhiều worker gunicorn thì đặt PROMETHEUS_MULTIPROC_DIR (gunicorn.conf.py
+tự làm việc này) để các worker ghi số liệu ra file mmap dùng chung và /metrics
+gộp lại đúng cho toàn bộ worker. Biến môi trường phải có trước khi import
+prometheus_client, nên module này cần được import trước mọi thứ dùng nó.
+"""
+
+import hmac
+import os
+import time
+
+from flask import Response, abort, g, request
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from sqlalchemy import event
+
+MULTIPROC_DIR = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+# Bucket (giây) tập trung vào khoảng 1 ms - 2.5 s của các trang HTML/JSON
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Thời gian xử lý request theo endpoint',
+    ['endpoint', 'method'], buckets=LATENCY_BUCKETS)
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Số request theo endpoint và mã trạng thái',
+    ['endpoint', 'method', 'status'])
+REQUEST_ERRORS = Counter(
+    'http_request_errors_total', 'Số request lỗi (5xx) theo endpoint',
+    ['endpoint'])
+IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'Số request đang xử lý',
+    multiprocess_mode='livesum')
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_connections_checked_out', 'Số kết nối DB đang được mượn khỏi pool',
+    ['bind'], multiprocess_mode='livesum')
+DB_POOL_CAPACITY = Gauge(
+    'db_pool_capacity', 'Số kết nối tối đa của pool (pool_size + max_overflow)',
+    ['bind'], multiprocess_mode='livesum')
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Số lần tra cache theo kết quả (hit/miss)',
+    ['cache', 'result'])
+CACHE_TIER_REQUESTS = Counter(
+    'cache_tier_requests_total', 'Số lần tra từng tầng của SharedCache (local / shared) theo kết quả',
+    ['cache', 'tier', 'result'])
+CACHE_LOADS = Counter(
+    'cache_loads_total', 'Xử lý khi SharedCache trượt: loaded (gọi loader), waited (chờ nơi khác nạp), timeout',
+    ['cache', 'result'])
+CACHE_INVALIDATIONS = Counter(
+    'cache_invalidations_total', 'Số invalidation theo loại (key / tag / all) và nguồn (local / remote)',
+    ['kind', 'origin'])
+CACHE_BACKEND_ERRORS = Counter(
+    'cache_backend_errors_total', 'Số lỗi của tầng cache dùng chung theo thao tác',
+    ['operation'])
+QUEUE_DEPTH = Gauge(
+    'write_queue_depth', 'Số mục đang chờ trong các hàng đợi ghi / job',
+    ['queue'], multiprocess_mode='livesum')
+
+JOB_QUEUE_DEPTH = Gauge(
+    'job_queue_jobs', 'Số job trong hàng đợi nền theo trạng thái (đọc từ DB khi scrape)',
+    ['status'], multiprocess_mode='mostrecent')
+# Bucket (giây) cho job nền: từ vài ms tới vài phút
+JOB_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+JOB_LATENCY = Histogram(
+    'job_duration_seconds', 'Thời gian chờ trong hàng đợi (wait) và thời gian chạy (run) của job',
+    ['job', 'phase'], buckets=JOB_BUCKETS)
+JOB_RESULTS = Counter(
+    'jobs_total', 'Số lần chạy job theo kết quả (done/retry/failed)',
+    ['job', 'result'])
+BOOT_SECONDS = Gauge(
+    'app_boot_seconds', 'Thời gian khởi động của process theo giai đoạn (import, create_app, worker...)',
+    ['phase'], multiprocess_mode='liveall')
+
+SKIP_ENDPOINTS = {None, 'static', 'metrics'}
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+_collect_hooks = []
+
+
+def record_cache(cache, hit):
+    """Ghi nhận một lần tra cache (`hit` True/False)."""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def record_cache_tier(cache, tier, hit):
+    CACHE_TIER_REQUESTS.labels(cache, tier, 'hit' if hit else 'miss').inc()
+
+
+def record_cache_load(cache, result):
+    CACHE_LOADS.labels(cache, result).inc()
+
+
+def record_cache_invalidation(kind, origin):
+    CACHE_INVALIDATIONS.labels(kind, origin).inc()
+
+
+def record_cache_error(operation):
+    CACHE_BACKEND_ERRORS.labels(operation).inc()
+
+
+def set_queue_depth(queue, depth):
+    QUEUE_DEPTH.labels(queue).set(depth)
+
+
+def observe_job(job, phase, seconds, result=None):
+    JOB_LATENCY.labels(job, phase).observe(max(seconds, 0))
+    if result:
+        JOB_RESULTS.labels(job, result).inc()
+
+
+def set_job_depth(counts):
+    for status in JOB_STATUSES:
+        JOB_QUEUE_DEPTH.labels(status).set(counts.get(status, 0))
+
+
+def set_boot_seconds(phase, seconds):
+    BOOT_SECONDS.labels(phase).set(seconds)
+
+
+def on_collect(hook):
+    """Đăng ký hàm được gọi ngay trước khi /metrics xuất số liệu (VD: đọc độ sâu hàng đợi từ DB)."""
+    if hook not in _collect_hooks:
+        _collect_hooks.append(hook)
+
+
+def start_request():
+    if request.endpoint in SKIP_ENDPOINTS:
+        return
+    g._metrics_start = time.perf_counter()
+    IN_PROGRESS.inc()
+
+
+def finish_request(response):
+    start = g.get('_metrics_start')
+    if start is not None:
+        endpoint = request.endpoint
+        REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - start)
+        REQUEST_COUNT.labels(endpoint, request.method, response.status_code).inc()
+        if response.status_code >= 500:
+            REQUEST_ERRORS.labels(endpoint).inc()
+    return response
+
+
+def end_request(exc=None):
+    if g.pop('_metrics_start', None) is not None:
+        IN_PROGRESS.dec()
+
+
+def set_pool_capacity(engine, bind='default'):
+    # Gauge theo từng process: process con fork từ master (--preload) phải tự đặt lại
+    size = getattr(engine.pool, 'size', None)
+    if callable(size):
+        DB_POOL_CAPACITY.labels(bind).set(size() + max(getattr(engine.pool, '_max_overflow', 0), 0))
+
+
+def instrument_engine(engine, bind='default'):
+    """Theo dõi số kết nối đang mượn so với sức chứa pool của một engine."""
+    checked_out = DB_POOL_CHECKED_OUT.labels(bind)
+    set_pool_capacity(engine, bind)
+
+    @event.listens_for(engine, 'checkout')
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+
+    @event.listens_for(engine, 'checkin')
+    def _on_checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+
+def render_metrics():
+    if MULTIPROC_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def init_app(app, db):
+    app.before_request(start_request)
+    app.after_request(finish_request)
+    app.teardown_request(end_request)
+
+    with app.app_context():
+        for key, engine in db.engines.items():
+            instrument_engine(engine, key or 'default')
+
+    @app.route('/metrics')
+    def metrics():
+        # Mặc định tắt: chỉ mở khi đặt METRICS_TOKEN, và yêu cầu header Authorization: Bearer <token>.
+        # Không dựa vào IP loopback: sau reverse proxy cùng máy mọi request đều đến từ 127.0.0.1
+        token = os.environ.get('METRICS_TOKEN')
+        if not token:
+            abort(404)
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+            abort(403)
+        for hook in _collect_hooks:
+            hook()
+        return Response(render_metrics(), mimetype=CONTENT_TYPE_LATEST)
@@ -0,0 +1,169 @@
+"""
+Tạo bảng và migration nhẹ (thêm cột / index còn thiếu) cho database hiện có.
+
+Chạy một lần trong create_app(); với `gunicorn --preload` là một lần trong
+process master cho mọi worker.
+"""
+
+from sqlalchemy import inspect, text
+
+import stats
+from models import db, Movie, refresh_resume_state, stat_sources
+
+
+def upgrade(app):
+    """create_all() rồi bổ sung cột / index cho DB tạo từ phiên bản cũ (cần app context)."""
+    db.create_all()
+
+    # Migration: Add columns if not exists
+    try:
+        inspector = inspect(db.engine)
+        columns = [col['name'] for col in inspector.get_columns('movie')]
+        
+        # Add url_key column
+        if 'url_key' not in columns:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN url_key VARCHAR(12)'))
+            db.session.commit()
+            app.logger.info('Added url_key column to movie table')
+            
+            try:
+                db.session.execute(text('CREATE UNIQUE INDEX ix_movie_url_key ON movie (url_key)'))
+                db.session.commit()
+            except Exception as idx_err:
+                app.logger.warning(f'Index creation note: {idx_err}')
+        
+        # Add series_id column for episodes
+        if 'series_id' not in columns:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN series_id INTEGER REFERENCES movie(id)'))
+            db.session.commit()
+            app.logger.info('Added series_id column to movie table')
+        
+        # Add episode_number column
+        if 'episode_number' not in columns:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN episode_number INTEGER'))
+            db.session.commit()
+            app.logger.info('Added episode_number column to movie table')
+        
+        # Add is_series column
+        if 'is_series' not in columns:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN is_series BOOLEAN DEFAULT 0'))
+            db.session.commit()
+            app.logger.info('Added is_series column to movie table')
+        
+        # Add franchise_id column
+        if 'franchise_id' not in columns:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN franchise_id INTEGER REFERENCES franchise(id)'))
+            db.session.commit()
+            app.logger.info('Added franchise_id column to movie table')
+        
+        # Add subtitle column (tiêu đề phụ)
+        if 'subtitle' not in columns:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN subtitle VARCHAR(200)'))
+            db.session.commit()
+            app.logger.info('Added subtitle column to movie table')
+        
+        # Add display_order column
+        if 'display_order' not in columns:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN display_order INTEGER DEFAULT 0'))
+            db.session.commit()
+            app.logger.info('Added display_order column to movie table')
+        
+        # Index cho sắp xếp / phân trang keyset ở trang chủ và admin
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_movie_display_order ON movie (display_order)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_movie_created_at ON movie (created_at)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_movie_views ON movie (views)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_user_created_at ON "user" (created_at)'))
+        # Index khóa ngoại cho các câu xóa / cập nhật dây chuyền (cascade.py)
+        for table, column in (('movie', 'category_id'), ('movie', 'franchise_id'), ('movie', 'series_id'),
+                              ('watch_history', 'user_id'), ('watch_history', 'movie_id'),
+                              ('favorite', 'user_id'), ('favorite', 'movie_id'),
+                              ('comment', 'user_id'), ('comment', 'movie_id'), ('comment', 'parent_id'),
+                              ('comment_like', 'comment_id')):
+            db.session.execute(text(f'CREATE INDEX IF NOT EXISTS ix_{table}_{column} ON {table} ({column})'))
+        db.session.commit()
+        
+        # Khởi tạo bảng thống kê lần đầu (hoặc sau khi bị xóa)
+        if not stats.totals(db.session):
+            stats.recompute(db.session, stat_sources())
+            app.logger.info('Initialized site_stat totals')
+        
+        # Rail "Xem tiếp": thêm cột tiến độ, gộp dòng lịch sử trùng rồi đặt unique (user_id, movie_id)
+        history_columns = [col['name'] for col in inspector.get_columns('watch_history')]
+        if 'duration' not in history_columns:
+            db.session.execute(text('ALTER TABLE watch_history ADD COLUMN duration INTEGER'))
+            db.session.execute(text('ALTER TABLE watch_history ADD COLUMN finished BOOLEAN DEFAULT 0'))
+            db.session.execute(text(
+                'DELETE FROM watch_history WHERE id NOT IN '
+                '(SELECT MAX(id) FROM watch_history GROUP BY user_id, movie_id)'))
+            db.session.commit()
+            app.logger.info('Added duration/finished columns to watch_history table')
+        db.session.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_watch_history_user_movie ON watch_history (user_id, movie_id)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_watch_history_user_recent ON watch_history (user_id, watched_at)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_movie_series_episode ON movie (series_id, episode_number)'))
+        db.session.commit()
+
+        # Trạng thái rail "Xem tiếp" tính sẵn lúc ghi (models.refresh_resume_state)
+        if 'resumable' not in [col['name'] for col in inspector.get_columns('watch_history')]:
+            db.session.execute(text('ALTER TABLE watch_history ADD COLUMN next_movie_id INTEGER'))
+            db.session.execute(text('ALTER TABLE watch_history ADD COLUMN resumable BOOLEAN DEFAULT FALSE NOT NULL'))
+            refresh_resume_state(db.session)
+            db.session.commit()
+            app.logger.info('Added next_movie_id/resumable columns to watch_history table')
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_watch_history_next_movie_id ON watch_history (next_movie_id)'))
+        db.session.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_watch_history_resume ON watch_history (user_id, watched_at) WHERE resumable'))
+        db.session.commit()
+
+        # updated_at làm validator cho ETag (conditional.py)
+        for table, backfill in (('movie', 'created_at'), ('comment', 'created_at'), ('category', 'CURRENT_TIMESTAMP')):
+            if 'updated_at' not in [col['name'] for col in inspector.get_columns(table)]:
+                db.session.execute(text(f'ALTER TABLE {table} ADD COLUMN updated_at TIMESTAMP'))
+                db.session.execute(text(f'UPDATE {table} SET updated_at = {backfill}'))
+                db.session.commit()
+                app.logger.info(f'Added updated_at column to {table} table')
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_movie_updated_at ON movie (updated_at)'))
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_comment_movie_updated ON comment (movie_id, updated_at)'))
+        db.session.commit()
+
+        # Điểm thịnh hành (trending.py)
+        if 'trending_score' not in [col['name'] for col in inspector.get_columns('movie')]:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN trending_score FLOAT DEFAULT 0'))
+            db.session.commit()
+            app.logger.info('Added trending_score column to movie table')
+        db.session.execute(text('CREATE INDEX IF NOT EXISTS ix_movie_trending_score ON movie (trending_score)'))
+        db.session.commit()
+
+        # Ảnh xem trước khi tua (thumbnails.py)
+        if 'thumbnails_url' not in [col['name'] for col in inspector.get_columns('movie')]:
+            db.session.execute(text('ALTER TABLE movie ADD COLUMN thumbnails_url VARCHAR(500)'))
+            db.session.commit()
+            app.logger.info('Added thumbnails_url column to movie table')
+
+        # Khóa sắp xếp keyset (pagination.py) không được NULL: so sánh với NULL loại dòng khỏi mọi trang.
+        # DB cũ: điền giá trị mặc định; SQLite không đổi được ràng buộc cột nên chỉ đặt NOT NULL trên PostgreSQL
+        # Inspector mới: inspector ở trên cache danh sách cột từ trước các ALTER TABLE phía trên
+        current = inspect(db.engine)
+        for table, column, backfill in (('movie', 'display_order', '0'), ('movie', 'views', '0'),
+                                        ('movie', 'created_at', 'CURRENT_TIMESTAMP'),
+                                        ('user', 'created_at', 'CURRENT_TIMESTAMP')):
+            # Đã NOT NULL thì bỏ qua: ALTER TABLE lấy ACCESS EXCLUSIVE lock và quét cả bảng mỗi lần khởi động
+            if not next(col['nullable'] for col in current.get_columns(table) if col['name'] == column):
+                continue
+            filled = db.session.execute(text(
+                f'UPDATE "{table}" SET {column} = {backfill} WHERE {column} IS NULL')).rowcount
+            if db.engine.dialect.name == 'postgresql':
+                db.session.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN {column} SET NOT NULL'))
+            db.session.commit()
+            if filled:
+                app.logger.info(f'Backfilled {filled} NULL {table}.{column} values')
+
+        # Generate url_key for movies that don't have one
+        movies_without_key = Movie.query.filter(Movie.url_key == None).all()
+        if movies_without_key:
+            for movie in movies_without_key:
+                movie.generate_url_key()
+            db.session.commit()
+            app.logger.info(f'Generated url_key for {len(movies_without_key)} movies')
+    except Exception as e:
+        db.session.rollback()
+        app.logger.warning(f'Migration note: {e}')
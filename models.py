@@ -0,0 +1,431 @@
+"""
+Model và các truy vấn dữ liệu dùng chung của ứng dụng.
+
+`db` chưa gắn với app nào: create_app() (app.py) gọi db.init_app(app), nên
+import module này không mở kết nối DB.
+"""
+
+from collections import namedtuple
+from datetime import datetime
+import re
+
+from flask_login import UserMixin
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import blobs
+import caching
+import cascade
+import conditional
+import db_routing
+import jobs
+import legacy_urls
+import series_nav
+import stats
+import thumbnails
+import trending
+
+db = SQLAlchemy(session_options={'class_': db_routing.RoutingSession})
+
+class User(UserMixin, db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(80), unique=True, nullable=False)
+    email = db.Column(db.String(120), unique=True, nullable=False)
+    password_hash = db.Column(db.String(255), nullable=False)
+    is_admin = db.Column(db.Boolean, default=False)
+    avatar_url = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)  # Khóa phân trang keyset: không NULL
+    watch_history = db.relationship('WatchHistory', backref='user', lazy=True, passive_deletes=True)
+    favorites = db.relationship('Favorite', backref='user', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+
+class Category(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    movies = db.relationship('Movie', backref='category', lazy=True, passive_deletes=True)
+
+class Franchise(db.Model):
+    """Nhóm các phim cùng series (VD: Maze Runner 1, 2, 3)"""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), unique=True, nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    poster_url = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    movies = db.relationship('Movie', backref='franchise', lazy=True, order_by='Movie.created_at', passive_deletes=True)
+
+def slugify(text):
+    """Tạo slug từ tiếng Việt"""
+    # Bảng chuyển đổi tiếng Việt
+    vietnamese_map = {
+        'à': 'a', 'á': 'a', 'ả': 'a', 'ã': 'a', 'ạ': 'a',
+        'ă': 'a', 'ằ': 'a', 'ắ': 'a', 'ẳ': 'a', 'ẵ': 'a', 'ặ': 'a',
+        'â': 'a', 'ầ': 'a', 'ấ': 'a', 'ẩ': 'a', 'ẫ': 'a', 'ậ': 'a',
+        'đ': 'd',
+        'è': 'e', 'é': 'e', 'ẻ': 'e', 'ẽ': 'e', 'ẹ': 'e',
+        'ê': 'e', 'ề': 'e', 'ế': 'e', 'ể': 'e', 'ễ': 'e', 'ệ': 'e',
+        'ì': 'i', 'í': 'i', 'ỉ': 'i', 'ĩ': 'i', 'ị': 'i',
+        'ò': 'o', 'ó': 'o', 'ỏ': 'o', 'õ': 'o', 'ọ': 'o',
+        'ô': 'o', 'ồ': 'o', 'ố': 'o', 'ổ': 'o', 'ỗ': 'o', 'ộ': 'o',
+        'ơ': 'o', 'ờ': 'o', 'ớ': 'o', 'ở': 'o', 'ỡ': 'o', 'ợ': 'o',
+        'ù': 'u', 'ú': 'u', 'ủ': 'u', 'ũ': 'u', 'ụ': 'u',
+        'ư': 'u', 'ừ': 'u', 'ứ': 'u', 'ử': 'u', 'ữ': 'u', 'ự': 'u',
+        'ỳ': 'y', 'ý': 'y', 'ỷ': 'y', 'ỹ': 'y', 'ỵ': 'y',
+    }
+    text = text.lower()
+    for vn_char, ascii_char in vietnamese_map.items():
+        text = text.replace(vn_char, ascii_char)
+    # Loại bỏ ký tự đặc biệt, giữ lại chữ và số
+    text = re.sub(r'[^a-z0-9\s-]', '', text)
+    # Thay khoảng trắng bằng dấu gạch ngang
+    text = re.sub(r'[\s_]+', '-', text)
+    # Loại bỏ dấu gạch ngang thừa
+    text = re.sub(r'-+', '-', text)
+    return text.strip('-')
+
+class Movie(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(200), nullable=False)
+    subtitle = db.Column(db.String(200), nullable=True)  # Tiêu đề phụ (thường là tên tiếng Anh)
+    slug = db.Column(db.String(250), unique=True, nullable=True)  # Deprecated, kept for backward compatibility
+    url_key = db.Column(db.String(12), unique=True, nullable=True)  # Random key for URL
+    description = db.Column(db.Text)
+    video_url = db.Column(db.String(500))
+    poster_url = db.Column(db.String(500))
+    subtitle_url = db.Column(db.String(500))  # URL file phụ đề (.vtt, .srt)
+    thumbnails_url = db.Column(db.String(500))  # Track WebVTT ảnh xem trước khi tua (thumbnails.py)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete='SET NULL'), nullable=True, index=True)
+    # views / created_at / display_order là khóa sắp xếp keyset (pagination.py): không được NULL
+    views = db.Column(db.Integer, nullable=False, default=0, index=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    display_order = db.Column(db.Integer, nullable=False, default=0, index=True)  # Thứ tự hiển thị trên trang chủ (thưa, xem ordering.py)
+    trending_score = db.Column(db.Float, default=0, index=True)  # Lượt xem gần đây giảm dần theo thời gian (trending.py)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)  # Validator cho ETag (không đổi khi chỉ tăng views)
+    # Franchise support (movie series like Maze Runner 1, 2, 3)
+    franchise_id = db.Column(db.Integer, db.ForeignKey('franchise.id', ondelete='SET NULL'), nullable=True, index=True)
+    # Episodes support (TV show episodes)
+    series_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='SET NULL'), nullable=True, index=True)  # Parent series ID (null if standalone or is series itself)
+    episode_number = db.Column(db.Integer, nullable=True)  # Episode number (null if standalone movie)
+    is_series = db.Column(db.Boolean, default=False)  # True if this is a series container (phim bộ)
+    watch_history = db.relationship('WatchHistory', backref='movie', lazy=True, passive_deletes=True)
+    episodes = db.relationship('Movie', backref=db.backref('series', remote_side=[id]), lazy=True, foreign_keys=[series_id], passive_deletes=True)
+    # Tìm tập kế tiếp / danh sách tập theo thứ tự
+    __table_args__ = (db.Index('ix_movie_series_episode', 'series_id', 'episode_number'),)
+    
+    def generate_slug(self):
+        """Tạo slug từ title - deprecated"""
+        base_slug = slugify(self.title)
+        slug = base_slug
+        counter = 1
+        while Movie.query.filter(Movie.slug == slug, Movie.id != self.id).first():
+            slug = f"{base_slug}-{counter}"
+            counter += 1
+        self.slug = slug
+        return slug
+    
+    def generate_url_key(self):
+        """Tạo url_key ngẫu nhiên dựa trên timestamp và random"""
+        import time
+        import random
+        import string
+        # Kết hợp timestamp (base36) + random chars để tạo key ngắn gọn
+        timestamp_part = hex(int(time.time()))[2:][-4:]  # 4 ký tự cuối của hex timestamp
+        random_part = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+        url_key = f"{timestamp_part}{random_part}"
+        # Đảm bảo unique
+        while Movie.query.filter(Movie.url_key == url_key, Movie.id != self.id).first():
+            random_part = ''.join(random.choices(string.ascii_lowercase + string.digits, k=6))
+            url_key = f"{timestamp_part}{random_part}"
+        self.url_key = url_key
+        return url_key
+
+# Thứ tự hiển thị mặc định của danh sách phim (trang chủ, admin)
+MOVIE_LIST_ORDER = (Movie.display_order.asc(), Movie.created_at.desc(), Movie.id.desc())
+
+class WatchHistory(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), nullable=False, index=True)
+    watched_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_position = db.Column(db.Integer, default=0)
+    duration = db.Column(db.Integer, nullable=True)  # Độ dài video (giây) do player báo về
+    finished = db.Column(db.Boolean, default=False)  # Đã xem gần hết (>= WATCH_FINISHED_RATIO)
+    # Trạng thái rail "Xem tiếp", tính lúc ghi (refresh_resume_state): tập kế tiếp nếu đã xem
+    # hết một tập, và dòng có hiện trên rail không (đang xem dở, hoặc đã xem hết và còn tập sau)
+    # (không khai báo khóa ngoại: tham chiếu được giữ đúng khi xóa phim, xem _movie_deleted)
+    next_movie_id = db.Column(db.Integer, nullable=True, index=True)
+    resumable = db.Column(db.Boolean, nullable=False, default=False)
+    # Mỗi người dùng một dòng cho mỗi phim
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'movie_id', name='uq_watch_history_user_movie'),
+        db.Index('ix_watch_history_user_recent', 'user_id', 'watched_at'),
+    )
+
+# Rail "Xem tiếp" đọc một khoảng giới hạn của index riêng phần chỉ gồm các dòng resumable
+db.Index('ix_watch_history_resume', WatchHistory.user_id, WatchHistory.watched_at,
+         sqlite_where=WatchHistory.resumable == True, postgresql_where=WatchHistory.resumable == True)
+
+WATCH_FINISHED_RATIO = 0.9
+
+def series_watch_rows(*series_ids):
+    """Điều kiện chọn các dòng lịch sử xem của mọi tập thuộc `series_ids`."""
+    return WatchHistory.movie_id.in_(db.select(Movie.id).where(Movie.series_id.in_([i for i in series_ids if i])))
+
+def refresh_resume_state(session, *criteria, exclude=None):
+    """Tính lại next_movie_id / resumable cho các dòng WatchHistory thỏa `criteria` (một câu UPDATE).
+
+    Gọi khi tiến độ xem đổi và khi danh sách tập của series đổi; `exclude` là id
+    phim sắp bị xóa (không được chọn làm tập kế tiếp).
+    """
+    movie = db.aliased(Movie)
+    following = db.aliased(Movie)
+    next_episode = (db.select(following.id)
+                    .where(movie.id == WatchHistory.movie_id,
+                           following.series_id == movie.series_id,
+                           following.episode_number > movie.episode_number,
+                           *([following.id != exclude] if exclude else []))
+                    .order_by(following.episode_number.asc(), following.id.asc()).limit(1)
+                    .scalar_subquery())
+    is_series = db.select(movie.is_series).where(movie.id == WatchHistory.movie_id).scalar_subquery()
+    finished = db.func.coalesce(WatchHistory.finished, False) == True
+    session.execute(
+        db.update(WatchHistory).where(*criteria).values(
+            next_movie_id=db.case((finished, next_episode), else_=None),
+            resumable=db.case((db.func.coalesce(is_series, False) == True, False),
+                              (finished, next_episode != None), else_=True))
+        .execution_options(synchronize_session=False))
+
+def continue_watching(user_id, limit=12):
+    """Rail "Xem tiếp": phim đang xem dở, hoặc tập kế tiếp nếu đã xem hết một tập.
+
+    Đọc tối đa `limit` dòng trên index ix_watch_history_resume; tập kế tiếp đã
+    được tính sẵn lúc ghi (refresh_resume_state).
+    """
+    next_episode = db.aliased(Movie)
+    rows = db.session.execute(
+        db.select(WatchHistory.last_position, WatchHistory.duration, WatchHistory.finished,
+                  Movie, next_episode.url_key.label('next_url_key'),
+                  next_episode.episode_number.label('next_number'))
+        .join(Movie, WatchHistory.movie_id == Movie.id)
+        .outerjoin(next_episode, WatchHistory.next_movie_id == next_episode.id)
+        .where(WatchHistory.user_id == user_id, WatchHistory.resumable == True)
+        .order_by(WatchHistory.watched_at.desc())
+        .limit(limit)
+    ).all()
+    items = []
+    for row in rows:
+        if row.finished:
+            if row.next_url_key is None:
+                continue  # Tập kế tiếp vừa bị xóa
+            items.append({'movie': row.Movie, 'progress': 0, 'position': 0,
+                          'next_url_key': row.next_url_key, 'next_number': row.next_number})
+        else:
+            progress = min(100, round(row.last_position * 100 / row.duration)) if row.duration else 0
+            items.append({'movie': row.Movie, 'progress': progress, 'position': row.last_position or 0,
+                          'next_url_key': None, 'next_number': None})
+    return items
+
+class Favorite(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class Comment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    movie_id = db.Column(db.Integer, db.ForeignKey('movie.id', ondelete='CASCADE'), nullable=False, index=True)
+    parent_id = db.Column(db.Integer, db.ForeignKey('comment.id', ondelete='SET NULL'), nullable=True, index=True)  # For replies
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)  # Đổi cả khi có like / bỏ like
+    user = db.relationship('User', backref=db.backref('comments', lazy=True, passive_deletes=True))
+    __table_args__ = (db.Index('ix_comment_movie_updated', 'movie_id', 'updated_at'),)
+    replies = db.relationship('Comment', backref=db.backref('parent', remote_side=[id]), lazy=True, passive_deletes=True)
+
+class CommentLike(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    comment_id = db.Column(db.Integer, db.ForeignKey('comment.id', ondelete='CASCADE'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    __table_args__ = (db.UniqueConstraint('user_id', 'comment_id', name='unique_comment_like'),)
+
+# updated_at tự cập nhật khi sửa qua ORM (validator cho ETag, xem conditional.py)
+conditional.touch_on_update(Movie, ignore=('views', 'trending_score'))
+conditional.touch_on_update(Category)
+conditional.touch_on_update(Comment)
+
+# Thống kê dashboard được duy trì tăng dần từ các thao tác ghi (xem stats.py)
+stats.track_count(Movie, 'movies', daily_key='new_movies')
+stats.track_count(User, 'users', daily_key='new_users')
+stats.track_count(Category, 'categories')
+stats.track_count(Franchise, 'franchises')
+stats.track_sum(Movie, 'views', 'total_views', daily_key='views')
+stats.track_viewers(WatchHistory)
+
+# Điểm thịnh hành (filter "trending" ở trang chủ) được tính nền vào Movie.trending_score
+trending.register(Movie, 'trending_score')
+
+# Link cũ của trang phim (slug, id số) được trả lời từ bảng tra trong process
+legacy_urls.register(Movie)
+
+# File upload lưu theo nội dung (blobs.py): đếm số cột đang trỏ tới mỗi blob
+blobs.track(Movie, 'poster_url', 'video_url', 'subtitle_url')
+blobs.track(User, 'avatar_url')
+
+# Job nền (jobs.py): chạy bởi worker.py hoặc thread worker nhúng trong process web
+@jobs.task('stats.recompute', priority=-1, max_attempts=3, timeout=900)
+def recompute_stats_job():
+    stats.recompute(db.session, stat_sources())
+
+@jobs.task('trending.refresh', max_attempts=3, timeout=900)
+def refresh_trending_job(force=False):
+    trending.refresh(force=force)
+
+@jobs.task('blobs.gc', priority=-1, max_attempts=3, timeout=900)
+def collect_blobs_job():
+    blobs.collect(db.session)
+
+@jobs.task(cascade.PURGE_JOB, priority=-1, timeout=3600)
+def purge_job(kind, target_id):
+    cascade.purge(db.session, kind, target_id)
+
+# ffmpeg có thể chạy hàng chục phút: chỉ chạy trong worker.py, không chiếm process web
+@jobs.task('movie.thumbnails', priority=-1, max_attempts=3, timeout=3600, embedded=False)
+def generate_thumbnails_job(movie_id, video_url):
+    movie = db.session.get(Movie, movie_id)
+    if movie is None or movie.video_url != video_url:
+        return  # Phim đã bị xóa hoặc đã đổi video (job cho video mới đã được đưa vào hàng đợi)
+    # Không giữ transaction đọc trong lúc ffmpeg chạy
+    db.session.rollback()
+    url = thumbnails.generate(movie_id, video_url)
+    movie = db.session.get(Movie, movie_id)
+    if movie is not None and movie.video_url == video_url:
+        movie.thumbnails_url = url
+
+def stat_sources():
+    """Câu truy vấn gốc để đối soát lại số tổng trong bảng site_stat"""
+    return {
+        'movies': db.select(db.func.count()).select_from(Movie),
+        'users': db.select(db.func.count()).select_from(User),
+        'categories': db.select(db.func.count()).select_from(Category),
+        'franchises': db.select(db.func.count()).select_from(Franchise),
+        'total_views': db.select(db.func.coalesce(db.func.sum(Movie.views), 0)),
+    }
+
+# Validator cho ETag (conditional.py): COUNT + MAX(updated_at) đều đi qua index
+def movies_version(*criteria):
+    """COUNT + MAX(updated_at) của các phim thỏa `criteria` (cùng thể loại, franchise, series...)."""
+    return tuple(db.session.execute(
+        db.select(db.func.count(Movie.id), db.func.max(Movie.updated_at)).where(*criteria)
+    ).one())
+
+def category_version():
+    return tuple(db.session.execute(db.select(db.func.count(Category.id), db.func.max(Category.updated_at))).one())
+
+def comments_version(movie_id):
+    return tuple(db.session.execute(
+        db.select(db.func.count(Comment.id), db.func.max(Comment.updated_at)).where(Comment.movie_id == movie_id)
+    ).one())
+
+# Menu thể loại có trên mọi trang: cache dùng chung, admin thêm / xóa thể loại
+# gọi caching.invalidate_tags(NAV_CATEGORIES_TAG)
+NavCategory = namedtuple('NavCategory', ('id', 'name'))
+NAV_CATEGORIES_TAG = 'categories'
+_nav_categories = caching.SharedCache('nav_categories', ttl=300, maxsize=1)
+
+def nav_categories():
+    return _nav_categories.get_or_load('all', lambda: tuple(
+        NavCategory._make(row) for row in db.session.execute(db.select(Category.id, Category.name)
+                                                             .order_by(Category.name.asc()))
+    ), tags=(NAV_CATEGORIES_TAG,))
+
+def touch_user_comments(user_id):
+    # Bình luận hiển thị tên / avatar người viết: đổi hồ sơ thì các danh sách bình luận phải đổi ETag
+    db.session.execute(db.update(Comment).where(Comment.user_id == user_id).values(updated_at=datetime.utcnow()))
+
+def load_series_episodes(series_id):
+    rows = db.session.execute(
+        db.select(Movie.id, Movie.episode_number, Movie.url_key, Movie.slug, Movie.title, Movie.subtitle, Movie.poster_url)
+        .where(Movie.series_id == series_id)
+        .order_by(Movie.episode_number.asc(), Movie.id.asc())
+    ).all()
+    return [series_nav.Episode(*row) for row in rows]
+
+# Xóa dây chuyền set-based (xem cascade.py), tương đương ON DELETE CASCADE / SET NULL.
+# Các bước chạy theo thứ tự khai báo, trước khi xóa dòng cha.
+DELETED_PASSWORD_HASH = '!deleted'
+
+def _comment_ids(condition):
+    return db.select(Comment.id).where(condition).correlate(None)
+
+def _movie_deleted(session, movie_id):
+    views, series_id = session.execute(
+        db.select(Movie.views, Movie.series_id).where(Movie.id == movie_id)).one()
+    # Ai đã xem hết tập trước của tập này: tập kế tiếp giờ là tập sau nó (nếu có)
+    refresh_resume_state(session, WatchHistory.next_movie_id == movie_id, exclude=movie_id)
+    stats.add_delta('movies', -1, session)
+    stats.add_delta('total_views', -(views or 0), session)
+    blobs.release_row(session, Movie, movie_id)
+    # Dọn cache / file chỉ sau khi phim thật sự bị xóa (xóa ngay hoặc cuối job purge)
+    session.info.setdefault('_deleted_movies', []).append((movie_id, series_id))
+
+@event.listens_for(Session, 'after_commit')
+def _movies_deleted_committed(session):
+    for movie_id, series_id in session.info.pop('_deleted_movies', ()):
+        series_nav.invalidate(series_id, movie_id)
+        legacy_urls.forget(movie_id)
+        thumbnails.remove(movie_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _movies_deleted_rolled_back(session):
+    session.info.pop('_deleted_movies', None)
+
+def _user_deleted(session, user_id):
+    stats.add_delta('users', -1, session)
+    blobs.release_row(session, User, user_id)
+
+def _lock_deleted_user(session, user_id):
+    # Tài khoản đang chờ purge: không đăng nhập được, giải phóng username/email
+    session.execute(db.update(User).where(User.id == user_id).values(
+        username=f'deleted-{user_id}', email=f'deleted-{user_id}@invalid',
+        password_hash=DELETED_PASSWORD_HASH, is_admin=False))
+
+def register_cascades():
+    """Đăng ký các bước xóa dây chuyền; gọi sau trending.init_app (cần bảng movie_view_*)."""
+    cascade.register('movie', Movie, [
+        cascade.Step(CommentLike, lambda i: CommentLike.comment_id.in_(_comment_ids(Comment.movie_id == i))),
+        cascade.Step(Comment, lambda i: db.and_(Comment.movie_id == i, Comment.parent_id != None),
+                     {'parent_id': None, 'updated_at': datetime.utcnow}),
+        cascade.Step(Comment, lambda i: Comment.movie_id == i),
+        cascade.Step(WatchHistory, lambda i: WatchHistory.movie_id == i),
+        cascade.Step(Favorite, lambda i: Favorite.movie_id == i),
+        # Xóa phim bộ: các tập thành phim lẻ, tập đã xem hết không còn tập kế tiếp
+        cascade.Step(WatchHistory, lambda i: db.and_(series_watch_rows(i), WatchHistory.finished == True),
+                     {'next_movie_id': None, 'resumable': False}),
+        cascade.Step(trending.movie_view_hourly, lambda i: trending.movie_view_hourly.c.movie_id == i),
+        cascade.Step(Movie, lambda i: Movie.series_id == i, {'series_id': None, 'updated_at': datetime.utcnow}),
+    ], before_delete=_movie_deleted)
+
+    cascade.register('user', User, [
+        cascade.Step(CommentLike, lambda i: CommentLike.user_id == i),
+        cascade.Step(CommentLike, lambda i: CommentLike.comment_id.in_(_comment_ids(Comment.user_id == i))),
+        cascade.Step(Comment, lambda i: Comment.parent_id.in_(_comment_ids(Comment.user_id == i)),
+                     {'parent_id': None, 'updated_at': datetime.utcnow}),
+        cascade.Step(Comment, lambda i: Comment.user_id == i),
+        cascade.Step(WatchHistory, lambda i: WatchHistory.user_id == i),
+        cascade.Step(Favorite, lambda i: Favorite.user_id == i),
+    ], before_delete=_user_deleted, before_purge=_lock_deleted_user)
+
+    cascade.register('category', Category, [
+        cascade.Step(Movie, lambda i: Movie.category_id == i, {'category_id': None, 'updated_at': datetime.utcnow}),
+    ], before_delete=lambda session, i: stats.add_delta('categories', -1, session))
+
+    cascade.register('franchise', Franchise, [
+        cascade.Step(Movie, lambda i: Movie.franchise_id == i, {'franchise_id': None, 'updated_at': datetime.utcnow}),
+    ], before_delete=lambda session, i: stats.add_delta('franchises', -1, session))
+
+    cascade.register('comment', Comment, [
+        cascade.Step(CommentLike, lambda i: CommentLike.comment_id == i),
+        cascade.Step(Comment, lambda i: Comment.parent_id == i, {'parent_id': None, 'updated_at': datetime.utcnow}),
+    ])
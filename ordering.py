@@ -0,0 +1,97 @@
+"""
+Sắp xếp thủ công (kéo thả) bằng câu lệnh set-based thay vì load từng entity.
+
+Giá trị thứ tự được lưu thưa (cách nhau ORDER_STEP) nên khi kéo một phần tử
+vào giữa hai phần tử khác chỉ cần cập nhật đúng một dòng. Khi hết khoảng trống
+giữa hai hàng xóm, toàn bộ danh sách được đánh số lại một lần.
+"""
+
+from sqlalchemy import bindparam, func, select, update
+
+ORDER_STEP = 1024
+# Giữ số tham số mỗi câu IN dưới giới hạn của SQLite cũ (999)
+IN_CHUNK = 900
+
+
+def _current_orders(session, table, column, ids):
+    orders = {}
+    for i in range(0, len(ids), IN_CHUNK):
+        chunk = ids[i:i + IN_CHUNK]
+        rows = session.execute(
+            select(table.c.id, func.coalesce(column, 0)).where(table.c.id.in_(chunk))
+        ).all()
+        orders.update(rows)
+    return orders
+
+
+def apply_full_order(session, table, ids, column_name='display_order', step=ORDER_STEP):
+    """Gán thứ tự theo đúng danh sách `ids` bằng một UPDATE executemany.
+
+    Chỉ những dòng có giá trị thay đổi mới bị ghi. Trả về số dòng cập nhật.
+    """
+    column = table.c[column_name]
+    ids = [int(i) for i in ids]
+    current = _current_orders(session, table, column, ids)
+    changes = [
+        {'_id': movie_id, '_order': index * step}
+        for index, movie_id in enumerate(ids)
+        if movie_id in current and current[movie_id] != index * step
+    ]
+    if changes:
+        stmt = update(table).where(table.c.id == bindparam('_id')).values({column_name: bindparam('_order')})
+        session.execute(stmt, changes)
+    return len(changes)
+
+
+def apply_prefix_order(session, table, ids, order_by, column_name='display_order', step=ORDER_STEP):
+    """Như apply_full_order, nhưng `ids` chỉ là phần đầu danh sách (trang admin
+    chỉ tải một phần). Các dòng còn lại giữ thứ tự hiện tại, xếp sau `ids`.
+    """
+    ids = [int(i) for i in ids]
+    posted = set(ids)
+    rest = [i for i in session.execute(select(table.c.id).order_by(*order_by)).scalars() if i not in posted]
+    return apply_full_order(session, table, ids + rest, column_name, step)
+
+
+def rebalance(session, table, order_by, column_name='display_order', step=ORDER_STEP):
+    """Đánh số lại toàn bộ bảng theo thứ tự hiện tại với khoảng cách `step`."""
+    ids = session.execute(select(table.c.id).order_by(*order_by)).scalars().all()
+    return apply_full_order(session, table, ids, column_name, step)
+
+
+def move_item(session, table, item_id, before_id=None, after_id=None, order_by=(),
+              column_name='display_order', step=ORDER_STEP):
+    """Đặt `item_id` nằm giữa `before_id` (đứng trước) và `after_id` (đứng sau).
+
+    Thường chỉ cập nhật một dòng; nếu hai hàng xóm sát nhau thì rebalance trước.
+    Trả về số dòng đã cập nhật.
+    """
+    column = table.c[column_name]
+    neighbours = [int(i) for i in (before_id, after_id) if i is not None]
+    if not neighbours:
+        raise ValueError('Cần ít nhất một phần tử đứng trước hoặc đứng sau')
+
+    updated = 0
+    for attempt in range(2):
+        orders = _current_orders(session, table, column, neighbours)
+        low = orders.get(int(before_id)) if before_id is not None else None
+        high = orders.get(int(after_id)) if after_id is not None else None
+        if low is None and high is None:
+            raise ValueError('Không tìm thấy phần tử lân cận')
+
+        if low is None:
+            new_order = high - step
+        elif high is None:
+            new_order = low + step
+        elif high - low > 1:
+            new_order = (low + high) // 2
+        elif attempt == 0:
+            # Hết khoảng trống: đánh số lại một lần rồi tính lại
+            updated += rebalance(session, table, order_by, column_name, step)
+            continue
+        else:
+            raise ValueError('Thứ tự của các phần tử lân cận không hợp lệ')
+
+        result = session.execute(update(table).where(table.c.id == int(item_id)).values({column_name: new_order}))
+        return updated + result.rowcount
+    return updated
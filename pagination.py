@@ -0,0 +1,69 @@
+"""
+Phân trang keyset (seek) cho các bảng admin.
+
+Thay vì OFFSET (càng về sau càng phải quét nhiều dòng), mỗi trang bắt đầu
+ngay sau khóa sắp xếp của dòng cuối trang trước. Khóa được gói vào một cursor
+base64 mờ để client chỉ việc gửi lại.
+"""
+
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+def encode_cursor(values):
+    packed = [['d', v.isoformat()] if isinstance(v, datetime) else ['v', v] for v in values]
+    return base64.urlsafe_b64encode(json.dumps(packed, separators=(',', ':')).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        packed = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return [datetime.fromisoformat(v) if kind == 'd' else v for kind, v in packed]
+    except (ValueError, TypeError):
+        raise ValueError('Cursor không hợp lệ')
+
+
+def _after(keys, values):
+    """Điều kiện "đứng sau `values`" cho danh sách khóa có chiều sắp xếp trộn lẫn."""
+    clauses = []
+    for i, (_, column, descending) in enumerate(keys):
+        prefix = [keys[j][1] == values[j] for j in range(i)]
+        clauses.append(and_(*prefix, column < values[i] if descending else column > values[i]))
+    return or_(*clauses)
+
+
+def parse_limit(raw, default=DEFAULT_LIMIT):
+    try:
+        return max(1, min(int(raw), MAX_LIMIT))
+    except (TypeError, ValueError):
+        return default
+
+
+def keyset_page(session, stmt, keys, cursor=None, limit=DEFAULT_LIMIT):
+    """Chạy `stmt` theo trang.
+
+    `keys` là danh sách (label, column, descending); mỗi label phải có trong
+    các cột select của `stmt`, và khóa cuối cùng phải duy nhất (thường là id).
+    Các cột khóa phải NOT NULL: so sánh với NULL không đúng với dòng nào nên
+    dòng có khóa NULL sẽ bị bỏ qua ở mọi trang.
+    Trả về (rows dạng dict, next_cursor hoặc None).
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(keys):
+            raise ValueError('Cursor không hợp lệ')
+        stmt = stmt.where(_after(keys, values))
+    stmt = stmt.order_by(*[column.desc() if descending else column.asc() for _, column, descending in keys])
+    rows = [dict(row) for row in session.execute(stmt.limit(limit + 1)).mappings()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([rows[-1][label] for label, _, _ in keys])
+    return rows, next_cursor
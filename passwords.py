@@ -0,0 +1,142 @@
+"""
+Băm / kiểm tra mật khẩu với giới hạn số lần băm đồng thời trên toàn máy.
+
+scrypt/pbkdf2 tốn CPU có chủ đích (~50-100 ms mỗi lần). Không giới hạn thì một
+đợt đăng nhập dồn dập sẽ chiếm hết CPU và mọi trang khác phải xếp hàng. Ở đây
+mỗi lần băm phải giữ một trong PASSWORD_HASH_WORKERS "slot" dùng chung cho mọi
+process trên máy (mọi worker gunicorn, worker.py...): tối đa bấy nhiêu nhân CPU
+cho việc băm, bất kể chạy bao nhiêu worker. Request không lấy được slot trong
+PASSWORD_HASH_QUEUE_WAIT giây bị từ chối nhanh (HashingBusy) thay vì làm nghẽn thêm.
+
+Slot là các file trong PASSWORD_HASH_SLOT_DIR (mặc định instance/password-slots)
+được khóa bằng flock; process chết thì khóa tự được nhả. Việc băm chạy ngay
+trong thread của request (hashlib nhả GIL khi băm).
+
+Thuật toán và tham số cấu hình qua PASSWORD_HASH_METHOD (cú pháp của Werkzeug,
+VD "scrypt:32768:8:1" hoặc "pbkdf2:sha256:600000"). Hash cũ dùng tham số khác
+được băm lại khi người dùng đăng nhập thành công (xem needs_rehash).
+
+PASSWORD_HASH_WORKERS=0 thì không giới hạn (băm ngay như trước).
+"""
+
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: chỉ giới hạn trong từng process
+    fcntl = None
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+QUEUE_WAIT = float(os.environ.get('PASSWORD_HASH_QUEUE_WAIT', 2))
+POLL_SECONDS = 0.01
+
+
+class HashingBusy(Exception):
+    """Mọi slot băm mật khẩu trên máy đều bận; client nên thử lại sau."""
+
+
+class _Slot:
+    def __init__(self, path):
+        self.file = open(path, 'a+b')
+        self.lock = threading.Lock()  # flock không phân biệt các thread dùng chung một file
+
+    def try_acquire(self):
+        if not self.lock.acquire(blocking=False):
+            return False
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            self.lock.release()
+            return False
+
+    def release(self):
+        if fcntl is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.lock.release()
+
+
+_lock = threading.Lock()
+_slots = None
+_slots_pid = None
+_waiting = 0
+_method_id = None
+
+
+def _get_slots():
+    # Mở file riêng cho mỗi process: file mở trước fork dùng chung khóa flock với process cha
+    global _slots, _slots_pid
+    with _lock:
+        if _slots is None or _slots_pid != os.getpid():
+            directory = os.environ.get('PASSWORD_HASH_SLOT_DIR') or os.path.join(current_app.instance_path,
+                                                                                  'password-slots')
+            os.makedirs(directory, exist_ok=True)
+            _slots = [_Slot(os.path.join(directory, f'slot-{i}.lock')) for i in range(WORKERS)]
+            _slots_pid = os.getpid()
+        return _slots
+
+
+def _set_waiting(delta):
+    global _waiting
+    with _lock:
+        _waiting += delta
+        waiting = _waiting
+    import metrics
+    metrics.set_queue_depth('password_hash', waiting)
+
+
+def _acquire():
+    slots = _get_slots()
+    deadline = time.monotonic() + QUEUE_WAIT
+    _set_waiting(1)
+    try:
+        while True:
+            for slot in slots:
+                if slot.try_acquire():
+                    return slot
+            if time.monotonic() >= deadline:
+                raise HashingBusy()
+            time.sleep(POLL_SECONDS)
+    finally:
+        _set_waiting(-1)
+
+
+def _run(fn, *args):
+    if WORKERS <= 0:
+        return fn(*args)
+    slot = _acquire()
+    try:
+        return fn(*args)
+    finally:
+        slot.release()
+
+
+def hash_password(password):
+    return _run(generate_password_hash, password, METHOD)
+
+
+def verify_password(password_hash, password):
+    if not password_hash or not password:
+        return False
+    return _run(check_password_hash, password_hash, password)
+
+
+def method_id():
+    """Phần "thuật toán:tham số" chuẩn hóa của METHOD (VD "scrypt:32768:8:1")."""
+    global _method_id
+    if _method_id is None:
+        # Hash có dạng "<thuật toán:tham số>$<salt>$<hash>"; chỉ dùng API công khai của Werkzeug
+        _method_id = generate_password_hash('', METHOD).split('$', 1)[0]
+    return _method_id
+
+
+def needs_rehash(password_hash):
+    return password_hash.split('$', 1)[0] != method_id()
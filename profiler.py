@@ -0,0 +1,206 @@
+"""
+Profiler SQL theo request: số truy vấn, tổng thời gian DB và thời gian render
+template cho từng endpoint, log truy vấn chậm kèm EXPLAIN và phát hiện N+1
+(cùng một câu lệnh lặp lại quá nhiều lần trong một request).
+
+Số liệu được gộp trong bộ nhớ của từng worker và hiển thị ở /admin/profiler.
+"""
+
+import os
+import threading
+import time
+from collections import Counter
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+ENABLED = os.environ.get('SQL_PROFILER', '1') != '0'
+SLOW_QUERY_MS = _env_float('SLOW_QUERY_MS', 200)
+N_PLUS_ONE_THRESHOLD = int(_env_float('N_PLUS_ONE_THRESHOLD', 10))
+MAX_SAMPLES = 50
+
+_lock = threading.Lock()
+_endpoint_stats = {}
+_slow_queries = []
+_n_plus_one = []
+
+
+class EndpointStats:
+    __slots__ = ('requests', 'queries', 'db_time', 'render_time', 'total_time', 'max_time', 'max_queries')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.max_queries = 0
+
+    def as_dict(self, endpoint):
+        n = self.requests or 1
+        return {
+            'endpoint': endpoint,
+            'requests': self.requests,
+            'avg_queries': self.queries / n,
+            'max_queries': self.max_queries,
+            'avg_db_ms': self.db_time / n * 1000,
+            'avg_render_ms': self.render_time / n * 1000,
+            'avg_total_ms': self.total_time / n * 1000,
+            'max_total_ms': self.max_time * 1000,
+        }
+
+
+def _current_profile():
+    if not has_request_context():
+        return None
+    return g.get('_sql_profile')
+
+
+def _push_sample(samples, item):
+    samples.append(item)
+    if len(samples) > MAX_SAMPLES:
+        del samples[0]
+
+
+def _explain(conn, statement, parameters):
+    """Lấy query plan trên chính kết nối vừa chạy câu lệnh (chỉ với SELECT)."""
+    if not statement.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = 'EXPLAIN QUERY PLAN ' if conn.dialect.name == 'sqlite' else 'EXPLAIN '
+    cursor = conn.connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        return '\n'.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+    except Exception as e:
+        return f'(EXPLAIN failed: {e})'
+    finally:
+        cursor.close()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_profile() is not None:
+        conn.info.setdefault('_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current_profile()
+    if profile is None or not conn.info.get('_query_start'):
+        return
+    elapsed = time.perf_counter() - conn.info['_query_start'].pop()
+    profile['queries'] += 1
+    profile['db_time'] += elapsed
+    profile['statements'][statement] += 1
+
+    if elapsed * 1000 >= SLOW_QUERY_MS:
+        plan = None if executemany else _explain(conn, statement, parameters)
+        sample = {
+            'endpoint': request.endpoint,
+            'path': request.path,
+            'ms': elapsed * 1000,
+            'statement': statement,
+            'plan': plan,
+            'at': time.time(),
+        }
+        profile['app'].logger.warning(
+            f'Slow query ({sample["ms"]:.1f} ms) on {request.path}: {statement}\nPlan:\n{plan}')
+        with _lock:
+            _push_sample(_slow_queries, sample)
+
+
+def _before_render(sender, template, context, **extra):
+    profile = _current_profile()
+    if profile is not None:
+        profile['render_start'] = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    profile = _current_profile()
+    if profile is not None and profile.get('render_start'):
+        profile['render_time'] += time.perf_counter() - profile.pop('render_start')
+
+
+def stats_snapshot():
+    """Trả về số liệu đã gộp (sắp theo tổng thời gian DB giảm dần)."""
+    with _lock:
+        endpoints = [s.as_dict(name) for name, s in _endpoint_stats.items()]
+        slow = list(reversed(_slow_queries))
+        n_plus_one = list(reversed(_n_plus_one))
+    endpoints.sort(key=lambda e: e['avg_db_ms'] * e['requests'], reverse=True)
+    return {
+        'pid': os.getpid(),
+        'endpoints': endpoints,
+        'slow_queries': slow,
+        'n_plus_one': n_plus_one,
+        'slow_query_ms': SLOW_QUERY_MS,
+        'n_plus_one_threshold': N_PLUS_ONE_THRESHOLD,
+    }
+
+
+def reset_stats():
+    with _lock:
+        _endpoint_stats.clear()
+        del _slow_queries[:]
+        del _n_plus_one[:]
+
+
+def init_app(app):
+    if not ENABLED:
+        return
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+
+    @app.before_request
+    def _start_profile():
+        g._sql_profile = {
+            'app': app,
+            'start': time.perf_counter(),
+            'queries': 0,
+            'db_time': 0.0,
+            'render_time': 0.0,
+            'statements': Counter(),
+        }
+
+    @app.teardown_request
+    def _finish_profile(exc):
+        profile = g.pop('_sql_profile', None)
+        if profile is None or request.endpoint in (None, 'static'):
+            return
+        total = time.perf_counter() - profile['start']
+        endpoint = request.endpoint
+
+        repeated = [(stmt, n) for stmt, n in profile['statements'].items() if n > N_PLUS_ONE_THRESHOLD]
+        for stmt, n in repeated:
+            app.logger.warning(f'Possible N+1 on {request.path}: {n}x {stmt}')
+
+        with _lock:
+            stats = _endpoint_stats.get(endpoint)
+            if stats is None:
+                stats = _endpoint_stats[endpoint] = EndpointStats()
+            stats.requests += 1
+            stats.queries += profile['queries']
+            stats.db_time += profile['db_time']
+            stats.render_time += profile['render_time']
+            stats.total_time += total
+            stats.max_time = max(stats.max_time, total)
+            stats.max_queries = max(stats.max_queries, profile['queries'])
+            for stmt, n in repeated:
+                _push_sample(_n_plus_one, {
+                    'endpoint': endpoint,
+                    'path': request.path,
+                    'count': n,
+                    'statement': stmt,
+                    'at': time.time(),
+                })
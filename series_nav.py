@@ -0,0 +1,80 @@
+"""
+Cấu trúc điều hướng tập phim (phim bộ) được cache theo series_id.
+
+Trang một tập cần: tập trước / tập sau, vị trí "Tập x / N" và danh sách tập
+xung quanh. Thay vì truy vấn và render toàn bộ danh sách tập mỗi lần xem, danh
+sách tập (chỉ các cột cần hiển thị) được nạp một lần, giữ trong cache, và mọi
+thao tác trên đó là O(1) theo id tập (cắt cửa sổ thì O(kích thước cửa sổ)).
+
+Cache dùng chung giữa các worker / node (caching.SharedCache): admin thêm /
+sửa / xóa tập gọi invalidate(), worker khác thấy thay đổi sau tối đa
+CACHE_SYNC_SECONDS giây. Khi trượt cache chỉ một request nạp danh sách tập.
+"""
+
+import os
+
+import caching
+
+WINDOW = int(os.environ.get('SERIES_NAV_WINDOW', 25))
+
+_cache = caching.SharedCache('series_nav', ttl=float(os.environ.get('SERIES_NAV_TTL', 300)), maxsize=2000)
+
+
+class Episode:
+    """Thông tin tối thiểu của một tập để render thẻ / liên kết."""
+
+    __slots__ = ('id', 'episode_number', 'url_key', 'slug', 'title', 'subtitle', 'poster_url')
+
+    def __init__(self, id, episode_number, url_key, slug, title, subtitle, poster_url):
+        self.id = id
+        self.episode_number = episode_number
+        self.url_key = url_key
+        self.slug = slug
+        self.title = title
+        self.subtitle = subtitle
+        self.poster_url = poster_url
+
+
+class SeriesNav:
+    __slots__ = ('series_id', 'episodes', '_positions')
+
+    def __init__(self, series_id, episodes):
+        self.series_id = series_id
+        self.episodes = tuple(episodes)
+        self._positions = {episode.id: i for i, episode in enumerate(self.episodes)}
+
+    def __len__(self):
+        return len(self.episodes)
+
+    def position(self, episode_id):
+        """Vị trí (0-based) của tập trong series, hoặc None."""
+        return self._positions.get(episode_id)
+
+    def prev(self, episode_id):
+        i = self._positions.get(episode_id)
+        return self.episodes[i - 1] if i else None
+
+    def next(self, episode_id):
+        i = self._positions.get(episode_id)
+        if i is None or i + 1 >= len(self.episodes):
+            return None
+        return self.episodes[i + 1]
+
+    def window(self, episode_id=None, radius=WINDOW):
+        """Tối đa 2*radius+1 tập quanh `episode_id` (từ đầu nếu không có).
+
+        Trả về (danh sách tập, số tập bị ẩn phía trước, số tập bị ẩn phía sau).
+        """
+        i = self._positions.get(episode_id, 0)
+        start = max(0, min(i - radius, len(self.episodes) - (2 * radius + 1)))
+        end = min(len(self.episodes), start + 2 * radius + 1)
+        return self.episodes[start:end], start, len(self.episodes) - end
+
+
+def get(series_id, loader):
+    """SeriesNav của `series_id`; `loader(series_id)` trả về các Episode theo thứ tự khi cache trượt."""
+    return _cache.get_or_load(series_id, lambda: SeriesNav(series_id, loader(series_id)))
+
+
+def invalidate(*series_ids):
+    _cache.invalidate(*(series_id for series_id in series_ids if series_id is not None))
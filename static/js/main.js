@@ -412,3 +412,72 @@ style.textContent = `
     }
 `;
 document.head.appendChild(style);
+
+// Gom thao tác (heartbeat, yêu thích, like) và gửi một lần qua /api/batch.
+// Thao tác mới thay thế thao tác đang chờ cùng key (VD: chỉ vị trí xem mới nhất được gửi).
+// Khi rời trang, phần còn lại được gửi bằng navigator.sendBeacon.
+window.Interactions = (function () {
+    const BATCH_URL = '/api/batch';
+    const pending = new Map();  // key -> { op, resolvers }
+    const beforeFlush = [];
+    let timer = null;
+    let dueAt = Infinity;
+
+    function schedule(delay) {
+        const at = Date.now() + delay;
+        if (at >= dueAt) return;
+        clearTimeout(timer);
+        dueAt = at;
+        timer = setTimeout(() => flush(false), delay);
+    }
+
+    // delay: thời gian tối đa được giữ thao tác trước khi gửi (ms)
+    function queue(key, op, delay) {
+        return new Promise((resolve) => {
+            const previous = pending.get(key);
+            const resolvers = previous ? previous.resolvers : [];
+            resolvers.push(resolve);
+            pending.set(key, { op: op, resolvers: resolvers });
+            schedule(delay === undefined ? 1000 : delay);
+        });
+    }
+
+    function flush(useBeacon) {
+        beforeFlush.forEach((callback) => callback());
+        clearTimeout(timer);
+        timer = null;
+        dueAt = Infinity;
+        if (!pending.size) return;
+        const entries = Array.from(pending.values());
+        pending.clear();
+        const body = JSON.stringify({ ops: entries.map((entry) => entry.op) });
+        const settle = (results) => entries.forEach((entry, i) => {
+            entry.resolvers.forEach((resolve) => resolve(results ? results[i] : null));
+        });
+        if (useBeacon && navigator.sendBeacon &&
+            navigator.sendBeacon(BATCH_URL, new Blob([body], { type: 'application/json' }))) {
+            settle(null);
+            return;
+        }
+        fetch(BATCH_URL, { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: body, keepalive: true })
+            .then((res) => res.json())
+            .then((data) => settle(data.results))
+            .catch(() => settle(null));
+    }
+
+    window.addEventListener('pagehide', () => flush(true));
+    document.addEventListener('visibilitychange', () => {
+        if (document.visibilityState === 'hidden') flush(true);
+    });
+
+    return {
+        queue: queue,
+        flush: flush,
+        // callback được gọi ngay trước mỗi lần gửi (để thêm trạng thái mới nhất, VD: vị trí xem)
+        beforeFlush: (callback) => beforeFlush.push(callback),
+        watch: (movieId, position, duration, delay) => queue('watch:' + movieId,
+            { op: 'watch', movie_id: movieId, position: position, duration: duration }, delay),
+        favorite: (movieId, value) => queue('favorite:' + movieId, { op: 'favorite', movie_id: movieId, value: value }),
+        like: (commentId, value) => queue('like:' + commentId, { op: 'like', comment_id: commentId, value: value }),
+    };
+})();
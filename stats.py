@@ -0,0 +1,370 @@
+"""
+Thống kê tổng (phim, người dùng, thể loại, series, tổng lượt xem) và lịch sử
+theo ngày (lượt xem, người xem hoạt động, phim/người dùng mới) được duy trì
+tăng dần, để dashboard đọc một bảng nhỏ thay vì COUNT(*) / SUM() toàn bảng.
+
+Luồng cập nhật:
+  1. Mapper event trên các model ghi lại chênh lệch vào session.info.
+  2. Khi session commit, chênh lệch được chuyển vào bộ đệm của process
+     (rollback thì bỏ).
+  3. Một thread nền ghi bộ đệm xuống DB mỗi STATS_FLUSH_SECONDS giây trong
+     một transaction, nên request không phải ghi thêm dòng "nóng" nào.
+
+`recompute()` ghi số tổng tuyệt đối kèm mốc thời gian bắt đầu đếm (dòng
+RECOMPUTED_KEY). Chênh lệch số tổng trong bộ đệm mang thời điểm commit; lúc
+flush, chênh lệch commit trước mốc đã nằm trong số đếm lại nên bị bỏ. Flush và
+recompute cùng khóa dòng mốc trước khi ghi nên không chen vào nhau.
+
+Ghi hàng loạt bằng SQL thuần (không qua ORM) phải tự gọi `add_delta`, hoặc
+chạy `recompute()` để đối soát lại toàn bộ số tổng.
+"""
+
+import atexit
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from sqlalchemy import event
+from sqlalchemy.orm import Session, attributes, object_session
+
+import metrics
+
+FLUSH_SECONDS = float(os.environ.get('STATS_FLUSH_SECONDS', 5))
+VIEWER_RETENTION_DAYS = 90
+RECOMPUTED_KEY = '_recomputed_at'  # Giá trị: thời điểm bắt đầu lần đếm lại gần nhất (µs từ epoch)
+
+site_stat = None
+site_stat_daily = None
+daily_viewer = None
+
+_app = None
+_db = None
+_lock = threading.Lock()
+_totals = []  # [(thời điểm commit µs, Counter chênh lệch số tổng)]
+_daily = Counter()
+_viewers = set()
+_flusher_pid = None
+
+
+def _define_tables(metadata):
+    global site_stat, site_stat_daily, daily_viewer
+    if 'site_stat' in metadata.tables:
+        return  # create_app() gọi lại trong cùng process: bảng đã được khai báo trên metadata dùng chung
+    site_stat = sa.Table(
+        'site_stat', metadata,
+        sa.Column('key', sa.String(50), primary_key=True),
+        sa.Column('value', sa.BigInteger, nullable=False, default=0),
+        sa.Column('updated_at', sa.DateTime, default=datetime.utcnow),
+    )
+    site_stat_daily = sa.Table(
+        'site_stat_daily', metadata,
+        sa.Column('day', sa.Date, primary_key=True),
+        sa.Column('key', sa.String(50), primary_key=True),
+        sa.Column('value', sa.BigInteger, nullable=False, default=0),
+    )
+    # Người dùng đã có hoạt động xem trong ngày (để đếm người xem không trùng)
+    daily_viewer = sa.Table(
+        'daily_viewer', metadata,
+        sa.Column('day', sa.Date, primary_key=True),
+        sa.Column('user_id', sa.Integer, primary_key=True),
+    )
+
+
+def _pending(session):
+    info = session.info
+    if '_stat_totals' not in info:
+        info['_stat_totals'] = Counter()
+        info['_stat_daily'] = Counter()
+        info['_stat_viewers'] = set()
+    return info['_stat_totals'], info['_stat_daily'], info['_stat_viewers']
+
+
+def _today():
+    return datetime.utcnow().date()
+
+
+def _now_us():
+    return time.time_ns() // 1000
+
+
+def add_delta(key, delta, session=None, daily_key=None):
+    """Cộng `delta` vào số tổng `key` (và số theo ngày `daily_key` nếu có).
+
+    Có `session` thì chỉ áp dụng khi session đó commit; không có thì vào thẳng bộ đệm.
+    """
+    if session is not None:
+        totals, daily, _ = _pending(session)
+        totals[key] += delta
+        if daily_key:
+            daily[(_today(), daily_key)] += delta
+        return
+    with _lock:
+        _totals.append((_now_us(), Counter({key: delta})))
+        if daily_key:
+            _daily[(_today(), daily_key)] += delta
+    _ensure_flusher()
+
+
+# --- Ghi nhận thay đổi từ ORM ---
+
+def track_count(model, key, daily_key=None):
+    """Đếm số dòng của `model` qua insert/delete bằng ORM."""
+    @event.listens_for(model, 'after_insert')
+    def _inserted(mapper, connection, target):
+        add_delta(key, 1, object_session(target), daily_key)
+
+    @event.listens_for(model, 'after_delete')
+    def _deleted(mapper, connection, target):
+        add_delta(key, -1, object_session(target))
+
+
+def track_sum(model, attr, key, daily_key=None):
+    """Theo dõi tổng của cột `attr` (VD: tổng lượt xem của Movie.views)."""
+    @event.listens_for(model, 'after_insert')
+    def _inserted(mapper, connection, target):
+        value = getattr(target, attr) or 0
+        if value:
+            add_delta(key, value, object_session(target))
+
+    @event.listens_for(model, 'after_update')
+    def _updated(mapper, connection, target):
+        history = attributes.get_history(target, attr)
+        if not history.has_changes():
+            return
+        old = (history.deleted[0] if history.deleted else 0) or 0
+        new = (history.added[0] if history.added else 0) or 0
+        if new != old:
+            add_delta(key, new - old, object_session(target), daily_key)
+
+    @event.listens_for(model, 'after_delete')
+    def _deleted(mapper, connection, target):
+        value = getattr(target, attr) or 0
+        if value:
+            add_delta(key, -value, object_session(target))
+
+
+def track_viewers(model, user_attr='user_id', time_attr='watched_at'):
+    """Ghi nhận người dùng có hoạt động xem trong ngày từ bảng lịch sử xem."""
+    def _record(target):
+        session = object_session(target)
+        user_id = getattr(target, user_attr)
+        if session is None or user_id is None:
+            return
+        when = getattr(target, time_attr) or datetime.utcnow()
+        _pending(session)[2].add((when.date(), user_id))
+
+    @event.listens_for(model, 'after_insert')
+    def _inserted(mapper, connection, target):
+        _record(target)
+
+    @event.listens_for(model, 'after_update')
+    def _updated(mapper, connection, target):
+        history = attributes.get_history(target, time_attr)
+        # Chỉ khi sang ngày mới mới cần ghi nhận lại
+        if history.added and (not history.deleted or history.deleted[0] is None
+                              or history.deleted[0].date() != history.added[0].date()):
+            _record(target)
+
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    totals = session.info.pop('_stat_totals', None)
+    daily = session.info.pop('_stat_daily', None)
+    viewers = session.info.pop('_stat_viewers', None)
+    if not (totals or daily or viewers):
+        return
+    with _lock:
+        if totals:
+            _totals.append((_now_us(), totals))
+        _daily.update(daily)
+        _viewers.update(viewers)
+    _ensure_flusher()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    for key in ('_stat_totals', '_stat_daily', '_stat_viewers'):
+        session.info.pop(key, None)
+
+
+# --- Ghi bộ đệm xuống DB ---
+
+def _insert_ignore(connection, table, rows):
+    """INSERT bỏ qua dòng trùng khóa; trả về số dòng thực sự được thêm."""
+    if not rows:
+        return 0
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        inserted = 0
+        for row in rows:
+            inserted += connection.execute(insert(table).values(**row).on_conflict_do_nothing()).rowcount
+        return inserted
+    inserted = 0
+    for row in rows:
+        exists = connection.execute(
+            sa.select(sa.literal(1)).select_from(table)
+            .where(sa.and_(*[table.c[k] == v for k, v in row.items() if table.c[k].primary_key]))
+        ).first()
+        if not exists:
+            connection.execute(table.insert().values(**row))
+            inserted += 1
+    return inserted
+
+
+def _lock_generation(connection):
+    """Khóa dòng mốc đối soát tới hết transaction; trả về mốc (µs)."""
+    # UPDATE (kể cả không đổi giá trị) giữ khóa dòng; SQLite: lấy khóa ghi của cả DB
+    if not connection.execute(site_stat.update().where(site_stat.c.key == RECOMPUTED_KEY)
+                              .values(value=site_stat.c.value)).rowcount:
+        _insert_ignore(connection, site_stat, [{'key': RECOMPUTED_KEY, 'value': 0}])
+    return connection.execute(
+        sa.select(site_stat.c.value).where(site_stat.c.key == RECOMPUTED_KEY)).scalar() or 0
+
+
+def _apply(connection, batches, daily, viewers):
+    now = datetime.utcnow()
+    recomputed_at = _lock_generation(connection) if batches else 0
+    totals = Counter()
+    for committed_at, deltas in batches:
+        # Commit trước lần đếm lại gần nhất: số đếm lại đã gồm chênh lệch này
+        if committed_at > recomputed_at:
+            totals.update(deltas)
+    for (day, user_id) in viewers:
+        if _insert_ignore(connection, daily_viewer, [{'day': day, 'user_id': user_id}]):
+            daily[(day, 'active_viewers')] += 1
+
+    for key, delta in totals.items():
+        if not delta:
+            continue
+        result = connection.execute(
+            site_stat.update().where(site_stat.c.key == key)
+            .values(value=site_stat.c.value + delta, updated_at=now))
+        if result.rowcount == 0:
+            connection.execute(site_stat.insert().values(key=key, value=delta, updated_at=now))
+
+    daily_rows = [{'day': day, 'key': key, 'value': 0} for (day, key), delta in daily.items() if delta]
+    _insert_ignore(connection, site_stat_daily, daily_rows)
+    for (day, key), delta in daily.items():
+        if delta:
+            connection.execute(
+                site_stat_daily.update()
+                .where(site_stat_daily.c.day == day, site_stat_daily.c.key == key)
+                .values(value=site_stat_daily.c.value + delta))
+
+
+def flush():
+    """Ghi toàn bộ bộ đệm của process xuống DB (một transaction)."""
+    with _lock:
+        totals, daily, viewers = list(_totals), Counter(_daily), set(_viewers)
+        _totals.clear()
+        _daily.clear()
+        _viewers.clear()
+    if not (totals or daily or viewers):
+        return
+    try:
+        with _app.app_context():
+            with _db.engine.begin() as connection:
+                _apply(connection, totals, daily, viewers)
+    except Exception as e:
+        # Trả lại bộ đệm để lần sau ghi tiếp
+        with _lock:
+            _totals[:0] = totals
+            _daily.update(daily)
+            _viewers.update(viewers)
+        _app.logger.warning(f'Stats flush failed: {e}')
+    finally:
+        metrics.set_queue_depth('stats', pending_count())
+
+
+def pending_count():
+    with _lock:
+        return sum(len(deltas) for _, deltas in _totals) + len(_daily) + len(_viewers)
+
+
+def _flush_loop():
+    last_prune = 0
+    while True:
+        time.sleep(FLUSH_SECONDS)
+        flush()
+        if time.time() - last_prune > 3600:
+            last_prune = time.time()
+            prune_viewers()
+
+
+def _ensure_flusher():
+    # Mỗi process (worker gunicorn) có thread flush riêng, khởi động khi cần
+    global _flusher_pid
+    metrics.set_queue_depth('stats', pending_count())
+    if _flusher_pid == os.getpid() or FLUSH_SECONDS <= 0:
+        if FLUSH_SECONDS <= 0:
+            flush()
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_loop, name='stats-flusher', daemon=True).start()
+
+
+def prune_viewers(days=VIEWER_RETENTION_DAYS):
+    try:
+        with _app.app_context():
+            with _db.engine.begin() as connection:
+                connection.execute(daily_viewer.delete().where(daily_viewer.c.day < _today() - timedelta(days=days)))
+    except Exception as e:
+        _app.logger.warning(f'Stats prune failed: {e}')
+
+
+# --- Đọc ---
+
+def totals(session):
+    """Số tổng hiện tại (một SELECT trên bảng nhỏ site_stat)."""
+    return dict(session.execute(sa.select(site_stat.c.key, site_stat.c.value)
+                                .where(site_stat.c.key != RECOMPUTED_KEY)).all())
+
+
+def history(session, days=30, keys=None):
+    """{key: [(day, value), ...]} cho `days` ngày gần nhất, điền 0 cho ngày trống."""
+    start = _today() - timedelta(days=days - 1)
+    stmt = sa.select(site_stat_daily.c.day, site_stat_daily.c.key, site_stat_daily.c.value) \
+        .where(site_stat_daily.c.day >= start)
+    if keys:
+        stmt = stmt.where(site_stat_daily.c.key.in_(keys))
+    values = {(day, key): value for day, key, value in session.execute(stmt)}
+    all_days = [start + timedelta(days=i) for i in range(days)]
+    return {key: [(day, values.get((day, key), 0)) for day in all_days] for key in (keys or {k for _, k in values})}
+
+
+def recompute(session, sources):
+    """Đối soát: tính lại toàn bộ số tổng từ bảng gốc.
+
+    `sources` là {key: biểu thức scalar}, VD {'movies': select(func.count()).select_from(Movie)}.
+    Chênh lệch commit trước khi đếm (còn trong bộ đệm của mọi process) bị bỏ khi flush.
+    """
+    now = datetime.utcnow()
+    connection = session.connection()
+    _lock_generation(connection)
+    # Đặt mốc trước khi đếm: commit xong sau mốc vẫn được cộng khi flush
+    connection.execute(site_stat.update().where(site_stat.c.key == RECOMPUTED_KEY).values(value=_now_us()))
+    for key, stmt in sources.items():
+        value = session.execute(stmt).scalar() or 0
+        result = session.execute(site_stat.update().where(site_stat.c.key == key).values(value=value, updated_at=now))
+        if result.rowcount == 0:
+            session.execute(site_stat.insert().values(key=key, value=value, updated_at=now))
+    session.commit()
+
+
+def init_app(app, db):
+    global _app, _db
+    _app = app
+    _db = db
+    _define_tables(db.metadata)
+    # Ghi nốt bộ đệm khi worker thoát bình thường
+    atexit.register(flush)
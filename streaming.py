@@ -0,0 +1,48 @@
+"""
+Render template dạng stream cho các trang danh sách lớn.
+
+Thay vì dựng toàn bộ HTML trong bộ nhớ rồi mới gửi, template được sinh dần và
+gửi theo khối khoảng STREAM_CHUNK_SIZE byte: phần đầu trang (navbar, CSS) và
+các thẻ phim đầu tiên tới trình duyệt ngay, phần còn lại theo sau.
+
+Lưu ý khi dùng: header (và cookie session) được gửi trước khi template chạy,
+nên view phải tải xong dữ liệu và template không được ghi vào session. Flash
+message được lấy ra trước khi stream (get_flashed_messages) vì lý do đó.
+
+STREAM_TEMPLATES=0 thì render như bình thường.
+"""
+
+import os
+
+from flask import current_app, get_flashed_messages, render_template, stream_template
+
+ENABLED = os.environ.get('STREAM_TEMPLATES', '1') != '0'
+CHUNK_SIZE = int(os.environ.get('STREAM_CHUNK_SIZE', 8192))
+
+
+def _coalesce(chunks, size):
+    # Jinja sinh rất nhiều chuỗi nhỏ; gộp lại để mỗi lần ghi socket / nén một khối đủ lớn
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        buffered += len(chunk)
+        if buffered >= size:
+            yield ''.join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield ''.join(buffer)
+
+
+def render_streamed(template_name, **context):
+    """Response stream của `template_name` (hoặc response thường nếu tắt stream)."""
+    if not ENABLED:
+        return render_template(template_name, **context)
+    # Lấy flash ra khỏi session ngay (được cache trong request context cho template)
+    get_flashed_messages()
+    response = current_app.response_class(_coalesce(stream_template(template_name, **context), CHUNK_SIZE),
+                                          mimetype='text/html')
+    # Không để nginx gom cả response lại trước khi gửi
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,298 @@
+"""
+Phụ đề upload (.srt / .vtt) -> WebVTT chuẩn hóa, kèm bản nén sẵn.
+
+Thẻ <track> của trình duyệt chỉ đọc WebVTT, nên phụ đề được chuyển đổi ngay
+khi admin upload:
+
+  - đọc theo từng khối (không nạp cả file vào bộ nhớ), tự nhận encoding:
+    BOM UTF-8 / UTF-16, UTF-8, không thì SUBTITLE_FALLBACK_ENCODING (cp1258);
+  - mỗi cue được kiểm tra thời gian (định dạng, end > start); cue hỏng hoặc
+    rỗng bị bỏ, đoạn text bị tách khỏi cue bởi dòng trống được nối lại;
+  - ghi WebVTT chuẩn: timestamp HH:MM:SS.mmm, text NFC, bỏ thẻ <font> và
+    {\\an8}..., escape "-->" và "<" lạ; cue sai thứ tự được sắp lại;
+  - lưu vào kho blob (blobs.py) kèm .vtt.gz (và .vtt.br nếu có gói brotli)
+    nén ở mức cao nhất; phục vụ qua /blobs/ với Cache-Control immutable.
+
+Phụ đề upload trước khi có kho blob vẫn được phục vụ qua /subtitles/<file>.
+"""
+
+import codecs
+import os
+import re
+import unicodedata
+import zlib
+from collections import namedtuple
+
+from flask import abort, current_app
+from werkzeug.security import safe_join
+
+import blobs
+import compression
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli là tùy chọn
+    brotli = None
+
+FALLBACK_ENCODING = os.environ.get('SUBTITLE_FALLBACK_ENCODING', 'cp1258')
+CHUNK_SIZE = 64 * 1024
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+_TIMESTAMP = r'(?:(\d+):)?(\d{1,2}):(\d{1,2})[,.](\d{1,3})'
+_TIMING = re.compile(rf'^\s*{_TIMESTAMP}\s*-->\s*{_TIMESTAMP}(.*)$')
+# Thiết lập cue hợp lệ của WebVTT (tọa độ X1:... của SRT bị bỏ)
+_SETTING = re.compile(r'^(vertical|line|position|size|align|region):\S+$')
+_DROP_TAGS = re.compile(r'</?font[^>]*>|\{\\[^}]*\}', re.IGNORECASE)
+# "<" không mở thẻ WebVTT (i, b, u, c, v, lang, ruby, rt hoặc timestamp karaoke)
+_STRAY_LT = re.compile(r'<(?!/?(?:i|b|u|c|v|lang|ruby|rt)\b|\d)')
+
+Cue = namedtuple('Cue', ('start', 'end', 'settings', 'text'))
+Result = namedtuple('Result', ('cues', 'skipped', 'reordered', 'encoding'))
+
+
+class SubtitleError(ValueError):
+    """File phụ đề không đọc được hoặc không có cue hợp lệ nào."""
+
+
+# --- Đọc ---
+
+def _detect_encoding(stream):
+    head = stream.read(4)
+    stream.seek(0)
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if head.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    return None
+
+
+def _lines(stream, encoding, errors='strict'):
+    """Các dòng (không kèm ký tự xuống dòng) của stream nhị phân, giải mã từng khối."""
+    decoder = codecs.getincrementaldecoder(encoding)(errors)
+    pending = ''
+    while True:
+        chunk = stream.read(CHUNK_SIZE)
+        pending += decoder.decode(chunk, final=not chunk)
+        # "\r" cuối khối có thể là nửa đầu của "\r\n"
+        keep_cr = bool(chunk) and pending.endswith('\r')
+        if keep_cr:
+            pending = pending[:-1]
+        lines = pending.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        pending = lines.pop() + ('\r' if keep_cr else '')
+        yield from lines
+        if not chunk:
+            break
+    if pending:
+        yield pending
+
+
+def _blocks(lines):
+    block = []
+    for line in lines:
+        if line.strip():
+            block.append(line)
+        elif block:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def _milliseconds(hours, minutes, seconds, fraction):
+    if int(minutes) > 59 or int(seconds) > 59:
+        raise ValueError
+    return (int(hours or 0) * 3600 + int(minutes) * 60 + int(seconds)) * 1000 + int(fraction.ljust(3, '0'))
+
+
+def format_timestamp(ms):
+    seconds, ms = divmod(ms, 1000)
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours:02d}:{minutes:02d}:{seconds:02d}.{ms:03d}'
+
+
+def _clean(line):
+    line = unicodedata.normalize('NFC', _DROP_TAGS.sub('', line)).strip()
+    return _STRAY_LT.sub('&lt;', line.replace('-->', '--&gt;'))
+
+
+def parse(lines):
+    """Đọc cue từ các dòng SRT hoặc WebVTT.
+
+    Yield Cue, hoặc None cho mỗi khối bị bỏ (thời gian sai, không có text);
+    khối STYLE / REGION của WebVTT được yield nguyên dạng (list các dòng).
+    """
+    pending = None
+    for index, block in enumerate(_blocks(lines)):
+        first = block[0].strip()
+        if index == 0 and first.startswith('WEBVTT'):
+            continue
+        if first.startswith('NOTE'):
+            continue
+        if first in ('STYLE', 'REGION'):
+            yield block
+            continue
+
+        # Dòng thời gian là dòng đầu, hoặc dòng thứ hai nếu có số thứ tự / identifier
+        timing = None
+        for position, line in enumerate(block[:2]):
+            match = _TIMING.match(line)
+            if match:
+                timing = match
+                block = block[position + 1:]
+                break
+        if timing is None:
+            if pending is not None:
+                # Dòng trống lọt vào giữa text của cue trước (hay gặp trong SRT)
+                pending.text.extend(cleaned for cleaned in (_clean(line) for line in block) if cleaned)
+            else:
+                yield None
+            continue
+
+        if pending is not None:
+            yield pending
+            pending = None
+        try:
+            start = _milliseconds(*timing.group(1, 2, 3, 4))
+            end = _milliseconds(*timing.group(5, 6, 7, 8))
+        except ValueError:
+            yield None
+            continue
+        text = [cleaned for cleaned in (_clean(line) for line in block) if cleaned]
+        if end <= start or not text:
+            yield None
+            continue
+        settings = ' '.join(token for token in timing.group(9).split() if _SETTING.match(token))
+        pending = Cue(start, end, settings, text)
+    if pending is not None:
+        yield pending
+
+
+# --- Ghi ---
+
+def _write_cue(out, cue):
+    timing = f'{format_timestamp(cue.start)} --> {format_timestamp(cue.end)}'
+    out.write(f'{timing} {cue.settings}\n' if cue.settings else f'{timing}\n')
+    out.write('\n'.join(cue.text))
+    out.write('\n\n')
+
+
+def convert(lines, out):
+    """Ghi WebVTT chuẩn hóa từ `lines` ra `out` (file text); trả về (cues, skipped, reordered)."""
+    out.write('WEBVTT\n\n')
+    cues = skipped = 0
+    last_start = 0
+    reordered = False
+    for item in parse(lines):
+        if item is None:
+            skipped += 1
+        elif isinstance(item, list):
+            if cues == 0:  # WebVTT chỉ cho phép STYLE / REGION trước cue đầu tiên
+                out.write('\n'.join(item) + '\n\n')
+        else:
+            reordered = reordered or item.start < last_start
+            last_start = max(last_start, item.start)
+            _write_cue(out, item)
+            cues += 1
+    return cues, skipped, reordered
+
+
+def _sort_file(path):
+    # Hiếm gặp: cần cả file trong bộ nhớ để sắp lại theo thời điểm bắt đầu
+    with open(path, encoding='utf-8') as f:
+        items = list(parse(f.read().split('\n')))
+    with open(path, 'w', encoding='utf-8', newline='\n') as out:
+        out.write('WEBVTT\n\n')
+        for block in (item for item in items if isinstance(item, list)):
+            out.write('\n'.join(block) + '\n\n')
+        for cue in sorted((item for item in items if isinstance(item, Cue)), key=lambda cue: cue.start):
+            _write_cue(out, cue)
+
+
+def _compressors():
+    gzip = zlib.compressobj(9, zlib.DEFLATED, 31)  # 31: định dạng gzip
+    yield '.gz', gzip.compress, gzip.flush
+    if brotli is not None:
+        compressor = brotli.Compressor(quality=11)
+        yield '.br', compressor.process, compressor.finish
+
+
+def _precompress(path):
+    # Nén một lần khi upload nên dùng mức nén cao nhất; bỏ bản nén nếu không nhỏ hơn
+    size = os.path.getsize(path)
+    for suffix, process, finish in _compressors():
+        with open(path, 'rb') as src, open(path + suffix, 'wb') as dst:
+            while chunk := src.read(CHUNK_SIZE):
+                dst.write(process(chunk))
+            dst.write(finish())
+        if os.path.getsize(path + suffix) >= size:
+            os.remove(path + suffix)
+
+
+def folder():
+    return os.path.join(current_app.static_folder, 'uploads', 'subtitles')
+
+
+def save(stream, path):
+    """Chuyển stream phụ đề (nhị phân, seek được) thành WebVTT chuẩn hóa ở `path`."""
+    tmp = f'{path}.{os.getpid()}.tmp'
+    encoding = _detect_encoding(stream)
+    attempts = [(encoding, 'strict')] if encoding else [('utf-8', 'strict'), (FALLBACK_ENCODING, 'replace')]
+    try:
+        for encoding, errors in attempts:
+            stream.seek(0)
+            try:
+                with open(tmp, 'w', encoding='utf-8', newline='\n') as out:
+                    cues, skipped, reordered = convert(_lines(stream, encoding, errors), out)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            raise SubtitleError('Không đọc được encoding của file')
+        if cues == 0:
+            raise SubtitleError('Không có câu phụ đề hợp lệ nào (cần định dạng SRT hoặc WebVTT)')
+        if reordered:
+            _sort_file(tmp)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return Result(cues, skipped, reordered, encoding)
+
+
+def save_upload(file_storage):
+    """Lưu phụ đề admin upload (werkzeug FileStorage) vào kho blob; trả về URL để gán vào Movie.subtitle_url.
+
+    Cùng nội dung sau chuẩn hóa (VD: một phụ đề gắn cho nhiều tập) chỉ được lưu một lần. Bản nén
+    được tạo cạnh file tạm và chuyển vào kho cùng blob, nên không có lúc blob đã public mà bản nén
+    còn đang ghi dở.
+    """
+    tmp = blobs.temp_path('vtt')
+    try:
+        result = save(file_storage.stream, tmp)
+        _precompress(tmp)
+        name, created = blobs.store_file(tmp, 'vtt', variants=tuple(compression.PRECOMPRESSED_SUFFIXES.values()))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    current_app.logger.info(f'Subtitle {file_storage.filename!r} -> {name}: {result.cues} cues, '
+                            f'{result.skipped} skipped, encoding {result.encoding}'
+                            f'{", reordered" if result.reordered else ""}{"" if created else ", duplicate"}')
+    return blobs.url(name)
+
+
+# --- Phục vụ ---
+
+def serve(filename):
+    # Phụ đề upload trước khi có kho blob
+    path = safe_join(folder(), filename)
+    if path is None or not filename.endswith('.vtt') or not os.path.isfile(path):
+        abort(404)
+    response = compression.send_precompressed(path, mimetype='text/vtt', max_age=CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.add_url_rule('/subtitles/<path:filename>', 'subtitle', serve)
@@ -0,0 +1,163 @@
+"""
+Ảnh xem trước khi tua video: sprite sheet + track WebVTT "thumbnails".
+
+Job nền `movie.thumbnails` (models.py) được đưa vào hàng đợi khi admin thêm
+phim / đổi video và chỉ chạy trong worker.py (không chạy ở worker nhúng của
+process web). Job dùng ffmpeg (FFMPEG_BINARY, FFPROBE_BINARY; phải có trên
+máy chạy worker) để lấy một khung hình mỗi THUMBNAIL_INTERVAL_SECONDS giây,
+ghép thành các sprite sheet JPEG (THUMBNAIL_COLUMNS x THUMBNAIL_ROWS ảnh mỗi
+sheet) và ghi thumbnails.vtt: mỗi cue trỏ tới một vùng của sheet
+(`sprite-001.jpg#xywh=x,y,w,h`). Trình duyệt chỉ tải vài ảnh sheet thay vì
+gửi range request vào file video mỗi lần tua thử.
+
+Chỉ giải mã keyframe (-skip_frame nokey) nên nhanh hơn nhiều so với giải mã
+cả video; khung hình lệch tối đa một GOP so với mốc thời gian, đủ cho ảnh
+xem trước. Chỉ hỗ trợ video lưu trong static/ (video URL ngoài bị bỏ qua).
+
+Mỗi video được ghi vào thư mục riêng `<movie_id>-<hash video>` dưới
+uploads/thumbnails và phục vụ qua /thumbnails/ với Cache-Control immutable.
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import subprocess
+
+from flask import current_app, send_from_directory
+
+import jobs
+from subtitles import format_timestamp
+
+FFMPEG = os.environ.get('FFMPEG_BINARY', 'ffmpeg')
+FFPROBE = os.environ.get('FFPROBE_BINARY', 'ffprobe')
+INTERVAL_SECONDS = int(os.environ.get('THUMBNAIL_INTERVAL_SECONDS', 10))
+WIDTH = int(os.environ.get('THUMBNAIL_WIDTH', 160))
+COLUMNS = int(os.environ.get('THUMBNAIL_COLUMNS', 10))
+ROWS = int(os.environ.get('THUMBNAIL_ROWS', 10))
+JPEG_QUALITY = 5  # -q:v của ffmpeg (2 = tốt nhất, 31 = kém nhất)
+CACHE_MAX_AGE = 365 * 24 * 3600
+VTT_NAME = 'thumbnails.vtt'
+
+
+def folder():
+    return os.path.join(current_app.static_folder, 'uploads', 'thumbnails')
+
+
+def local_path(video_url):
+    """Đường dẫn file của video lưu trong static/, hoặc None (URL ngoài, không tồn tại)."""
+    prefix = current_app.static_url_path.rstrip('/') + '/'
+    if not video_url or not video_url.startswith(prefix):
+        return None
+    path = os.path.realpath(os.path.join(current_app.static_folder, video_url[len(prefix):]))
+    if not path.startswith(os.path.realpath(current_app.static_folder) + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def _directory_name(movie_id, video_url, source):
+    # Đổi khi đổi video hoặc khi file video được ghi đè ở cùng URL
+    stat = os.stat(source)
+    fingerprint = f'{video_url}:{stat.st_size}:{int(stat.st_mtime)}'
+    return f'{movie_id}-{hashlib.sha1(fingerprint.encode()).hexdigest()[:10]}'
+
+
+def probe(path):
+    """(thời lượng giây, rộng, cao) của luồng video đầu tiên."""
+    output = subprocess.run(
+        [FFPROBE, '-v', 'error', '-select_streams', 'v:0', '-show_entries', 'stream=width,height:format=duration',
+         '-of', 'json', path],
+        check=True, capture_output=True, text=True).stdout
+    info = json.loads(output)
+    stream = info['streams'][0]
+    return float(info['format']['duration']), int(stream['width']), int(stream['height'])
+
+
+def tile_size(width, height):
+    # Chiều cao chẵn (yêu cầu của encoder), giữ tỉ lệ khung hình
+    return WIDTH, max(2, round(WIDTH * height / width / 2) * 2)
+
+
+def build_vtt(duration, tile_width, tile_height):
+    """Nội dung thumbnails.vtt cho video dài `duration` giây."""
+    per_sheet = COLUMNS * ROWS
+    lines = ['WEBVTT', '']
+    for index in range(max(1, math.ceil(duration / INTERVAL_SECONDS))):
+        start = index * INTERVAL_SECONDS
+        end = min(start + INTERVAL_SECONDS, duration)
+        sheet, position = divmod(index, per_sheet)
+        x = position % COLUMNS * tile_width
+        y = position // COLUMNS * tile_height
+        lines += [f'{format_timestamp(int(start * 1000))} --> {format_timestamp(int(end * 1000))}',
+                  f'sprite-{sheet + 1:03d}.jpg#xywh={x},{y},{tile_width},{tile_height}', '']
+    return '\n'.join(lines)
+
+
+def generate(movie_id, video_url):
+    """Tạo sprite sheet + thumbnails.vtt cho video; trả về URL của file .vtt (cần app context).
+
+    Trả về None nếu video không nằm trong static/. Thư mục của các video cũ
+    của cùng phim bị xóa sau khi tạo xong.
+    """
+    source = local_path(video_url)
+    if source is None:
+        return None
+    if shutil.which(FFMPEG) is None or shutil.which(FFPROBE) is None:
+        raise RuntimeError(f'{FFMPEG} / {FFPROBE} not found')
+
+    duration, width, height = probe(source)
+    tile_width, tile_height = tile_size(width, height)
+    name = _directory_name(movie_id, video_url, source)
+    target = os.path.join(folder(), name)
+    tmp = f'{target}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    try:
+        subprocess.run(
+            [FFMPEG, '-v', 'error', '-nostdin', '-skip_frame', 'nokey', '-i', source, '-an', '-sn', '-dn',
+             '-vf', f'fps=1/{INTERVAL_SECONDS},scale={tile_width}:{tile_height},tile={COLUMNS}x{ROWS}',
+             '-q:v', str(JPEG_QUALITY), os.path.join(tmp, 'sprite-%03d.jpg')],
+            check=True, capture_output=True)
+        with open(os.path.join(tmp, VTT_NAME), 'w', encoding='utf-8') as f:
+            f.write(build_vtt(duration, tile_width, tile_height))
+        shutil.rmtree(target, ignore_errors=True)
+        os.replace(tmp, target)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    remove(movie_id, keep=name)
+    # Job chạy ngoài request: dựng URL trực tiếp từ url_map
+    adapter = current_app.url_map.bind('', script_name=current_app.config['APPLICATION_ROOT'])
+    return adapter.build('thumbnail', {'filename': f'{name}/{VTT_NAME}'})
+
+
+def schedule(session, movie_id, video_url):
+    """Đưa job tạo ảnh xem trước vào transaction của `session`; False nếu video không nằm trong static/."""
+    if local_path(video_url) is None:
+        return False
+    jobs.enqueue('movie.thumbnails', {'movie_id': movie_id, 'video_url': video_url}, session=session)
+    return True
+
+
+def remove(movie_id, keep=None):
+    """Xóa ảnh xem trước của phim (trừ thư mục `keep`)."""
+    try:
+        entries = os.listdir(folder())
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        if entry.startswith(f'{movie_id}-') and entry != keep and not entry.endswith('.tmp'):
+            shutil.rmtree(os.path.join(folder(), entry), ignore_errors=True)
+
+
+def serve(filename):
+    # Tên thư mục đổi theo file video nên nội dung của một URL không bao giờ đổi
+    response = send_from_directory(folder(), filename, max_age=CACHE_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+
+def init_app(app):
+    app.add_url_rule('/thumbnails/<path:filename>', 'thumbnail', serve)
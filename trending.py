@@ -0,0 +1,229 @@
+"""
+Xếp hạng "thịnh hành" theo lượt xem gần đây, giảm dần theo thời gian.
+
+Luồng dữ liệu:
+  1. Mỗi lượt xem gọi record_view(movie_id): chỉ cộng vào bộ đệm trong process
+     theo (movie_id, giờ).
+  2. Thread nền ghi bộ đệm mỗi TRENDING_FLUSH_SECONDS giây vào bảng gộp
+     movie_view_hourly (movie_id, giờ) bằng upsert cộng dồn, nên mỗi phim chỉ
+     một dòng cho mỗi giờ.
+  3. Mỗi TRENDING_REFRESH_SECONDS giây, một process (giữ "lease" trong bảng
+     trending_run) tính lại điểm từ các giờ trong TRENDING_WINDOW_HOURS:
+
+         score = Σ views(giờ) * 0.5 ^ (tuổi tính bằng giờ / TRENDING_HALF_LIFE_HOURS)
+
+     và ghi vào cột được đăng ký (Movie.trending_score, có index), nên trang
+     chủ đọc "thịnh hành" bằng một truy vấn ORDER BY trên index.
+"""
+
+import atexit
+import math
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+import metrics
+
+FLUSH_SECONDS = float(os.environ.get('TRENDING_FLUSH_SECONDS', 10))
+REFRESH_SECONDS = float(os.environ.get('TRENDING_REFRESH_SECONDS', 300))
+HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))
+WINDOW_HOURS = int(os.environ.get('TRENDING_WINDOW_HOURS', 168))
+
+movie_view_hourly = None
+trending_run = None
+
+_app = None
+_db = None
+_score_table = None
+_score_column = None
+_lock = threading.Lock()
+_pending = Counter()
+_worker_pid = None
+
+
+def _define_tables(metadata):
+    global movie_view_hourly, trending_run
+    if 'movie_view_hourly' in metadata.tables:
+        return  # create_app() gọi lại trong cùng process: bảng đã được khai báo trên metadata dùng chung
+    movie_view_hourly = sa.Table(
+        'movie_view_hourly', metadata,
+        sa.Column('movie_id', sa.Integer, primary_key=True),
+        sa.Column('hour', sa.DateTime, primary_key=True),
+        sa.Column('views', sa.Integer, nullable=False, default=0),
+        sa.Index('ix_movie_view_hourly_hour', 'hour'),
+    )
+    # Lease để chỉ một process tính điểm trong mỗi chu kỳ
+    trending_run = sa.Table(
+        'trending_run', metadata,
+        sa.Column('name', sa.String(50), primary_key=True),
+        sa.Column('started_at', sa.DateTime, nullable=False),
+        sa.Column('finished_at', sa.DateTime, nullable=True),
+    )
+
+
+def _hour(when):
+    return when.replace(minute=0, second=0, microsecond=0)
+
+
+def register(model, column='trending_score'):
+    """Cột lưu điểm thịnh hành (kiểu số, nên có index)."""
+    global _score_table, _score_column
+    _score_table = model.__table__
+    _score_column = column
+
+
+# --- Ghi nhận lượt xem ---
+
+def record_view(movie_id, count=1, when=None):
+    with _lock:
+        _pending[(movie_id, _hour(when or datetime.utcnow()))] += count
+    if FLUSH_SECONDS <= 0:
+        flush()
+    start()
+
+
+def pending_count():
+    with _lock:
+        return len(_pending)
+
+
+def _upsert_counts(connection, table, key, counts):
+    """Cộng dồn `counts` {(movie_id, bucket): views} vào `table`."""
+    rows = [{'movie_id': movie_id, key: bucket, 'views': views} for (movie_id, bucket), views in counts.items()]
+    if not rows:
+        return
+    dialect = connection.dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(index_elements=['movie_id', key],
+                                          set_={'views': table.c.views + stmt.excluded.views})
+        connection.execute(stmt, rows)
+        return
+    for row in rows:
+        updated = connection.execute(
+            table.update().where(table.c.movie_id == row['movie_id'], table.c[key] == row[key])
+            .values(views=table.c.views + row['views'])).rowcount
+        if not updated:
+            connection.execute(table.insert().values(**row))
+
+
+def flush():
+    """Ghi bộ đệm lượt xem của process xuống bảng gộp theo giờ (một transaction)."""
+    with _lock:
+        hourly = Counter(_pending)
+        _pending.clear()
+    if not hourly:
+        return
+    try:
+        with _app.app_context():
+            with _db.engine.begin() as connection:
+                _upsert_counts(connection, movie_view_hourly, 'hour', hourly)
+    except Exception as e:
+        with _lock:
+            _pending.update(hourly)
+        _app.logger.warning(f'Trending flush failed: {e}')
+    finally:
+        metrics.set_queue_depth('trending', pending_count())
+
+
+# --- Tính điểm ---
+
+def compute_scores(rows, now):
+    """{movie_id: score} từ các dòng (movie_id, giờ, views)."""
+    decay = math.log(2) / HALF_LIFE_HOURS
+    scores = defaultdict(float)
+    for movie_id, hour, views in rows:
+        # Giờ hiện tại (chưa hết) được tính là tuổi 0
+        age = max((now - hour).total_seconds() / 3600 - 1, 0)
+        scores[movie_id] += views * math.exp(-decay * age)
+    return scores
+
+
+def _claim(connection, now, interval):
+    """Nhận lượt tính điểm nếu lần gần nhất đã quá `interval` giây."""
+    claimed = connection.execute(
+        trending_run.update()
+        .where(trending_run.c.name == 'trending', trending_run.c.started_at < now - timedelta(seconds=interval))
+        .values(started_at=now)).rowcount
+    if claimed:
+        return True
+    exists = connection.execute(sa.select(trending_run.c.name).where(trending_run.c.name == 'trending')).first()
+    if exists:
+        return False
+    connection.execute(trending_run.insert().values(name='trending', started_at=now))
+    return True
+
+
+def refresh(force=False):
+    """Tính lại điểm thịnh hành; trả về số phim có điểm, hoặc None nếu process khác vừa tính."""
+    flush()
+    now = datetime.utcnow()
+    with _app.app_context():
+        with _db.engine.begin() as connection:
+            if not _claim(connection, now, 0 if force else REFRESH_SECONDS * 0.9):
+                return None
+        started = time.perf_counter()
+        with _db.engine.begin() as connection:
+            cutoff = _hour(now) - timedelta(hours=WINDOW_HOURS)
+            rows = connection.execute(
+                sa.select(movie_view_hourly.c.movie_id, movie_view_hourly.c.hour, movie_view_hourly.c.views)
+                .where(movie_view_hourly.c.hour >= cutoff))
+            scores = compute_scores(rows, now)
+
+            table, column = _score_table, _score_table.c[_score_column]
+            connection.execute(table.update().where(column != 0).values({column: 0}))
+            if scores:
+                connection.execute(
+                    table.update().where(table.c.id == sa.bindparam('movie_id'))
+                    .values({column: sa.bindparam('score')}),
+                    [{'movie_id': movie_id, 'score': round(score, 4)} for movie_id, score in scores.items()])
+
+            # Giờ đã ra khỏi cửa sổ không còn ảnh hưởng điểm
+            connection.execute(movie_view_hourly.delete().where(movie_view_hourly.c.hour < cutoff))
+            connection.execute(trending_run.update().where(trending_run.c.name == 'trending')
+                               .values(finished_at=datetime.utcnow()))
+        _app.logger.info(f'Trending scores refreshed for {len(scores)} movies in '
+                         f'{(time.perf_counter() - started) * 1000:.0f} ms')
+    return len(scores)
+
+
+def _run_loop():
+    last_refresh = 0
+    while True:
+        time.sleep(FLUSH_SECONDS if FLUSH_SECONDS > 0 else 5)
+        flush()
+        if REFRESH_SECONDS > 0 and time.time() - last_refresh >= REFRESH_SECONDS:
+            last_refresh = time.time()
+            try:
+                refresh()
+            except Exception as e:
+                _app.logger.warning(f'Trending refresh failed: {e}')
+
+
+def start():
+    """Khởi động thread ghi bộ đệm / tính điểm của process hiện tại (nếu chưa có)."""
+    global _worker_pid
+    metrics.set_queue_depth('trending', pending_count())
+    if _worker_pid == os.getpid():
+        return
+    with _lock:
+        if _worker_pid == os.getpid():
+            return
+        _worker_pid = os.getpid()
+    threading.Thread(target=_run_loop, name='trending-worker', daemon=True).start()
+
+
+def init_app(app, db):
+    global _app, _db
+    _app = app
+    _db = db
+    _define_tables(db.metadata)
+    atexit.register(flush)
@@ -0,0 +1,21 @@
+"""
+Các blueprint của ứng dụng:
+
+    main   - trang cho người xem (trang chủ, phim, thể loại, tìm kiếm, tài khoản)
+    api    - JSON cho trình duyệt (/api/..., /comments)
+    admin  - trang quản trị (/admin/...)
+
+Module của từng blueprint chỉ được import trong register_blueprints() (tức là
+khi create_app() chạy), nên process không phục vụ web (worker.py) không phải
+nạp route và template của chúng.
+"""
+
+import importlib
+
+BLUEPRINTS = ('main', 'api', 'admin')
+
+
+def register_blueprints(app, names=BLUEPRINTS):
+    for name in names:
+        module = importlib.import_module(f'{__name__}.{name}')
+        app.register_blueprint(module.bp)
@@ -0,0 +1,579 @@
+"""
+Blueprint `admin`: trang quản trị dưới /admin (chỉ tài khoản admin).
+"""
+
+from flask import Blueprint, current_app, flash, jsonify, redirect, render_template, request, url_for
+from flask_login import current_user, login_required
+
+import caching
+import cascade
+import jobs
+import ordering
+import pagination
+import profiler
+import series_nav
+import stats
+import subtitles
+import thumbnails
+from auth import admin_required, invalidate_user
+from db_routing import use_replica
+from models import (db, User, Category, Franchise, Movie, WatchHistory, MOVIE_LIST_ORDER, NAV_CATEGORIES_TAG,
+                    refresh_resume_state, series_watch_rows)
+
+bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+@bp.route('')
+@use_replica
+@login_required
+@admin_required
+def dashboard():
+    # Số tổng đọc từ bảng site_stat (một SELECT nhỏ) thay vì COUNT/SUM toàn bảng
+    totals = stats.totals(db.session)
+    trends = stats.history(db.session, days=30, keys=['views', 'active_viewers', 'new_users', 'new_movies'])
+    recent_movies = Movie.query.order_by(Movie.created_at.desc()).limit(5).all()
+    return render_template('admin/dashboard.html', 
+                         total_movies=totals.get('movies', 0),
+                         total_users=totals.get('users', 0),
+                         total_categories=totals.get('categories', 0),
+                         total_franchises=totals.get('franchises', 0),
+                         total_views=totals.get('total_views', 0),
+                         trends=trends,
+                         recent_movies=recent_movies)
+
+@bp.route('/stats/recompute', methods=['POST'])
+@login_required
+@admin_required
+def recompute_stats():
+    # Đếm lại toàn bộ bảng có thể mất vài giây: chạy nền, trang trả về ngay
+    try:
+        jobs.enqueue('stats.recompute')
+        jobs.enqueue('trending.refresh', {'force': True})
+        flash('Đã đưa việc tính lại thống kê vào hàng đợi, số liệu sẽ cập nhật sau ít phút.', 'success')
+    except Exception as e:
+        current_app.logger.error(f'Enqueue recompute stats failed: {e}')
+        flash('Có lỗi xảy ra khi tính lại thống kê.', 'error')
+    return redirect(url_for('admin.dashboard'))
+
+@bp.route('/movies')
+@use_replica
+@login_required
+@admin_required
+def movies():
+    # Danh sách phim được tải dần qua admin_movies_data
+    categories = Category.query.order_by(Category.name).all()
+    return render_template('admin/movies.html', categories=categories)
+
+# Khóa keyset cho từng kiểu sắp xếp (khóa cuối phải duy nhất)
+ADMIN_MOVIE_SORTS = {
+    'order': [('display_order', Movie.display_order, False), ('created_at', Movie.created_at, True), ('id', Movie.id, True)],
+    'newest': [('created_at', Movie.created_at, True), ('id', Movie.id, True)],
+    'views': [('views', Movie.views, True), ('id', Movie.id, True)],
+    'title': [('title', Movie.title, False), ('id', Movie.id, False)],
+}
+
+@bp.route('/movies/data')
+@use_replica
+@login_required
+@admin_required
+def movies_data():
+    """JSON cho bảng phim admin: phân trang keyset, lọc và sắp xếp phía server"""
+    sort = request.args.get('sort', 'order')
+    keys = ADMIN_MOVIE_SORTS.get(sort, ADMIN_MOVIE_SORTS['order'])
+    q = request.args.get('q', '').strip()
+    category_id = request.args.get('category_id', '')
+    
+    stmt = db.select(
+        Movie.id, Movie.title, Movie.subtitle, Movie.url_key, Movie.slug, Movie.poster_url,
+        Movie.category_id, Category.name.label('category_name'), Movie.views,
+        Movie.created_at, Movie.display_order, Movie.is_series, Movie.series_id
+    ).outerjoin(Category, Movie.category_id == Category.id)
+    if q:
+        stmt = stmt.where(db.or_(Movie.title.ilike(f'%{q}%'), Movie.subtitle.ilike(f'%{q}%')))
+    if category_id == 'none':
+        stmt = stmt.where(Movie.category_id == None)
+    elif category_id.isdigit():
+        stmt = stmt.where(Movie.category_id == int(category_id))
+    
+    cursor = request.args.get('cursor')
+    try:
+        rows, next_cursor = pagination.keyset_page(db.session, stmt, keys, cursor,
+                                                   pagination.parse_limit(request.args.get('limit')))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    items = [{
+        'id': r['id'],
+        'title': r['title'],
+        'subtitle': r['subtitle'] or '',
+        'url_key': r['url_key'] or r['slug'] or str(r['id']),
+        'poster_url': r['poster_url'] or '',
+        'category_id': r['category_id'],
+        'category': r['category_name'] or '',
+        'views': r['views'] or 0,
+        'created_at': r['created_at'].strftime('%d/%m/%Y') if r['created_at'] else '',
+        'is_series': bool(r['is_series']),
+        'is_episode': r['series_id'] is not None,
+    } for r in rows]
+    result = {'success': True, 'items': items, 'next_cursor': next_cursor}
+    if not cursor:
+        # Chỉ đếm tổng ở trang đầu; không lọc thì lấy luôn từ site_stat
+        total = stats.totals(db.session).get('movies') if not (q or category_id) else None
+        result['total'] = total if total is not None else db.session.scalar(stmt.with_only_columns(db.func.count()).order_by(None))
+    return jsonify(result)
+
+@bp.route('/movies/reorder', methods=['POST'])
+@login_required
+@admin_required
+def reorder_movies():
+    """API endpoint để lưu thứ tự phim sau khi kéo thả
+
+    - {"move": {"movie_id": 5, "before_id": 3, "after_id": 9}}: chỉ di chuyển một phim
+      (thường cập nhật đúng một dòng)
+    - {"movie_ids": [...]}: ghi lại thứ tự (phần đầu danh sách) bằng một UPDATE executemany
+    """
+    try:
+        data = request.get_json()
+        move = data.get('move')
+        if move:
+            updated = ordering.move_item(
+                db.session, Movie.__table__, move['movie_id'],
+                before_id=move.get('before_id'), after_id=move.get('after_id'),
+                order_by=MOVIE_LIST_ORDER)
+        else:
+            # Trang admin chỉ tải một phần danh sách: coi movie_ids là phần đầu
+            updated = ordering.apply_prefix_order(db.session, Movie.__table__, data.get('movie_ids', []),
+                                                  order_by=MOVIE_LIST_ORDER)
+        db.session.commit()
+        return jsonify({'success': True, 'updated': updated})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/movies/add', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def add_movie():
+    if request.method == 'POST':
+        title = request.form.get('title')
+        subtitle = request.form.get('subtitle')  # Tiêu đề phụ (tiếng Anh)
+        description = request.form.get('description')
+        video_url = request.form.get('video_url')
+        poster_url = request.form.get('poster_url')
+        subtitle_url = request.form.get('subtitle_url')
+        category_id = request.form.get('category_id')
+        
+        # Franchise (series phim) field
+        franchise_id = request.form.get('franchise_id')
+        
+        # Episodes (phim bộ) fields
+        is_series = request.form.get('is_series') == '1'
+        series_id = request.form.get('series_id')
+        episode_number = request.form.get('episode_number')
+        
+        # Handle subtitle file upload: SRT / VTT được chuyển thành WebVTT chuẩn hóa
+        subtitle_file = request.files.get('subtitle')
+        if subtitle_file and subtitle_file.filename:
+            try:
+                subtitle_url = subtitles.save_upload(subtitle_file)
+            except subtitles.SubtitleError as e:
+                flash(f'File phụ đề không hợp lệ: {e}', 'error')
+                return redirect(url_for('admin.add_movie'))
+        
+        if not title:
+            flash('Vui lòng nhập tên phim.', 'error')
+            return redirect(url_for('admin.add_movie'))
+        
+        new_movie = Movie(
+            title=title,
+            subtitle=subtitle,
+            description=description,
+            video_url=video_url,
+            poster_url=poster_url,
+            subtitle_url=subtitle_url,
+            category_id=category_id if category_id else None,
+            franchise_id=int(franchise_id) if franchise_id else None,
+            is_series=is_series,
+            series_id=int(series_id) if series_id and not is_series else None,
+            episode_number=int(episode_number) if episode_number and not is_series else None
+        )
+        
+        try:
+            db.session.add(new_movie)
+            db.session.flush()  # Để có ID trước khi tạo url_key
+            new_movie.generate_url_key()
+            new_movie.generate_slug()  # Giữ slug cho SEO
+            # Ảnh xem trước khi tua được tạo nền (job nằm trong cùng transaction)
+            thumbnails.schedule(db.session, new_movie.id, new_movie.video_url)
+            if new_movie.series_id:
+                # Người đã xem hết tập trước giờ có tập kế tiếp
+                refresh_resume_state(db.session, series_watch_rows(new_movie.series_id))
+            db.session.commit()
+            series_nav.invalidate(new_movie.series_id)
+            flash('Thêm phim thành công!', 'success')
+            return redirect(url_for('admin.movies'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Có lỗi xảy ra.', 'error')
+    
+    categories = Category.query.all()
+    # Lấy danh sách các series (phim bộ)
+    all_series = Movie.query.filter_by(is_series=True).order_by(Movie.title).all()
+    # Lấy danh sách các franchise (series phim)
+    all_franchises = Franchise.query.order_by(Franchise.name).all()
+    return render_template('admin/add_movie.html', categories=categories, all_series=all_series, all_franchises=all_franchises)
+
+@bp.route('/movies/edit/<int:movie_id>', methods=['GET', 'POST'])
+@login_required
+@admin_required
+def edit_movie(movie_id):
+    movie = Movie.query.get_or_404(movie_id)
+    
+    if request.method == 'POST':
+        old_title = movie.title
+        old_series_id = movie.series_id
+        old_video_url = movie.video_url
+        movie.title = request.form.get('title')
+        movie.subtitle = request.form.get('subtitle')  # Tiêu đề phụ (tiếng Anh)
+        movie.description = request.form.get('description')
+        movie.video_url = request.form.get('video_url')
+        movie.poster_url = request.form.get('poster_url')
+        movie.category_id = request.form.get('category_id') or None
+        
+        # Franchise (series phim) field
+        franchise_id = request.form.get('franchise_id')
+        movie.franchise_id = int(franchise_id) if franchise_id else None
+        
+        # Episodes (phim bộ) fields
+        movie.is_series = request.form.get('is_series') == '1'
+        series_id = request.form.get('series_id')
+        episode_number = request.form.get('episode_number')
+        
+        if movie.is_series:
+            movie.series_id = None
+            movie.episode_number = None
+        else:
+            movie.series_id = int(series_id) if series_id else None
+            movie.episode_number = int(episode_number) if episode_number else None
+        
+        # Handle subtitle URL - only update if a new URL is provided
+        new_subtitle_url = request.form.get('subtitle_url', '').strip()
+        if new_subtitle_url:
+            movie.subtitle_url = new_subtitle_url
+        
+        # Handle subtitle file upload - this takes priority over URL
+        subtitle_file = request.files.get('subtitle')
+        if subtitle_file and subtitle_file.filename:
+            try:
+                movie.subtitle_url = subtitles.save_upload(subtitle_file)
+            except subtitles.SubtitleError as e:
+                db.session.rollback()
+                flash(f'File phụ đề không hợp lệ: {e}', 'error')
+                return redirect(url_for('admin.edit_movie', movie_id=movie_id))
+        
+        # Tạo lại slug nếu title thay đổi
+        if old_title != movie.title or not movie.slug:
+            movie.generate_slug()
+        
+        # Generate url_key nếu chưa có
+        if not movie.url_key:
+            movie.generate_url_key()
+        
+        # Đổi video: ảnh xem trước cũ không còn đúng; lưu lại phim cũng tạo bù cho phim chưa có
+        video_changed = movie.video_url != old_video_url
+        if video_changed:
+            movie.thumbnails_url = None
+        if video_changed or not movie.thumbnails_url:
+            thumbnails_scheduled = thumbnails.schedule(db.session, movie.id, movie.video_url)
+        
+        try:
+            # Tập kế tiếp của các tập trong series cũ / mới có thể đã đổi
+            refresh_resume_state(db.session, db.or_(WatchHistory.movie_id == movie.id,
+                                                    series_watch_rows(old_series_id, movie.series_id)))
+            db.session.commit()
+            if video_changed and not thumbnails_scheduled:
+                thumbnails.remove(movie.id)
+            # Tập có thể đã đổi series / số tập / tiêu đề; series chính nó (nếu là phim bộ) cũng làm mới
+            series_nav.invalidate(old_series_id, movie.series_id, movie.id)
+            flash('Cập nhật phim thành công!', 'success')
+            return redirect(url_for('admin.movies'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Có lỗi xảy ra.', 'error')
+    
+    categories = Category.query.all()
+    # Lấy danh sách các series (phim bộ), loại trừ phim đang edit
+    all_series = Movie.query.filter(Movie.is_series == True, Movie.id != movie_id).order_by(Movie.title).all()
+    # Lấy danh sách các franchise (series phim)
+    all_franchises = Franchise.query.order_by(Franchise.name).all()
+    return render_template('admin/edit_movie.html', movie=movie, categories=categories, all_series=all_series, all_franchises=all_franchises)
+
+@bp.route('/movies/delete/<int:movie_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_movie(movie_id):
+    movie = Movie.query.get_or_404(movie_id)
+    try:
+        # Cache điều hướng tập, link cũ và ảnh xem trước được dọn khi phim thật sự bị xóa
+        # (models._movie_deleted), kể cả khi việc xóa chạy trong job nền
+        if cascade.delete(db.session, 'movie', movie.id) == 'scheduled':
+            flash('Phim có nhiều dữ liệu liên quan, đang được xóa trong nền.', 'success')
+        else:
+            db.session.commit()
+            flash('Xóa phim thành công!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra.', 'error')
+    return redirect(url_for('admin.movies'))
+
+@bp.route('/movies/quick-update/<int:movie_id>', methods=['POST'])
+@login_required
+@admin_required
+def quick_update_movie(movie_id):
+    movie = Movie.query.get_or_404(movie_id)
+    data = request.get_json()
+    old_video_url = movie.video_url
+    
+    try:
+        if 'title' in data:
+            movie.title = data['title']
+        if 'category_id' in data:
+            movie.category_id = data['category_id'] if data['category_id'] else None
+        if 'description' in data:
+            movie.description = data['description']
+        if 'video_url' in data:
+            movie.video_url = data['video_url']
+        if 'poster_url' in data:
+            movie.poster_url = data['poster_url']
+        
+        # Đổi video: ảnh xem trước cũ không còn đúng (như edit_movie)
+        video_changed = movie.video_url != old_video_url
+        thumbnails_scheduled = False
+        if video_changed:
+            movie.thumbnails_url = None
+            thumbnails_scheduled = thumbnails.schedule(db.session, movie.id, movie.video_url)
+        
+        db.session.commit()
+        if video_changed and not thumbnails_scheduled:
+            thumbnails.remove(movie.id)
+        series_nav.invalidate(movie.series_id)
+        return jsonify({'success': True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/categories')
+@use_replica
+@login_required
+@admin_required
+def categories():
+    categories = Category.query.all()
+    return render_template('admin/categories.html', categories=categories)
+
+@bp.route('/categories/add', methods=['POST'])
+@login_required
+@admin_required
+def add_category():
+    name = request.form.get('name')
+    if not name:
+        flash('Vui lòng nhập tên thể loại.', 'error')
+        return redirect(url_for('admin.categories'))
+    
+    # Kiểm tra trùng tên
+    existing = Category.query.filter_by(name=name).first()
+    if existing:
+        flash('Thể loại này đã tồn tại.', 'error')
+        return redirect(url_for('admin.categories'))
+    
+    try:
+        new_category = Category(name=name)
+        db.session.add(new_category)
+        db.session.commit()
+        caching.invalidate_tags(NAV_CATEGORIES_TAG)
+        flash('Thêm thể loại thành công!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra khi thêm thể loại.', 'error')
+    
+    return redirect(url_for('admin.categories'))
+
+@bp.route('/categories/delete/<int:category_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_category(category_id):
+    category = Category.query.get_or_404(category_id)
+    try:
+        # Các phim thuộc thể loại này được đặt category_id = NULL bằng một UPDATE
+        cascade.delete(db.session, 'category', category.id, inline_limit=0)
+        db.session.commit()
+        caching.invalidate_tags(NAV_CATEGORIES_TAG)
+        flash('Xóa thể loại thành công!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra khi xóa thể loại.', 'error')
+    
+    return redirect(url_for('admin.categories'))
+
+# Franchise (Series phim) management
+@bp.route('/franchises')
+@use_replica
+@login_required
+@admin_required
+def franchises():
+    franchises = Franchise.query.order_by(Franchise.name).all()
+    return render_template('admin/franchises.html', franchises=franchises)
+
+@bp.route('/franchises/add', methods=['POST'])
+@login_required
+@admin_required
+def add_franchise():
+    name = request.form.get('name')
+    description = request.form.get('description', '')
+    poster_url = request.form.get('poster_url', '')
+    
+    if not name:
+        flash('Vui lòng nhập tên series.', 'error')
+        return redirect(url_for('admin.franchises'))
+    
+    existing = Franchise.query.filter_by(name=name).first()
+    if existing:
+        flash('Series này đã tồn tại.', 'error')
+        return redirect(url_for('admin.franchises'))
+    
+    try:
+        new_franchise = Franchise(name=name, description=description, poster_url=poster_url if poster_url else None)
+        db.session.add(new_franchise)
+        db.session.commit()
+        flash('Thêm series thành công!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra khi thêm series.', 'error')
+    
+    return redirect(url_for('admin.franchises'))
+
+@bp.route('/franchises/delete/<int:franchise_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_franchise(franchise_id):
+    franchise = Franchise.query.get_or_404(franchise_id)
+    try:
+        cascade.delete(db.session, 'franchise', franchise.id, inline_limit=0)
+        db.session.commit()
+        flash('Xóa series thành công!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra khi xóa series.', 'error')
+    
+    return redirect(url_for('admin.franchises'))
+
+@bp.route('/users')
+@use_replica
+@login_required
+@admin_required
+def users():
+    # Danh sách người dùng được tải dần qua admin_users_data
+    return render_template('admin/users.html')
+
+ADMIN_USER_SORTS = {
+    'newest': [('created_at', User.created_at, True), ('id', User.id, True)],
+    'oldest': [('created_at', User.created_at, False), ('id', User.id, False)],
+    'username': [('username', User.username, False), ('id', User.id, False)],
+}
+
+@bp.route('/users/data')
+@use_replica
+@login_required
+@admin_required
+def users_data():
+    """JSON cho bảng người dùng admin: phân trang keyset, lọc và sắp xếp phía server"""
+    sort = request.args.get('sort', 'newest')
+    keys = ADMIN_USER_SORTS.get(sort, ADMIN_USER_SORTS['newest'])
+    q = request.args.get('q', '').strip()
+    role = request.args.get('role', '')
+    
+    stmt = db.select(User.id, User.username, User.email, User.avatar_url, User.is_admin, User.created_at)
+    if q:
+        stmt = stmt.where(db.or_(User.username.ilike(f'%{q}%'), User.email.ilike(f'%{q}%')))
+    if role == 'admin':
+        stmt = stmt.where(User.is_admin == True)
+    elif role == 'user':
+        stmt = stmt.where(db.or_(User.is_admin == False, User.is_admin == None))
+    
+    cursor = request.args.get('cursor')
+    try:
+        rows, next_cursor = pagination.keyset_page(db.session, stmt, keys, cursor,
+                                                   pagination.parse_limit(request.args.get('limit')))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    items = [{
+        'id': r['id'],
+        'username': r['username'],
+        'email': r['email'],
+        'avatar_url': r['avatar_url'] or '',
+        'is_admin': bool(r['is_admin']),
+        'is_self': r['id'] == current_user.id,
+        'created_at': r['created_at'].strftime('%d/%m/%Y %H:%M') if r['created_at'] else '',
+    } for r in rows]
+    result = {'success': True, 'items': items, 'next_cursor': next_cursor}
+    if not cursor:
+        total = stats.totals(db.session).get('users') if not (q or role) else None
+        result['total'] = total if total is not None else db.session.scalar(stmt.with_only_columns(db.func.count()).order_by(None))
+    return jsonify(result)
+
+@bp.route('/users/toggle-admin/<int:user_id>', methods=['POST'])
+@login_required
+@admin_required
+def toggle_user_admin(user_id):
+    user = User.query.get_or_404(user_id)
+    if user.id == current_user.id:
+        flash('Bạn không thể thay đổi quyền của chính mình.', 'error')
+        return redirect(url_for('admin.users'))
+    
+    try:
+        user.is_admin = not user.is_admin
+        db.session.commit()
+        invalidate_user(user.id)
+        status = 'Admin' if user.is_admin else 'User'
+        flash(f'Đã cập nhật quyền của {user.username} thành {status}!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra.', 'error')
+    
+    return redirect(url_for('admin.users'))
+
+@bp.route('/users/delete/<int:user_id>', methods=['POST'])
+@login_required
+@admin_required
+def delete_user(user_id):
+    user = User.query.get_or_404(user_id)
+    if user.id == current_user.id:
+        flash('Bạn không thể xóa chính mình.', 'error')
+        return redirect(url_for('admin.users'))
+    
+    username = user.username
+    try:
+        if cascade.delete(db.session, 'user', user_id) == 'scheduled':
+            flash(f'Đã khóa người dùng {username}, dữ liệu liên quan đang được xóa trong nền.', 'success')
+        else:
+            db.session.commit()
+            flash(f'Đã xóa người dùng {username}!', 'success')
+        invalidate_user(user_id)
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra khi xóa người dùng.', 'error')
+    
+    return redirect(url_for('admin.users'))
+
+@bp.route('/profiler')
+@login_required
+@admin_required
+def profiler_stats():
+    return render_template('admin/profiler.html', stats=profiler.stats_snapshot(), enabled=profiler.ENABLED)
+
+@bp.route('/profiler/reset', methods=['POST'])
+@login_required
+@admin_required
+def profiler_reset():
+    profiler.reset_stats()
+    flash('Đã xóa số liệu profiler.', 'success')
+    return redirect(url_for('admin.profiler_stats'))
@@ -0,0 +1,340 @@
+"""
+Blueprint `api`: JSON cho trình duyệt (tìm kiếm nhanh, yêu thích, lịch sử xem, bình luận).
+"""
+
+import math
+from datetime import datetime
+
+from flask import Blueprint, jsonify, request
+from flask_login import current_user, login_required
+
+import cascade
+import conditional
+from db_routing import use_replica
+from models import (db, Movie, WatchHistory, Favorite, Comment, CommentLike, WATCH_FINISHED_RATIO,
+                    comments_version, nav_categories, refresh_resume_state)
+
+bp = Blueprint('api', __name__)
+
+def _search_filter(query):
+    return db.or_(
+        Movie.title.ilike(f'%{query}%'),
+        Movie.subtitle.ilike(f'%{query}%')
+    )
+
+def search_version():
+    # Chỉ các phim có trong kết quả (id + updated_at, cùng thứ tự với search()) và tên thể loại
+    query = request.args.get('q', '')
+    if not query or len(query) < 2:
+        return (query,)
+    rows = db.session.execute(db.select(Movie.id, Movie.updated_at).where(_search_filter(query)).order_by(Movie.id).limit(10)).all()
+    return (query, tuple(map(tuple, rows)), nav_categories())
+
+@bp.route('/api/search')
+@use_replica
+@conditional.etag_view(search_version, personal=False)
+def search():
+    query = request.args.get('q', '')
+    if not query or len(query) < 2:
+        return jsonify([])
+    
+    movies = Movie.query.filter(_search_filter(query)).order_by(Movie.id).limit(10).all()
+    results = []
+    for movie in movies:
+        results.append({
+            'id': movie.id,
+            'url_key': movie.url_key or movie.slug or str(movie.id),
+            'title': movie.title,
+            'subtitle': movie.subtitle or '',
+            'poster_url': movie.poster_url or '',
+            'category': movie.category.name if movie.category else '',
+            'views': movie.views
+        })
+    return jsonify(results)
+
+def _set_favorite(movie_id, value=None):
+    """Đặt trạng thái yêu thích (value=None: đảo trạng thái hiện tại); trả về True nếu đang yêu thích."""
+    favorite = Favorite.query.filter_by(user_id=current_user.id, movie_id=movie_id).first()
+    if value is None:
+        value = favorite is None
+    if favorite and not value:
+        db.session.delete(favorite)
+    elif not favorite and value:
+        db.session.add(Favorite(user_id=current_user.id, movie_id=movie_id))
+    return value
+
+def _record_watch(movie_id, position, duration=None):
+    history = WatchHistory.query.filter_by(
+        user_id=current_user.id,
+        movie_id=movie_id
+    ).first()
+    
+    if history:
+        history.last_position = position
+        history.watched_at = datetime.utcnow()
+    else:
+        history = WatchHistory(
+            user_id=current_user.id,
+            movie_id=movie_id,
+            last_position=position
+        )
+        db.session.add(history)
+    if duration:
+        history.duration = duration
+    if history.duration:
+        history.finished = position >= history.duration * WATCH_FINISHED_RATIO
+    refresh_resume_state(db.session, WatchHistory.user_id == current_user.id, WatchHistory.movie_id == movie_id)
+
+def _seconds(value):
+    seconds = float(value)
+    if not math.isfinite(seconds):  # JSON như 1e400 thành inf, int(inf) ném OverflowError
+        raise ValueError(value)
+    return int(seconds)
+
+def _watch_values(data):
+    # ValueError / TypeError nếu dữ liệu không hợp lệ
+    position = max(0, _seconds(data.get('position') or 0))
+    duration = _seconds(data['duration']) if data.get('duration') else None
+    return position, duration
+
+@bp.route('/api/favorite/<int:movie_id>', methods=['POST'])
+@login_required
+def toggle_favorite(movie_id):
+    movie = Movie.query.get_or_404(movie_id)
+    
+    try:
+        is_favorite = _set_favorite(movie.id)
+        db.session.commit()
+        return jsonify({'success': True, 'is_favorite': is_favorite, 'status': 'added' if is_favorite else 'removed'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/api/watch-history/<int:movie_id>', methods=['POST'])
+@login_required
+def update_watch_history(movie_id):
+    data = request.get_json() or {}
+    try:
+        position, duration = _watch_values(data)
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({'error': 'Dữ liệu không hợp lệ'}), 400
+    
+    try:
+        _record_watch(movie_id, position, duration)
+        db.session.commit()
+        return jsonify({'status': 'success'})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+# Comments API
+def comments_page_version():
+    movie_id = request.args.get('movie_id', type=int)
+    return (movie_id, comments_version(movie_id)) if movie_id else None
+
+@bp.route('/comments', methods=['GET', 'POST'])
+@use_replica
+@conditional.etag_view(comments_page_version)
+def comments():
+    movie_id = request.args.get('movie_id', type=int)
+    
+    if request.method == 'GET':
+        if not movie_id:
+            return jsonify({'comments': [], 'count': 0})
+        
+        # Get top-level comments only (parent_id is None)
+        comments_list = Comment.query.filter_by(movie_id=movie_id, parent_id=None)\
+            .order_by(Comment.created_at.desc()).all()
+        
+        def serialize_comment(c):
+            # Count likes
+            likes_count = CommentLike.query.filter_by(comment_id=c.id).count()
+            # Check if current user liked
+            user_liked = False
+            if current_user.is_authenticated:
+                user_liked = CommentLike.query.filter_by(
+                    user_id=current_user.id, comment_id=c.id
+                ).first() is not None
+            
+            # Get replies
+            replies_data = []
+            for reply in sorted(c.replies, key=lambda r: r.created_at):
+                reply_likes = CommentLike.query.filter_by(comment_id=reply.id).count()
+                reply_user_liked = False
+                if current_user.is_authenticated:
+                    reply_user_liked = CommentLike.query.filter_by(
+                        user_id=current_user.id, comment_id=reply.id
+                    ).first() is not None
+                replies_data.append({
+                    'id': reply.id,
+                    'content': reply.content,
+                    'created_at': reply.created_at.isoformat(),
+                    'likes_count': reply_likes,
+                    'user_liked': reply_user_liked,
+                    'user': {
+                        'id': reply.user.id if reply.user else None,
+                        'username': reply.user.username if reply.user else 'Người dùng',
+                        'avatar_url': reply.user.avatar_url if reply.user and hasattr(reply.user, 'avatar_url') else None
+                    }
+                })
+            
+            return {
+                'id': c.id,
+                'content': c.content,
+                'created_at': c.created_at.isoformat(),
+                'likes_count': likes_count,
+                'user_liked': user_liked,
+                'replies': replies_data,
+                'user': {
+                    'id': c.user.id if c.user else None,
+                    'username': c.user.username if c.user else 'Người dùng',
+                    'avatar_url': c.user.avatar_url if c.user and hasattr(c.user, 'avatar_url') else None
+                }
+            }
+        
+        result = [serialize_comment(c) for c in comments_list]
+        total_count = len(result) + sum(len(c['replies']) for c in result)
+        
+        return jsonify({'comments': result, 'count': total_count})
+    
+    elif request.method == 'POST':
+        if not current_user.is_authenticated:
+            return jsonify({'success': False, 'error': 'Vui lòng đăng nhập để bình luận'}), 401
+        
+        data = request.get_json()
+        movie_id = data.get('movie_id')
+        content = data.get('content', '').strip()
+        parent_id = data.get('parent_id')  # For replies
+        
+        if not movie_id or not content:
+            return jsonify({'success': False, 'error': 'Thiếu thông tin'}), 400
+        
+        try:
+            comment = Comment(
+                user_id=current_user.id,
+                movie_id=movie_id,
+                content=content,
+                parent_id=parent_id if parent_id else None
+            )
+            db.session.add(comment)
+            db.session.commit()
+            return jsonify({'success': True, 'comment_id': comment.id})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+def _set_comment_like(comment, value=None):
+    """Đặt trạng thái like của bình luận (value=None: đảo trạng thái); trả về (liked, likes_count)."""
+    existing_like = CommentLike.query.filter_by(
+        user_id=current_user.id, comment_id=comment.id
+    ).first()
+    if value is None:
+        value = existing_like is None
+    if bool(existing_like) != value:
+        # Số like nằm trong danh sách bình luận: đổi updated_at để ETag của danh sách đổi theo
+        comment.updated_at = datetime.utcnow()
+        if existing_like:
+            db.session.delete(existing_like)
+        else:
+            db.session.add(CommentLike(user_id=current_user.id, comment_id=comment.id))
+    return value, CommentLike.query.filter_by(comment_id=comment.id).count()
+
+@bp.route('/comments/<int:comment_id>/like', methods=['POST'])
+@login_required
+def toggle_comment_like(comment_id):
+    comment = Comment.query.get_or_404(comment_id)
+    
+    try:
+        liked, likes_count = _set_comment_like(comment)
+        db.session.commit()
+        return jsonify({'success': True, 'liked': liked, 'likes_count': likes_count})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/comments/<int:comment_id>', methods=['DELETE'])
+@login_required
+def delete_comment(comment_id):
+    comment = Comment.query.get_or_404(comment_id)
+    
+    # Chỉ admin hoặc chủ comment mới được xóa
+    if not current_user.is_admin and comment.user_id != current_user.id:
+        return jsonify({'success': False, 'error': 'Không có quyền'}), 403
+    
+    try:
+        cascade.delete(db.session, 'comment', comment.id, inline_limit=0)
+        db.session.commit()
+        return jsonify({'success': True})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+# Gom thao tác của trình duyệt (heartbeat, yêu thích, like): một request, một transaction
+MAX_BATCH_OPS = 100
+
+def _batch_watch(op):
+    movie_id = int(op['movie_id'])
+    position, duration = _watch_values(op)
+    if db.session.get(Movie, movie_id) is None:
+        raise LookupError
+    _record_watch(movie_id, position, duration)
+    return {}
+
+def _batch_favorite(op):
+    movie_id = int(op['movie_id'])
+    if db.session.get(Movie, movie_id) is None:
+        raise LookupError
+    return {'is_favorite': _set_favorite(movie_id, _optional_bool(op.get('value')))}
+
+def _batch_like(op):
+    comment = db.session.get(Comment, int(op['comment_id']))
+    if comment is None:
+        raise LookupError
+    liked, likes_count = _set_comment_like(comment, _optional_bool(op.get('value')))
+    return {'liked': liked, 'likes_count': likes_count}
+
+def _optional_bool(value):
+    if value is not None and not isinstance(value, bool):
+        raise TypeError
+    return value
+
+BATCH_OPS = {
+    'watch': _batch_watch,
+    'favorite': _batch_favorite,
+    'like': _batch_like,
+}
+
+@bp.route('/api/batch', methods=['POST'])
+@login_required
+def batch():
+    """Áp dụng một mảng thao tác theo thứ tự, trả về kết quả của từng thao tác.
+
+    Body: {"ops": [{"op": "watch", "movie_id": 1, "position": 120, "duration": 5400},
+                   {"op": "favorite", "movie_id": 1, "value": true},
+                   {"op": "like", "comment_id": 7}]}
+    `value` bỏ trống thì đảo trạng thái như endpoint riêng lẻ. Thao tác sai dữ
+    liệu / không tìm thấy chỉ báo lỗi ở kết quả của nó; lỗi DB hủy cả lô.
+    """
+    data = request.get_json(silent=True)
+    ops = data.get('ops') if isinstance(data, dict) else data
+    if not isinstance(ops, list) or len(ops) > MAX_BATCH_OPS:
+        return jsonify({'success': False, 'error': 'Dữ liệu không hợp lệ'}), 400
+    
+    results = []
+    try:
+        for op in ops:
+            handler = BATCH_OPS.get(op.get('op')) if isinstance(op, dict) else None
+            if handler is None:
+                results.append({'ok': False, 'error': 'Thao tác không hợp lệ'})
+                continue
+            try:
+                results.append({'ok': True, **handler(op)})
+            except (KeyError, TypeError, ValueError, OverflowError):
+                results.append({'ok': False, 'error': 'Dữ liệu không hợp lệ'})
+            except LookupError:
+                results.append({'ok': False, 'error': 'Không tìm thấy'})
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
+    return jsonify({'success': True, 'results': results})
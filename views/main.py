@@ -0,0 +1,454 @@
+"""
+Blueprint `main`: các trang cho người xem (trang chủ, phim, thể loại, tìm kiếm, tài khoản).
+"""
+
+from datetime import datetime
+import os
+
+from flask import Blueprint, abort, current_app, flash, make_response, redirect, render_template, request, url_for
+from flask_login import current_user, login_required, login_user, logout_user
+from werkzeug.utils import secure_filename
+
+import blobs
+import cards
+import conditional
+import legacy_urls
+import passwords
+import series_nav
+import streaming
+import trending
+from auth import invalidate_user
+from db_routing import use_replica
+from models import (db, User, Category, Movie, WatchHistory, Favorite, Comment, MOVIE_LIST_ORDER,
+                    continue_watching, movies_version, category_version, comments_version,
+                    touch_user_comments, load_series_episodes, nav_categories)
+
+bp = Blueprint('main', __name__)
+
+@bp.app_context_processor
+def inject_categories():
+    try:
+        categories = nav_categories()
+    except Exception:
+        db.session.rollback()
+        categories = []
+    return dict(categories=categories)
+
+@bp.app_context_processor
+def inject_static_versions():
+    def get_file_version(filename):
+        file_path = os.path.join(current_app.static_folder, filename)
+        try:
+            mtime = os.path.getmtime(file_path)
+            return str(int(mtime))
+        except:
+            return current_app.config['CSS_VERSION']
+    return dict(
+        css_version=get_file_version('css/style.css'),
+        js_version=get_file_version('js/main.js')
+    )
+
+@bp.route('/')
+@use_replica
+def index():
+    try:
+        categories = nav_categories()
+    except Exception:
+        db.session.rollback()
+        categories = []
+    
+    filter_type = request.args.get('filter', 'all')
+    # Thẻ phim chỉ cần vài cột: dùng bản ghi nhẹ thay vì entity Movie (cards.py)
+    try:
+        if filter_type == 'popular':
+            movies = cards.load(db.session, cards.select(Movie).order_by(Movie.views.desc()))
+        elif filter_type == 'trending':
+            # Điểm được tính nền từ lượt xem theo giờ (trending.py); một truy vấn trên ix_movie_trending_score
+            movies = cards.load(db.session, cards.select(Movie).where(Movie.trending_score > 0)
+                                .order_by(Movie.trending_score.desc(), Movie.id.desc()).limit(100))
+        elif filter_type == 'newest':
+            movies = cards.load(db.session, cards.select(Movie).order_by(Movie.created_at.desc()))
+        elif filter_type == 'watched' and current_user.is_authenticated:
+            # Mỗi phim một dòng (uq_watch_history_user_movie) nên không cần lọc trùng
+            movies = cards.load(db.session, (
+                cards.select(Movie).join(WatchHistory, WatchHistory.movie_id == Movie.id)
+                .where(WatchHistory.user_id == current_user.id)
+                .order_by(WatchHistory.watched_at.desc()).limit(100)
+            ))
+        elif filter_type == 'liked' and current_user.is_authenticated:
+            movies = cards.load(db.session, (
+                cards.select(Movie).join(Favorite, Favorite.movie_id == Movie.id)
+                .where(Favorite.user_id == current_user.id)
+                .order_by(Favorite.created_at.desc()).limit(100)
+            ))
+        else:
+            movies = cards.load(db.session, cards.select(Movie).order_by(*MOVIE_LIST_ORDER))
+    except Exception:
+        db.session.rollback()
+        movies = []
+    
+    resume_items = []
+    if current_user.is_authenticated and filter_type == 'all':
+        try:
+            resume_items = continue_watching(current_user.id)
+        except Exception:
+            db.session.rollback()
+    
+    return streaming.render_streamed('index.html', movies=movies, categories=categories, filter_type=filter_type,
+                                     resume_items=resume_items)
+
+@bp.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        email = request.form.get('email')
+        password = request.form.get('password')
+        confirm_password = request.form.get('confirm_password')
+        
+        if not username or not email or not password:
+            flash('Vui lòng điền đầy đủ thông tin.', 'error')
+            return render_template('register.html')
+        
+        if password != confirm_password:
+            flash('Mật khẩu xác nhận không khớp.', 'error')
+            return render_template('register.html')
+        
+        if User.query.filter_by(username=username).first():
+            flash('Tên người dùng đã tồn tại.', 'error')
+            return render_template('register.html')
+        
+        if User.query.filter_by(email=email).first():
+            flash('Email đã được sử dụng.', 'error')
+            return render_template('register.html')
+        
+        try:
+            password_hash = passwords.hash_password(password)
+        except passwords.HashingBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại sau giây lát.', 'error')
+            return render_template('register.html'), 503
+        
+        new_user = User(
+            username=username,
+            email=email,
+            password_hash=password_hash
+        )
+        
+        try:
+            db.session.add(new_user)
+            db.session.commit()
+            flash('Đăng ký thành công! Vui lòng đăng nhập.', 'success')
+            return redirect(url_for('main.login'))
+        except Exception as e:
+            db.session.rollback()
+            flash('Có lỗi xảy ra. Vui lòng thử lại.', 'error')
+    
+    return render_template('register.html')
+
+@bp.route('/login', methods=['GET', 'POST'])
+def login():
+    if request.method == 'POST':
+        username = request.form.get('username')
+        password = request.form.get('password')
+        
+        user = User.query.filter_by(username=username).first()
+        
+        try:
+            valid = user is not None and passwords.verify_password(user.password_hash, password)
+        except passwords.HashingBusy:
+            flash('Hệ thống đang bận, vui lòng thử lại sau giây lát.', 'error')
+            return render_template('login.html'), 503
+        
+        if valid:
+            if passwords.needs_rehash(user.password_hash):
+                # Thuật toán / tham số băm đã đổi: băm lại bằng cấu hình mới
+                try:
+                    user.password_hash = passwords.hash_password(password)
+                    db.session.commit()
+                    invalidate_user(user.id)
+                except Exception as e:
+                    db.session.rollback()
+                    current_app.logger.warning(f'Password rehash failed for user {user.id}: {e}')
+            login_user(user)
+            next_page = request.args.get('next')
+            return redirect(next_page or url_for('main.index'))
+        else:
+            flash('Tên đăng nhập hoặc mật khẩu không đúng.', 'error')
+    
+    return render_template('login.html')
+
+@bp.route('/logout')
+@login_required
+def logout():
+    logout_user()
+    return redirect(url_for('main.index'))
+
+@bp.route('/movie/<url_key>')
+def movie(url_key):
+    # Link cũ (slug, id số) và chuỗi không ứng với phim nào được trả lời từ
+    # bảng tra trong process, không truy vấn DB (legacy_urls.py)
+    current_key, legacy = legacy_urls.resolve(db.session, url_key)
+    if current_key is None:
+        abort(404)
+    if legacy:
+        return redirect(url_for('main.movie', url_key=current_key), code=301)
+    
+    movie_obj = Movie.query.filter_by(url_key=url_key).first()
+    if not movie_obj:
+        abort(404)
+    
+    resume_position = 0
+    is_favorited = False
+    existing = None
+    if current_user.is_authenticated:
+        existing = WatchHistory.query.filter_by(
+            user_id=current_user.id,
+            movie_id=movie_obj.id
+        ).first()
+        if existing and not existing.finished:
+            resume_position = existing.last_position or 0
+        is_favorited = Favorite.query.filter_by(
+            user_id=current_user.id,
+            movie_id=movie_obj.id
+        ).first() is not None
+    
+    # Validator chỉ gồm những gì trang hiển thị: phim, bình luận, phim cùng thể loại /
+    # franchise / series, menu thể loại và trạng thái của người xem. Tính trước các
+    # thao tác ghi (lượt xem không đổi updated_at nên không làm đổi ETag).
+    series_id = movie_obj.id if movie_obj.is_series else movie_obj.series_id
+    etag = conditional.make_etag((
+        movie_obj.id, movie_obj.updated_at, comments_version(movie_obj.id),
+        movies_version(Movie.category_id == movie_obj.category_id) if movie_obj.category_id else None,
+        movies_version(Movie.franchise_id == movie_obj.franchise_id) if movie_obj.franchise_id else None,
+        movies_version(db.or_(Movie.id == series_id, Movie.series_id == series_id)) if series_id else None,
+        nav_categories(), is_favorited, resume_position))
+    
+    # Mở lại trang đã có trong cache (304) vẫn là một lượt xem
+    try:
+        movie_obj.views += 1
+        db.session.commit()
+        trending.record_view(movie_obj.id)
+    except:
+        db.session.rollback()
+    
+    if current_user.is_authenticated:
+        try:
+            if existing:
+                existing.watched_at = datetime.utcnow()
+            else:
+                history = WatchHistory(user_id=current_user.id, movie_id=movie_obj.id,
+                                       resumable=not movie_obj.is_series)
+                db.session.add(history)
+            
+            db.session.commit()
+        except:
+            db.session.rollback()
+    
+    cached = conditional.not_modified(etag)
+    if cached is not None:
+        return cached
+    
+    # Lấy phim cùng thể loại (Có thể bạn sẽ thích)
+    suggested_movies = []
+    if movie_obj.category_id:
+        query = cards.select(Movie).where(
+            Movie.category_id == movie_obj.category_id,
+            Movie.id != movie_obj.id,
+            Movie.series_id == None  # Chỉ lấy phim độc lập hoặc series, không lấy episodes
+        )
+        # Nếu phim thuộc franchise, loại trừ các phim cùng franchise
+        if movie_obj.franchise_id:
+            query = query.where(
+                db.or_(Movie.franchise_id == None, Movie.franchise_id != movie_obj.franchise_id)
+            )
+        suggested_movies = cards.load(db.session, query.order_by(Movie.views.desc()).limit(10))
+    
+    # Lấy các phần trong cùng franchise (series phim như Maze Runner 1, 2, 3)
+    franchise_movies = []
+    current_franchise = None
+    if movie_obj.franchise_id:
+        current_franchise = movie_obj.franchise
+        franchise_movies = cards.load(db.session, cards.select(Movie).where(
+            Movie.franchise_id == movie_obj.franchise_id,
+            Movie.id != movie_obj.id
+        ).order_by(Movie.created_at.asc()))
+    
+    # Danh sách tập nếu là phim bộ: lấy từ cấu trúc điều hướng đã cache (series_nav.py),
+    # chỉ render một cửa sổ quanh tập hiện tại
+    episodes = []
+    current_series = None
+    episode_nav = None
+    
+    if movie_obj.is_series:
+        current_series = movie_obj
+        nav = series_nav.get(movie_obj.id, load_series_episodes)
+        episodes, hidden_before, hidden_after = nav.window()
+        episode_nav = {'total': len(nav), 'hidden_before': hidden_before, 'hidden_after': hidden_after,
+                       'position': None, 'prev': None, 'next': nav.episodes[0] if nav.episodes else None}
+    elif movie_obj.series_id:
+        current_series = db.session.get(Movie, movie_obj.series_id)
+        if current_series:
+            nav = series_nav.get(current_series.id, load_series_episodes)
+            episodes, hidden_before, hidden_after = nav.window(movie_obj.id)
+            position = nav.position(movie_obj.id)
+            episode_nav = {'total': len(nav), 'hidden_before': hidden_before, 'hidden_after': hidden_after,
+                           'position': position + 1 if position is not None else None,
+                           'prev': nav.prev(movie_obj.id), 'next': nav.next(movie_obj.id)}
+    
+    # Lấy bình luận cho phim
+    comments = Comment.query.filter_by(movie_id=movie_obj.id, parent_id=None).order_by(Comment.created_at.desc()).all()
+    return conditional.tag_response(make_response(render_template('movie.html', 
+                         movie=movie_obj, 
+                         is_favorite=is_favorited, 
+                         suggested_movies=suggested_movies,
+                         franchise_movies=franchise_movies,
+                         current_franchise=current_franchise,
+                         episodes=episodes,
+                         episode_nav=episode_nav,
+                         current_series=current_series,
+                         comments=comments,
+                         resume_position=resume_position)), etag)
+
+def category_page_version(category_id):
+    return (category_id, movies_version(Movie.category_id == category_id), category_version())
+
+@bp.route('/category/<int:category_id>')
+@use_replica
+@conditional.etag_view(category_page_version)
+def category(category_id):
+    category = Category.query.get_or_404(category_id)
+    movies = cards.load(db.session, cards.select(Movie).where(Movie.category_id == category_id)
+                        .order_by(Movie.created_at.desc()))
+    return streaming.render_streamed('category.html', category=category, movies=movies)
+
+@bp.route('/search')
+@use_replica
+def search():
+    query = request.args.get('q', '')
+    if query:
+        movies = cards.load(db.session, cards.select(Movie).where(
+            db.or_(
+                Movie.title.ilike(f'%{query}%'),
+                Movie.subtitle.ilike(f'%{query}%')
+            )
+        ))
+    else:
+        movies = []
+    return render_template('search.html', movies=movies, query=query)
+
+@bp.route('/profile')
+@login_required
+def profile():
+    return render_template('profile.html')
+
+@bp.route('/update_profile', methods=['POST'])
+@login_required
+def update_profile():
+    username = request.form.get('username')
+    email = request.form.get('email')
+    
+    if not username or not email:
+        flash('Vui lòng điền đầy đủ thông tin.', 'error')
+        return redirect(url_for('main.profile'))
+    
+    # Kiểm tra username đã tồn tại (trừ chính user hiện tại)
+    existing_user = User.query.filter(User.username == username, User.id != current_user.id).first()
+    if existing_user:
+        flash('Tên người dùng đã được sử dụng.', 'error')
+        return redirect(url_for('main.profile'))
+    
+    # Kiểm tra email đã tồn tại (trừ chính user hiện tại)
+    existing_email = User.query.filter(User.email == email, User.id != current_user.id).first()
+    if existing_email:
+        flash('Email đã được sử dụng.', 'error')
+        return redirect(url_for('main.profile'))
+    
+    try:
+        current_user.username = username
+        current_user.email = email
+        touch_user_comments(current_user.id)
+        db.session.commit()
+        invalidate_user(current_user.id)
+        flash('Cập nhật thông tin thành công!', 'success')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra khi cập nhật.', 'error')
+    
+    return redirect(url_for('main.profile'))
+
+@bp.route('/upload_avatar', methods=['POST'])
+@login_required
+def upload_avatar():
+    if 'avatar_file' not in request.files:
+        flash('Không có file nào được chọn.', 'error')
+        return redirect(url_for('main.profile'))
+    
+    file = request.files['avatar_file']
+    if file.filename == '':
+        flash('Không có file nào được chọn.', 'error')
+        return redirect(url_for('main.profile'))
+    
+    if file:
+        filename = secure_filename(file.filename)
+        ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'jpg'
+        try:
+            # Lưu theo nội dung: cùng một ảnh upload lại không tốn thêm file
+            current_user.avatar_url = blobs.url(blobs.store(file.stream, ext))
+            touch_user_comments(current_user.id)
+            db.session.commit()
+            invalidate_user(current_user.id)
+            flash('Cập nhật ảnh đại diện thành công!', 'success')
+        except Exception as e:
+            db.session.rollback()
+            flash('Có lỗi xảy ra khi tải lên ảnh.', 'error')
+    
+    return redirect(url_for('main.profile'))
+
+@bp.route('/change_password', methods=['POST'])
+@login_required
+def change_password():
+    current_password = request.form.get('current_password')
+    new_password = request.form.get('new_password')
+    confirm_password = request.form.get('confirm_password')
+    
+    if not current_password or not new_password or not confirm_password:
+        flash('Vui lòng điền đầy đủ thông tin.', 'error')
+        return redirect(url_for('main.profile'))
+    
+    if new_password != confirm_password:
+        flash('Mật khẩu mới không khớp.', 'error')
+        return redirect(url_for('main.profile'))
+    
+    try:
+        # current_user có thể lấy từ cache (không có password_hash): đọc lại hàng user từ DB
+        user = db.session.get(User, current_user.id, populate_existing=True)
+        if not passwords.verify_password(user.password_hash, current_password):
+            flash('Mật khẩu hiện tại không đúng.', 'error')
+            return redirect(url_for('main.profile'))
+        user.password_hash = passwords.hash_password(new_password)
+        db.session.commit()
+        invalidate_user(user.id)
+        flash('Đổi mật khẩu thành công!', 'success')
+    except passwords.HashingBusy:
+        flash('Hệ thống đang bận, vui lòng thử lại sau giây lát.', 'error')
+    except Exception as e:
+        db.session.rollback()
+        flash('Có lỗi xảy ra khi đổi mật khẩu.', 'error')
+    
+    return redirect(url_for('main.profile'))
+
+@bp.route('/favorites')
+@login_required
+def favorites():
+    fav_movies = cards.load(db.session, cards.select(Movie).join(Favorite, Favorite.movie_id == Movie.id).where(
+        Favorite.user_id == current_user.id
+    ).order_by(Favorite.created_at.desc()))
+    return render_template('favorites.html', movies=fav_movies)
+
+@bp.app_errorhandler(404)
+def not_found(error):
+    return render_template('errors/404.html'), 404
+
+@bp.app_errorhandler(500)
+def internal_error(error):
+    db.session.rollback()
+    return render_template('errors/500.html'), 500
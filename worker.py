@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Worker xử lý job nền (xem jobs.py).
+
+Sử dụng:
+    python worker.py                      # 2 process xử lý mọi loại job
+    python worker.py --processes 4
+    python worker.py --only stats.recompute,trending.refresh
+    python worker.py --once               # chạy hết job đang chờ rồi thoát (cron, kiểm thử)
+
+Khi đã chạy worker này, đặt JOBS_EMBEDDED_WORKER=0 cho các process web.
+"""
+
+import argparse
+import os
+
+# Process worker không cần thread worker nhúng (biến môi trường được process con kế thừa)
+os.environ['JOBS_EMBEDDED_WORKER'] = '0'
+
+
+def create_app():
+    # Worker không phục vụ web: không cần đăng ký blueprint nào
+    import app
+    return app.create_app(blueprints=())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--processes', type=int, default=int(os.environ.get('JOBS_WORKER_PROCESSES', 2)))
+    parser.add_argument('--only', help='Chỉ xử lý các loại job này (phân tách bằng dấu phẩy)')
+    parser.add_argument('--once', action='store_true', help='Chạy hết job đang chờ trong process hiện tại rồi thoát')
+    args = parser.parse_args()
+    names = [name.strip() for name in args.only.split(',')] if args.only else None
+
+    import jobs
+    create_app()
+
+    if args.once:
+        done = 0
+        while jobs.run_one(names):
+            done += 1
+        print(f'Đã xử lý {done} job')
+        return
+    jobs.run_workers(create_app, processes=max(args.processes, 1), names=names)
+
+
+if __name__ == '__main__':
+    main()